@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from typing import Callable, Dict, Iterable, List, NamedTuple, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: brotli variants are skipped when unavailable
+    brotli = None
+
+LOGGER = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "/static/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "image/svg+xml", "application/json")
+MIN_COMPRESS_BYTES = 256
+
+
+class Asset(NamedTuple):
+    url: str
+    content_type: str
+    etag: str
+    variants: Dict[str, bytes]
+
+
+def _fingerprinted_name(relpath: str, digest: str) -> str:
+    stem, ext = os.path.splitext(relpath)
+    return f"{stem}.{digest}{ext}"
+
+
+def _compress(data: bytes, content_type: str) -> Dict[str, bytes]:
+    variants = {"identity": data}
+    if len(data) < MIN_COMPRESS_BYTES or not content_type.startswith(COMPRESSIBLE_TYPES):
+        return variants
+
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        variants["gzip"] = gz
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            variants["br"] = br
+    return variants
+
+
+def build_manifest(static_dir: str = STATIC_DIR) -> Tuple[Dict[str, str], Dict[str, Asset]]:
+    """
+    Fingerprint and precompress every file under static_dir.
+
+    Returns:
+        (urls, assets): relative path -> fingerprinted URL, and
+        fingerprinted URL -> Asset with its encoded variants.
+    """
+    urls: Dict[str, str] = {}
+    assets: Dict[str, Asset] = {}
+    for dirpath, _dirnames, filenames in os.walk(static_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            relpath = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            if content_type.startswith("text/") or content_type == "application/javascript":
+                content_type += "; charset=utf-8"
+            url = STATIC_URL + _fingerprinted_name(relpath, digest)
+            urls[relpath] = url
+            assets[url] = Asset(url, content_type, f'"{digest}"', _compress(data, content_type))
+
+    LOGGER.info("Fingerprinted %d static assets", len(assets))
+    return urls, assets
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    accepted = []
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.append(token.strip().lower())
+    return accepted
+
+
+class StaticAssetMiddleware:
+    """
+    WSGI middleware that answers fingerprinted asset URLs from memory.
+
+    Requests for other paths, including unfingerprinted /static/ URLs, go
+    on to the wrapped Flask app untouched.
+    """
+
+    def __init__(self, app: Callable, assets: Dict[str, Asset]):
+        self.app = app
+        self.assets = assets
+
+    def __call__(self, environ: Dict, start_response: Callable) -> Iterable[bytes]:
+        asset = self.assets.get(environ.get("PATH_INFO", ""))
+        method = environ.get("REQUEST_METHOD", "GET")
+        if asset is None or method not in ("GET", "HEAD"):
+            return self.app(environ, start_response)
+
+        headers = [
+            ("Cache-Control", IMMUTABLE_CACHE_CONTROL),
+            ("ETag", asset.etag),
+            ("Vary", "Accept-Encoding"),
+        ]
+        if asset.etag in environ.get("HTTP_IF_NONE_MATCH", ""):
+            start_response("304 Not Modified", headers)
+            return [b""]
+
+        accepted = _accepted_encodings(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        encoding = next((enc for enc in ("br", "gzip") if enc in accepted and enc in asset.variants), None)
+        body = asset.variants[encoding or "identity"]
+        headers += [("Content-Type", asset.content_type), ("Content-Length", str(len(body)))]
+        if encoding:
+            headers.append(("Content-Encoding", encoding))
+        start_response("200 OK", headers)
+        return [b"" if method == "HEAD" else body]
+
+
+def install(flask_app, static_dir: str = STATIC_DIR) -> Callable[[str], str]:
+    """
+    Build the manifest, mount the middleware and expose asset_url() to templates.
+
+    Returns:
+        The asset_url(relpath) function; unknown paths fall back to /static/.
+    """
+    urls, assets = build_manifest(static_dir)
+
+    def asset_url(relpath: str) -> str:
+        return urls.get(relpath) or STATIC_URL + relpath
+
+    flask_app.wsgi_app = StaticAssetMiddleware(flask_app.wsgi_app, assets)
+    flask_app.jinja_env.globals["asset_url"] = asset_url
+    return asset_url
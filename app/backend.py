@@ -0,0 +1,179 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+from control_client import get_agent_health
+from control_client import release_failsafe as agent_release_failsafe
+from control_client import set_pwm as agent_set_pwm
+from hwmon import (
+    HWMON_ROOT,
+    SensorFiles,
+    get_fan_channels,
+    read_fan_channels,
+    read_temperature_map,
+    temperature_readers,
+)
+from temperature_sources import _read_temp_smartctl
+
+LOGGER = logging.getLogger(__name__)
+
+BACKEND_ENV_VAR = "TRUEFAN_BACKEND"
+
+
+class HardwareBackend(ABC):
+    """
+    Where sensor reads come from and PWM writes go to.
+
+    read_temperatures() returns "device/label" -> Celsius like
+    hwmon.read_temperature_map(); read_fans() returns channel dicts like
+    hwmon.read_fan_channels(); read_smart() returns a SMART state dict like
+    temperature_sources._read_temp_smartctl(), or None. A failed write
+    leaves its reason in last_error.
+    """
+
+    name = "base"
+    last_error: Optional[str] = None
+
+    @abstractmethod
+    def read_temperatures(self) -> Dict[str, float]:
+        """All temperature readings, by "device/label"."""
+
+    def temperature_reads(self) -> Dict[str, Callable[[], Dict[str, float]]]:
+        """Independent reads that together make up read_temperatures(), by source name."""
+        return {self.name: self.read_temperatures}
+
+    @abstractmethod
+    def read_fans(self) -> List[Dict[str, Any]]:
+        """One dict per fan channel."""
+
+    @abstractmethod
+    def read_smart(self, device: str) -> Optional[Dict[str, Any]]:
+        """SMART state for device, or None when it has no temperature."""
+
+    @abstractmethod
+    def set_pwm(self, pwm: int, channel: Optional[str] = None) -> bool:
+        """Set one channel (by fan key), or every channel when channel is None."""
+
+    def close(self) -> None:
+        """Hand back anything this backend holds; the sampler calls it on stop."""
+
+    def engage_failsafe(self) -> bool:
+        """Full duty on every channel, remembering what release_failsafe() should restore."""
+        return self.set_pwm(255)
+
+    def release_failsafe(self) -> bool:
+        """Undo engage_failsafe(); backends that cannot restore leave the fans at full duty."""
+        return True
+
+
+class SysfsBackend(HardwareBackend):
+    """
+    Real hardware: hwmon under root, smartctl, and PWM writes via the control agent.
+
+    With keep_open the hwmon attribute files stay open between reads
+    (hwmon.SensorFiles), for long-lived readers polling at a short interval.
+    """
+
+    name = "sysfs"
+
+    def __init__(self, root: str = HWMON_ROOT, keep_open: bool = False):
+        self.root = root
+        self.files = SensorFiles(root) if keep_open else None
+
+    def read_temperatures(self) -> Dict[str, float]:
+        return read_temperature_map(self.root, self.files)
+
+    def close(self) -> None:
+        if self.files is not None:
+            self.files.close()
+
+    def temperature_reads(self) -> Dict[str, Callable[[], Dict[str, float]]]:
+        # One per hwmon device: a slow drivetemp or Super I/O chip only holds up its own read.
+        return temperature_readers(self.root)
+
+    def read_fans(self) -> List[Dict[str, Any]]:
+        return read_fan_channels(self.root, self.files)
+
+    def read_smart(self, device: str) -> Optional[Dict[str, Any]]:
+        return _read_temp_smartctl(device)
+
+    def set_pwm(self, pwm: int, channel: Optional[str] = None) -> bool:
+        if not get_agent_health(force=False).get("online"):
+            self.last_error = "Control agent unavailable; monitoring-only mode"
+            return False
+        if channel is None:
+            resp = agent_set_pwm(int(pwm), all_channels=True)
+        else:
+            match = next((ch for ch in get_fan_channels(self.root) if ch.key == channel), None)
+            if match is None or match.pwm_path is None:
+                LOGGER.error("No PWM output for fan channel %s", channel)
+                self.last_error = f"No PWM output for fan channel {channel}"
+                return False
+            resp = agent_set_pwm(int(pwm), pwm_path=match.pwm_path)
+        if not resp.get("ok"):
+            # The agent answers 409 while its failsafe or a calibration sweep holds the fans.
+            self.last_error = (resp.get("data") or {}).get("message") or resp.get("error") or "agent error"
+            LOGGER.error("PWM write failed: %s", self.last_error)
+            return False
+        self.last_error = None
+        return True
+
+    def engage_failsafe(self) -> bool:
+        # The agent saves each channel's duty and mode first and stops any calibration sweep.
+        resp = agent_set_pwm(255, all_channels=True, failsafe=True)
+        if not resp.get("ok"):
+            LOGGER.error("Failsafe PWM write failed: %s", resp.get("error") or "agent error")
+        return bool(resp.get("ok"))
+
+    def release_failsafe(self) -> bool:
+        resp = agent_release_failsafe()
+        if not resp.get("ok"):
+            LOGGER.error("Restoring fans after failsafe failed: %s", resp.get("error") or "agent error")
+        return bool(resp.get("ok"))
+
+
+_SHARED: Dict[str, HardwareBackend] = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def _reset_shared() -> None:
+    global _SHARED_LOCK
+    # A forked worker opens its own backend rather than sharing the parent's files and locks.
+    _SHARED.clear()
+    _SHARED_LOCK = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_shared)
+
+
+def shared_backend() -> HardwareBackend:
+    """
+    The process-wide backend named by TRUEFAN_BACKEND.
+
+    The sampler's failsafe and every duty write (control loop, dashboard,
+    CLI) go through this one instance, so a simulated plant or a BMC's
+    saved fan mode is not split between copies.
+    """
+    name = (os.getenv(BACKEND_ENV_VAR, "") or "sysfs").strip().lower()
+    with _SHARED_LOCK:
+        if name not in _SHARED:
+            _SHARED[name] = get_backend(name)
+        return _SHARED[name]
+
+
+def get_backend(name: Optional[str] = None, keep_open: bool = False) -> HardwareBackend:
+    """Backend named by TRUEFAN_BACKEND: "sysfs" (default), "ipmi" or "sim"."""
+    name = (name or os.getenv(BACKEND_ENV_VAR, "") or "sysfs").strip().lower()
+    if name == "sim":
+        from simulator import SimulatedBackend
+
+        return SimulatedBackend()
+    if name == "ipmi":
+        from ipmi import IpmiBackend
+
+        return IpmiBackend()
+    if name != "sysfs":
+        LOGGER.warning("Unknown backend %r; using sysfs", name)
+    return SysfsBackend(keep_open=keep_open)
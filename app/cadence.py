@@ -0,0 +1,116 @@
+import logging
+import math
+import os
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Aim for at most this much temperature movement between two samples.
+TARGET_DELTA_C = 0.5
+# Never lengthen the interval by more than this factor per sample, so a brief
+# flat spell during a burst does not immediately drop to the slowest cadence.
+MAX_GROWTH = 1.5
+
+
+def interval_from_env(name: str, default: float) -> float:
+    try:
+        return max(0.1, float(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def interval_bounds_from_env(
+    min_name: str, min_default: float, max_name: str, max_default: float
+) -> Tuple[float, float]:
+    """(min, max) interval from two env vars; inverted values fall back to the defaults."""
+    bounds = interval_from_env(min_name, min_default), interval_from_env(max_name, max_default)
+    if bounds[0] > bounds[1]:
+        LOGGER.warning(
+            "%s=%s exceeds %s=%s; using %s..%s s", min_name, bounds[0], max_name, bounds[1], min_default, max_default
+        )
+        return min_default, max_default
+    return bounds
+
+
+class AdaptiveCadence:
+    """
+    Choose the next poll interval for a sensor group from its rate of change.
+
+    The interval shrinks when any reading moves quickly or is heading
+    towards a curve breakpoint, and relaxes towards max_interval while the
+    readings are flat. It is always clamped to [min_interval, max_interval].
+    """
+
+    def __init__(self, min_interval: float, max_interval: float):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("require 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.dtdt = 0.0
+        self.next_breakpoint: Optional[float] = None
+        self._last: Dict[str, float] = {}
+        self._last_at: Optional[float] = None
+
+    def update(
+        self,
+        values: Mapping[str, float],
+        now: float,
+        breakpoints: Optional[Mapping[str, Sequence[float]]] = None,
+    ) -> float:
+        """
+        Feed one sample and return the interval until the next one.
+
+        Args:
+            values: Sensor name -> Celsius for this group.
+            now: Monotonic timestamp of the sample.
+            breakpoints: Optional sensor name -> curve thresholds.
+        """
+        rates: Dict[str, float] = {}
+        if self._last_at is not None and now > self._last_at:
+            elapsed = now - self._last_at
+            for name, value in values.items():
+                if name in self._last:
+                    rates[name] = (value - self._last[name]) / elapsed
+        self._last = dict(values)
+        self._last_at = now
+
+        self.dtdt = max((abs(r) for r in rates.values()), default=0.0)
+        target = TARGET_DELTA_C / self.dtdt if self.dtdt > 0 else math.inf
+
+        self.next_breakpoint = None
+        for name, thresholds in (breakpoints or {}).items():
+            if name not in values:
+                continue
+            rate = rates.get(name, 0.0)
+            ahead = _next_breakpoint(values[name], rate, thresholds)
+            if ahead is None:
+                continue
+            if self.next_breakpoint is None or abs(ahead - values[name]) < abs(self.next_breakpoint - values[name]):
+                self.next_breakpoint = ahead
+            # Land at least two samples before the curve step is crossed.
+            target = min(target, abs(ahead - values[name]) / abs(rate) / 2.0)
+
+        target = min(target, self.interval * MAX_GROWTH)
+        self.interval = min(self.max_interval, max(self.min_interval, target))
+        return self.interval
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "interval": round(self.interval, 3),
+            "rate_hz": round(1.0 / self.interval, 3),
+            "dtdt": round(self.dtdt, 3),
+            "next_breakpoint": self.next_breakpoint,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+        }
+
+
+def _next_breakpoint(value: float, rate: float, thresholds: Iterable[float]) -> Optional[float]:
+    if rate > 0:
+        above = [t for t in thresholds if t > value]
+        return min(above) if above else None
+    if rate < 0:
+        below = [t for t in thresholds if t <= value]
+        return max(below) if below else None
+    return None
@@ -1,6 +1,6 @@
 import os
 
-from control_client import get_agent_health, set_pwm as agent_set_pwm
+from backend import shared_backend
 from fan import control_loop, get_status, load_profile, set_profile as fan_set_profile
 
 
@@ -19,13 +19,10 @@ def is_read_only_mode():
 def set_pwm(pwm_value):
     if is_read_only_mode():
         raise ReadOnlyModeError("TRUEFAN_MODE is read-only; PWM writes are disabled")
-    health = get_agent_health(force=False)
-    if not health.get("online"):
-        raise ReadOnlyModeError("Control agent unavailable; monitoring-only mode")
-    resp = agent_set_pwm(int(pwm_value))
-    if not resp.get("ok"):
-        raise ReadOnlyModeError(resp.get("error") or "Failed to set PWM")
-    return (resp.get("data") or {}).get("pwm", int(pwm_value))
+    backend = shared_backend()
+    if not backend.set_pwm(int(pwm_value)):
+        raise ReadOnlyModeError(backend.last_error or "Failed to set PWM")
+    return int(pwm_value)
 
 
 def set_profile(profile):
@@ -1,12 +1,11 @@
+import http.client
 import json
 import logging
 import os
-import socket
 import threading
 import time
-import urllib.error
-import urllib.request
 from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
 
 LOGGER = logging.getLogger(__name__)
 
@@ -14,6 +13,10 @@ BASE_URL = "http://127.0.0.1:5088"
 TOKEN_ENV_VAR = "CONTROL_AGENT_TOKEN"
 TIMEOUT_SECONDS = 0.6
 HEALTH_CACHE_TTL_SECONDS = 2.0
+# The agent falls back to automatic fan control if no PWM update renews this
+# lease in time. Only code that computes and writes duties renews it, so a
+# stalled control loop or a one-off manual duty is caught by the agent.
+LEASE_SECONDS = 30.0
 
 _CACHE_LOCK = threading.Lock()
 _HEALTH_CACHE: Dict[str, Any] = {
@@ -24,7 +27,8 @@ _HEALTH_CACHE: Dict[str, Any] = {
 }
 
 
-def _result(ok: bool, status_code: int, data: Optional[Dict[str, Any]], error: str) -> Dict[str, Any]:
+def result(ok: bool, status_code: int, data: Optional[Dict[str, Any]], error: str) -> Dict[str, Any]:
+    """The result dict every request here returns: ok, status_code, data and error."""
     return {
         "ok": ok,
         "status_code": status_code,
@@ -33,6 +37,101 @@ def _result(ok: bool, status_code: int, data: Optional[Dict[str, Any]], error: s
     }
 
 
+def decode_response(status_code: int, raw: bytes) -> Dict[str, Any]:
+    """Turn an HTTP status and JSON body into the standard result dict."""
+    ok = 200 <= status_code < 300
+    try:
+        text = raw.decode("utf-8").strip()
+        parsed = json.loads(text) if text else {}
+    except ValueError:
+        return result(False, status_code, {}, "invalid JSON response" if ok else f"HTTP {status_code}")
+    return result(ok, status_code, parsed, "" if ok else f"HTTP {status_code}")
+
+
+class Connection:
+    """
+    One keep-alive HTTP/1.1 connection to a server, returning result dicts.
+
+    A request on a reused connection that the server has since closed is
+    retried once on a fresh one. Network errors (OSError, including
+    timeouts, and http.client.HTTPException) are raised to the caller.
+    Not thread-safe: each thread or poller keeps its own.
+    """
+
+    def __init__(self, base_url: str, timeout: float = TIMEOUT_SECONDS):
+        parts = urlsplit(base_url if "://" in base_url else f"http://{base_url}")
+        self.base_url = base_url
+        self.https = parts.scheme == "https"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.https else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.connects = 0
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = dict(headers or {}, Accept="application/json")
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            reused = self._conn is not None
+            if self._conn is None:
+                factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self._conn = factory(self.host, self.port, timeout=timeout or self.timeout)
+                self.connects += 1
+            elif self._conn.sock is not None:
+                self._conn.sock.settimeout(timeout or self.timeout)
+            try:
+                self._conn.request(method.upper(), f"{self.base_path}{path}", body=body, headers=headers)
+                resp = self._conn.getresponse()
+                raw = resp.read()
+            except (ConnectionError, http.client.HTTPException):
+                self.close()
+                # An idle keep-alive connection may have been dropped; retry once fresh.
+                if reused and attempt == 0:
+                    continue
+                raise
+            except OSError:
+                self.close()
+                raise
+            if resp.will_close:
+                self.close()
+            return decode_response(resp.status, raw)
+        raise ConnectionError("connection closed before response")
+
+
+_LOCAL = threading.local()
+
+
+def _reset_connections() -> None:
+    global _LOCAL
+    _LOCAL = threading.local()
+
+
+# A forked worker must not share its parent's sockets.
+os.register_at_fork(after_in_child=_reset_connections)
+
+
+def _agent_connection() -> Connection:
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None or conn.base_url != BASE_URL:
+        conn = _LOCAL.conn = Connection(BASE_URL)
+    return conn
+
+
 def _build_headers() -> Dict[str, str]:
     token = os.getenv(TOKEN_ENV_VAR, "").strip()
     if not token:
@@ -50,40 +149,60 @@ def _request(
     timeout: float = TIMEOUT_SECONDS,
 ) -> Dict[str, Any]:
     url = f"{BASE_URL}{path}"
-    headers = _build_headers()
-    body = None
-    if payload is not None:
-        body = json.dumps(payload).encode("utf-8")
-
-    req = urllib.request.Request(url=url, data=body, headers=headers, method=method.upper())
     try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            raw = resp.read().decode("utf-8").strip()
-            parsed = json.loads(raw) if raw else {}
-            return _result(True, resp.status, parsed, "")
-    except urllib.error.HTTPError as exc:
-        try:
-            raw = exc.read().decode("utf-8").strip()
-            parsed = json.loads(raw) if raw else {}
-        except Exception as e:
-            LOGGER.debug("Failed parsing control agent error payload for %s: %s", url, e)
-            parsed = {}
-        LOGGER.error("Control agent HTTP error %s for %s", exc.code, url)
-        return _result(False, exc.code, parsed, f"HTTP {exc.code}")
-    except (urllib.error.URLError, socket.timeout, ConnectionError) as exc:
+        resp = _agent_connection().request(method, path, payload, headers=_build_headers(), timeout=timeout)
+    except (OSError, http.client.HTTPException) as exc:
         LOGGER.error("Control agent connection failed for %s: %s", url, exc)
-        return _result(False, 0, {}, "connection_failed")
+        return result(False, 0, {}, "connection_failed")
     except Exception as exc:
         LOGGER.exception("Unexpected control client error for %s", url)
-        return _result(False, 0, {}, str(exc))
+        return result(False, 0, {}, str(exc))
+    if not resp["ok"]:
+        LOGGER.error("Control agent HTTP error %s for %s", resp["status_code"], url)
+    return resp
 
 
 def get_status() -> Dict[str, Any]:
     return _request("GET", "/status")
 
 
-def set_pwm(pwm: int) -> Dict[str, Any]:
-    return _request("POST", "/set_pwm", {"pwm": pwm})
+def set_pwm(
+    pwm: int,
+    pwm_path: Optional[str] = None,
+    all_channels: bool = False,
+    failsafe: bool = False,
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"pwm": pwm, "lease_seconds": LEASE_SECONDS}
+    if pwm_path:
+        payload["pwm_path"] = pwm_path
+    if all_channels:
+        payload["all_channels"] = True
+    if failsafe:
+        payload["failsafe"] = True
+    return _request("POST", "/set_pwm", payload)
+
+
+def release_failsafe() -> Dict[str, Any]:
+    """Ask the agent to restore the duty and mode each channel had before the failsafe."""
+    return _request("POST", "/release")
+
+
+def send_heartbeat(lease_seconds: float = LEASE_SECONDS) -> Dict[str, Any]:
+    """Extend the lease without a write; only for a controller that has just decided its duty stands."""
+    return _request("POST", "/heartbeat", {"lease_seconds": lease_seconds})
+
+
+def start_calibration(pwm_path: Optional[str] = None, step: Optional[int] = None) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {}
+    if pwm_path:
+        payload["pwm_path"] = pwm_path
+    if step:
+        payload["step"] = step
+    return _request("POST", "/calibrate", payload)
+
+
+def get_calibration() -> Dict[str, Any]:
+    return _request("GET", "/calibration")
 
 
 def _set_health_cache(online: bool, status_code: int, error: str) -> None:
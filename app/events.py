@@ -0,0 +1,282 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+LOGGER = logging.getLogger(__name__)
+
+EVENT_LOG_SIZE = 200
+CRITICAL = "critical"
+WARNING = "warning"
+
+# A sample is {"time": monotonic seconds, "values": {sensor: Celsius},
+# "fans": [fan channel dicts as returned by hwmon.read_fan_channels()],
+# "skipped": sources deliberately not read this tick (SMART backoff)}.
+Sample = Dict[str, Any]
+
+
+class Rule(ABC):
+    """
+    Base class for incremental rules.
+
+    evaluate() sees one sample at a time and returns subject -> active for
+    the subjects it has an opinion on; subjects it omits keep their state.
+    """
+
+    def __init__(self, name: str, severity: str = WARNING):
+        self.name = name
+        self.severity = severity
+
+    @abstractmethod
+    def evaluate(self, sample: Sample) -> Dict[str, bool]:
+        """Subject -> active for this sample."""
+
+
+class ThresholdRule(Rule):
+    """Active at or above high; only clears again at or below clear."""
+
+    def __init__(self, name: str, sensor: str, high: float, clear: float, severity: str = WARNING):
+        super().__init__(name, severity)
+        if clear > high:
+            raise ValueError("clear must not exceed high")
+        self.sensor = sensor
+        self.high = high
+        self.clear = clear
+        self._active = False
+
+    def evaluate(self, sample: Sample) -> Dict[str, bool]:
+        value = sample["values"].get(self.sensor)
+        if value is None:
+            return {}
+        if value >= self.high:
+            self._active = True
+        elif value <= self.clear:
+            self._active = False
+        return {self.sensor: self._active}
+
+
+class RateOfRiseRule(Rule):
+    """Active while a sensor climbs faster than limit C/s; clears below half of it."""
+
+    def __init__(self, name: str, sensor: str, limit: float, severity: str = WARNING):
+        super().__init__(name, severity)
+        self.sensor = sensor
+        self.limit = limit
+        self._last: Optional[tuple] = None
+        self._active = False
+
+    def evaluate(self, sample: Sample) -> Dict[str, bool]:
+        value = sample["values"].get(self.sensor)
+        if value is None:
+            self._last = None
+            return {}
+        now = sample["time"]
+        last, self._last = self._last, (now, value)
+        if last is None or now <= last[0]:
+            return {self.sensor: self._active}
+
+        rate = (value - last[1]) / (now - last[0])
+        if rate >= self.limit:
+            self._active = True
+        elif rate < self.limit / 2.0:
+            self._active = False
+        return {self.sensor: self._active}
+
+
+class FanStallRule(Rule):
+    """
+    Active for a channel driven at min_pwm or more whose tachometer reads 0.
+
+    Only channels that have been seen spinning, or that are in manual mode
+    (pwm_enable 1), are judged: an empty header reads 0 RPM at any duty.
+    """
+
+    def __init__(self, name: str, min_pwm: int = 128, consecutive: int = 2, severity: str = CRITICAL):
+        super().__init__(name, severity)
+        self.min_pwm = min_pwm
+        self.consecutive = consecutive
+        self._counts: Dict[str, int] = {}
+        self._spun: set = set()
+
+    def evaluate(self, sample: Sample) -> Dict[str, bool]:
+        out: Dict[str, bool] = {}
+        for channel in sample.get("fans") or []:
+            rpm, pwm = channel.get("rpm"), channel.get("pwm")
+            if rpm is None or pwm is None:
+                continue
+            key = str(channel["key"])
+            if rpm > 0:
+                self._spun.add(key)
+            elif key not in self._spun and channel.get("pwm_enable") != 1:
+                continue
+            # Give a fan a sample to spin up before calling it stalled.
+            self._counts[key] = self._counts.get(key, 0) + 1 if pwm >= self.min_pwm and rpm == 0 else 0
+            out[key] = self._counts[key] >= self.consecutive
+        return out
+
+
+class SensorLostRule(Rule):
+    """
+    Active when a sensor that has reported before misses `consecutive` samples.
+
+    Sources listed in the sample's "skipped" (backed off on purpose) count
+    neither as present nor as missing.
+    """
+
+    def __init__(self, name: str, sensors: Iterable[str], consecutive: int = 3, severity: str = CRITICAL):
+        super().__init__(name, severity)
+        self.sensors = list(sensors)
+        self.consecutive = consecutive
+        self._seen: set = set()
+        self._misses: Dict[str, int] = {}
+
+    def evaluate(self, sample: Sample) -> Dict[str, bool]:
+        out: Dict[str, bool] = {}
+        skipped = sample.get("skipped") or ()
+        for sensor in self.sensors:
+            present = sample["values"].get(sensor) is not None
+            if present:
+                self._seen.add(sensor)
+                self._misses[sensor] = 0
+            elif sensor in skipped:
+                continue
+            else:
+                self._misses[sensor] = self._misses.get(sensor, 0) + 1
+            if sensor in self._seen:
+                out[sensor] = self._misses[sensor] >= self.consecutive
+        return out
+
+
+def default_rules() -> List[Rule]:
+    return [
+        ThresholdRule("cpu_hot", "cpu", high=85.0, clear=78.0, severity=WARNING),
+        ThresholdRule("cpu_critical", "cpu", high=95.0, clear=85.0, severity=CRITICAL),
+        ThresholdRule("nvme_critical", "nvme", high=80.0, clear=72.0, severity=CRITICAL),
+        ThresholdRule("hdd_critical", "hdd", high=60.0, clear=54.0, severity=CRITICAL),
+        RateOfRiseRule("cpu_rising", "cpu", limit=2.0, severity=WARNING),
+        FanStallRule("fan_stall", min_pwm=128, severity=CRITICAL),
+        SensorLostRule("sensor_lost", ["cpu", "nvme", "hdd"], severity=CRITICAL),
+    ]
+
+
+class ThermalEventEngine:
+    """
+    Evaluate rules on every sample and engage the failsafe on critical alerts.
+
+    While any critical alert is active the actuator is asked to drive all
+    channels to full duty; it is re-asserted on each sample until it
+    succeeds. Once every critical alert has cleared the releaser puts the
+    fans back as they were. Latency is measured from the sample's read
+    time to actuator completion.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[Rule]] = None,
+        actuator: Optional[Callable[[], bool]] = None,
+        releaser: Optional[Callable[[], bool]] = None,
+        log_size: int = EVENT_LOG_SIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rules = rules if rules is not None else default_rules()
+        self.actuator = actuator
+        self.releaser = releaser
+        self.clock = clock
+        self.active: Dict[str, Dict[str, Any]] = {}
+        self.log: Deque[Dict[str, Any]] = deque(maxlen=log_size)
+        self.counters: Dict[str, int] = {rule.name: 0 for rule in self.rules}
+        self.failsafe: Dict[str, Any] = {
+            "engaged": False,
+            "actuations": 0,
+            "failures": 0,
+            "release_failures": 0,
+            "last_latency_ms": None,
+            "max_latency_ms": None,
+        }
+
+    def _record(self, kind: str, rule: Rule, subject: str, sample: Sample) -> Dict[str, Any]:
+        event = {
+            "time": time.time(),
+            "event": kind,
+            "rule": rule.name,
+            "severity": rule.severity,
+            "subject": subject,
+            "value": sample["values"].get(subject),
+        }
+        self.log.append(event)
+        level = logging.WARNING if rule.severity == CRITICAL or kind == "raised" else logging.INFO
+        LOGGER.log(level, "Thermal event %s: %s on %s", kind, rule.name, subject)
+        return event
+
+    def evaluate(self, sample: Sample) -> List[Dict[str, Any]]:
+        """Feed one sample; return the events it raised or cleared."""
+        events = []
+        for rule in self.rules:
+            try:
+                states = rule.evaluate(sample)
+            except Exception:
+                LOGGER.exception("Rule %s failed", rule.name)
+                continue
+            for subject, is_active in states.items():
+                alert_id = f"{rule.name}:{subject}"
+                if is_active and alert_id not in self.active:
+                    self.active[alert_id] = {"rule": rule.name, "severity": rule.severity, "subject": subject}
+                    self.counters[rule.name] += 1
+                    events.append(self._record("raised", rule, subject, sample))
+                elif not is_active and alert_id in self.active:
+                    del self.active[alert_id]
+                    events.append(self._record("cleared", rule, subject, sample))
+
+        self._drive_failsafe(sample)
+        return events
+
+    def critical_active(self) -> bool:
+        return any(alert["severity"] == CRITICAL for alert in self.active.values())
+
+    def _drive_failsafe(self, sample: Sample) -> None:
+        if not self.critical_active():
+            if self.failsafe["engaged"]:
+                self.failsafe["engaged"] = False
+                LOGGER.warning("Failsafe released: no critical alerts active")
+                self._release()
+            return
+        if self.failsafe["engaged"] or self.actuator is None:
+            return
+
+        try:
+            ok = bool(self.actuator())
+        except Exception:
+            LOGGER.exception("Failsafe actuator failed")
+            ok = False
+        if not ok:
+            self.failsafe["failures"] += 1
+            return
+
+        latency_ms = round((self.clock() - sample["time"]) * 1000.0, 1)
+        self.failsafe["engaged"] = True
+        self.failsafe["actuations"] += 1
+        self.failsafe["last_latency_ms"] = latency_ms
+        self.failsafe["max_latency_ms"] = max(self.failsafe["max_latency_ms"] or 0.0, latency_ms)
+        LOGGER.warning("Failsafe engaged: all channels at full duty (%.1f ms after detection)", latency_ms)
+
+    def _release(self) -> None:
+        if self.releaser is None:
+            return
+        try:
+            ok = bool(self.releaser())
+        except Exception:
+            LOGGER.exception("Failsafe releaser failed")
+            ok = False
+        if not ok:
+            # Fans stay at full duty: safe, just loud.
+            self.failsafe["release_failures"] += 1
+            LOGGER.error("Could not restore fan control after the failsafe; fans remain at full duty")
+
+    def report(self, recent: int = 20) -> Dict[str, Any]:
+        return {
+            "active": sorted(self.active.values(), key=lambda a: (a["severity"] != CRITICAL, a["rule"])),
+            "recent": list(self.log)[-recent:],
+            "counters": dict(self.counters),
+            "failsafe": dict(self.failsafe),
+        }
@@ -1,47 +1,64 @@
 import logging
 import os
 import sys
+import threading
 import time
-from typing import Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from control_client import get_agent_health, set_pwm as agent_set_pwm
+from backend import shared_backend
+from control_client import get_calibration as agent_get_calibration
+from control_client import start_calibration as agent_start_calibration
+from feedforward import shared_feed_forward
+from hwmon import get_fan_channels, read_temperature_map
+from log_config import configure_logging
+from profile_store import ProfileStore
 from temperature_sources import get_temperature_sources
+from virtual_sensors import VirtualSensors, load_virtual_sensors
 
 PROFILE_FILE = "fan_profile.conf"
+PROFILE_STORE = ProfileStore(PROFILE_FILE)
+os.register_at_fork(after_in_child=PROFILE_STORE.forked)
 LOGGER = logging.getLogger(__name__)
 
 
 def load_profile() -> str:
-    if not os.path.exists(PROFILE_FILE):
-        return "cool"
-    try:
-        with open(PROFILE_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.startswith("profile="):
-                    return line.strip().split("=", 1)[1]
-    except OSError as e:
-        LOGGER.debug("Failed reading profile file %s: %s", PROFILE_FILE, e)
-    return "cool"
+    return PROFILE_STORE.get()
 
 
 def set_profile(name: str) -> None:
-    with open(PROFILE_FILE, "w", encoding="utf-8") as f:
-        f.write(f"profile={name}\n")
+    PROFILE_STORE.set(name)
     LOGGER.info("Profile set to: %s", name)
 
 
-def _temps_from_sources() -> Dict[str, float]:
-    sources = get_temperature_sources(include_hdd=True)
-    out = {"cpu": 0.0, "nvme": 0.0, "hdd": 0.0}
-    for item in sources:
+_VIRTUAL_SENSORS: Optional[VirtualSensors] = None
+
+
+def virtual_sensors() -> VirtualSensors:
+    """This process's virtual sensors; their windows advance on each read_sensor_values()."""
+    global _VIRTUAL_SENSORS
+    if _VIRTUAL_SENSORS is None:
+        _VIRTUAL_SENSORS = load_virtual_sensors()
+    return _VIRTUAL_SENSORS
+
+
+def read_sensor_values() -> Dict[str, float]:
+    """Raw hwmon readings, the cpu/nvme/hdd sources and virtual sensors, by name."""
+    readings = read_temperature_map()
+    values = dict(readings)
+    for item in get_temperature_sources(include_hdd=True, readings=readings):
         name = str(item.get("name", "")).lower()
-        value = item.get("value")
         try:
-            if name in out and value is not None:
-                out[name] = float(value)
+            if item.get("value") is not None:
+                values[name] = float(item["value"])
         except (TypeError, ValueError) as e:
             LOGGER.debug("Invalid temperature value for %s: %s", name, e)
-    return out
+    virtual_sensors().update(values, time.monotonic())
+    return values
+
+
+def _temps_from_sources(values: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    values = read_sensor_values() if values is None else values
+    return {name: float(values.get(name) or 0.0) for name in ("cpu", "nvme", "hdd")}
 
 
 def read_all_temps() -> Tuple[float, float, float]:
@@ -49,67 +66,218 @@ def read_all_temps() -> Tuple[float, float, float]:
     return temps["cpu"], temps["nvme"], temps["hdd"]
 
 
-def determine_pwm(cpu_temp: float, profile: str) -> int:
-    if profile == "quiet":
-        if cpu_temp >= 80:
-            return 180
-        if cpu_temp >= 65:
-            return 120
-        return 70
-    if profile == "cool":
-        if cpu_temp >= 70:
-            return 255
-        if cpu_temp >= 55:
-            return 180
-        return 100
-    if profile == "aggressive":
-        if cpu_temp >= 50:
-            return 255
-        if cpu_temp >= 40:
-            return 180
-        return 130
-    return 120
-
-
-def get_status() -> Dict[str, float]:
-    cpu, nvme, hdd = read_all_temps()
-    profile = load_profile()
+# Per profile: (cpu threshold, pwm) steps from hottest down, then the floor pwm.
+PROFILE_CURVES: Dict[str, Tuple[Tuple[Tuple[float, int], ...], int]] = {
+    "quiet": (((80, 180), (65, 120)), 70),
+    "cool": (((70, 255), (55, 180)), 100),
+    "aggressive": (((50, 255), (40, 180)), 130),
+}
+DEFAULT_PWM = 120
+
+# RPM-target profiles: same shape as PROFILE_CURVES, but in fan RPM. They are
+# turned into per-channel PWM through each channel's calibration table.
+RPM_PROFILE_CURVES: Dict[str, Tuple[Tuple[Tuple[float, int], ...], int]] = {
+    "quiet-rpm": (((80, 1600), (65, 1100)), 600),
+    "cool-rpm": (((70, 2400), (55, 1600)), 900),
+}
+
+
+def curve_breakpoints(profile: str) -> List[float]:
+    steps, _floor = PROFILE_CURVES.get(profile) or RPM_PROFILE_CURVES.get(profile, ((), DEFAULT_PWM))
+    return sorted(float(threshold) for threshold, _pwm in steps)
+
+
+def determine_pwm(cpu_temp: float, profile: str, boost: int = 0) -> int:
+    """Curve PWM for cpu_temp, raised by a feed-forward boost and capped at 255."""
+    if profile in RPM_PROFILE_CURVES:
+        # Without per-channel calibration, fall back to the PWM curve it mirrors.
+        profile = profile[: -len("-rpm")]
+    if profile not in PROFILE_CURVES:
+        return min(255, DEFAULT_PWM + boost)
+    steps, floor = PROFILE_CURVES[profile]
+    for threshold, pwm in steps:
+        if cpu_temp >= threshold:
+            return min(255, pwm + boost)
+    return min(255, floor + boost)
+
+
+def determine_rpm(cpu_temp: float, profile: str) -> Optional[int]:
+    if profile not in RPM_PROFILE_CURVES:
+        return None
+    steps, floor = RPM_PROFILE_CURVES[profile]
+    for threshold, rpm in steps:
+        if cpu_temp >= threshold:
+            return rpm
+    return floor
+
+
+def rpm_to_pwm(calibration: Dict[str, Any], target_rpm: float) -> int:
+    """
+    Invert a channel's calibrated PWM -> RPM table by linear interpolation.
+
+    The result never drops below the channel's start threshold for a
+    non-zero target, so a fan is not parked at a duty where it stalls.
+    """
+    table = sorted((int(pwm), int(rpm)) for pwm, rpm in calibration.get("table") or [])
+    if not table:
+        raise ValueError("calibration has no PWM/RPM table")
+    if target_rpm <= 0:
+        return 0
+
+    # Tachometer noise can make the sweep slightly non-monotonic.
+    points = []
+    peak = 0
+    for pwm, rpm in table:
+        peak = max(peak, rpm)
+        points.append((pwm, peak))
+
+    pwm = 255
+    for (pwm_lo, rpm_lo), (pwm_hi, rpm_hi) in zip(points, points[1:]):
+        if rpm_lo <= target_rpm <= rpm_hi:
+            if rpm_hi == rpm_lo:
+                pwm = pwm_lo
+            else:
+                pwm = round(pwm_lo + (target_rpm - rpm_lo) * (pwm_hi - pwm_lo) / (rpm_hi - rpm_lo))
+            break
+    if target_rpm >= points[-1][1]:
+        pwm = points[-1][0]
+
+    start_pwm = calibration.get("start_pwm") or next((p for p, rpm in table if rpm > 0), 0)
+    return max(int(pwm), int(start_pwm))
+
+
+def channel_pwm_targets(
+    cpu_temp: float,
+    profile: str,
+    calibrations: Dict[str, Dict[str, Any]],
+    boost: int = 0,
+) -> Dict[str, int]:
+    """
+    Map each calibrated PWM channel to the duty the active profile asks for.
+
+    Raw PWM profiles give every channel the same duty; RPM profiles give
+    each channel the duty its own table needs for the target RPM. A
+    feed-forward boost is added on top of either, capped at 255.
+    """
+    target_rpm = determine_rpm(cpu_temp, profile)
+    if target_rpm is None:
+        pwm = determine_pwm(cpu_temp, profile, boost)
+        return {path: pwm for path in calibrations}
+    return {
+        path: min(255, rpm_to_pwm(calibration, target_rpm) + boost) for path, calibration in calibrations.items()
+    }
+
+
+def channel_calibrations() -> Dict[str, Dict[str, Any]]:
+    """
+    The agent's PWM -> RPM tables by fan channel key, the key backend writes
+    take; empty when it is unreachable or nothing is calibrated.
+    """
+    resp = agent_get_calibration()
+    if not resp.get("ok"):
+        return {}
+    # The agent keys tables by resolved PWM path; hwmon indexes them under /sys/class/hwmon.
+    keys = {os.path.realpath(ch.pwm_path): ch.key for ch in get_fan_channels() if ch.pwm_path}
+    channels = (resp.get("data") or {}).get("channels") or {}
     return {
-        "profile": profile,
-        "cpu": cpu,
-        "nvme": nvme,
-        "hdd": hdd,
-        "pwm": determine_pwm(cpu, profile),
+        keys[os.path.realpath(path)]: table for path, table in channels.items() if os.path.realpath(path) in keys
     }
 
 
-def control_loop(interval_seconds: int = 5, iterations: int = 1):
+def feed_forward_boost() -> int:
+    """Current feed-forward PWM boost; 0 unless TRUEFAN_FEEDFORWARD is on."""
+    feed_forward = shared_feed_forward()
+    return feed_forward.update() if feed_forward is not None else 0
+
+
+def get_status() -> Dict[str, Any]:
+    values = read_sensor_values()
+    temps = _temps_from_sources(values)
+    virtual = virtual_sensors()
+    # The curve follows the configured sensor, falling back to cpu while it has no value.
+    curve_temp = values.get(virtual.curve_sensor)
+    curve_temp = temps["cpu"] if curve_temp is None else curve_temp
+    profile = load_profile()
+    boost = feed_forward_boost()
+    status: Dict[str, Any] = dict(temps, profile=profile)
+    status["pwm"] = determine_pwm(curve_temp, profile, boost)
+    status["feedforward_pwm"] = boost
+    if profile in RPM_PROFILE_CURVES:
+        # Only calibrated channels can follow an RPM target; apply_status() writes just those.
+        calibrations = channel_calibrations()
+        if calibrations:
+            status["channel_pwm"] = channel_pwm_targets(curve_temp, profile, calibrations, boost)
+    if virtual.sensors:
+        status["curve_sensor"] = virtual.curve_sensor
+        status["virtual"] = {sensor.name: values.get(sensor.name) for sensor in virtual.sensors}
+    return status
+
+
+def apply_status(status: Dict[str, Any]) -> bool:
+    """
+    Write the duties get_status() computed through the configured backend.
+
+    Calibrated channels of an RPM profile get their own duty ("channel_pwm");
+    otherwise every channel gets "pwm". Nothing is written in read-only
+    mode; a backend that cannot write (agent unreachable, failsafe held)
+    makes this return False.
+    """
+    # control imports this module, so its read-only check is looked up here.
+    from control import is_read_only_mode
+
+    if is_read_only_mode():
+        return False
+    backend = shared_backend()
+    targets = status.get("channel_pwm") or {None: status["pwm"]}
+    ok = True
+    for channel, pwm in targets.items():
+        if not backend.set_pwm(int(pwm), channel):
+            LOGGER.error("PWM write to %s failed: %s", channel or "all channels", backend.last_error or "backend error")
+            ok = False
+    return ok
+
+
+def control_loop(interval_seconds: int = 5, iterations: int = 1, apply: bool = False):
+    """Compute the status every interval; only with apply are the duties written (see apply_status())."""
     if iterations < 1:
         raise ValueError("iterations must be >= 1")
     latest = None
-    for i in range(iterations):
-        latest = get_status()
-        LOGGER.info("Control loop status (no direct hardware write): %s", latest)
-        if i < iterations - 1:
-            time.sleep(interval_seconds)
+    profile_changed = threading.Event()
+    unsubscribe = PROFILE_STORE.subscribe(lambda _profile: profile_changed.set())
+    # Edits from other processes (dashboard, fan.py set-profile) only reach subscribers through the watcher.
+    release_watch = PROFILE_STORE.watch() if iterations > 1 else None
+    try:
+        for i in range(iterations):
+            latest = get_status()
+            latest["applied"] = apply_status(latest) if apply else False
+            LOGGER.info("Control loop status: %s", latest)
+            if i < iterations - 1:
+                # A profile change cuts the wait short so it applies at once.
+                profile_changed.wait(interval_seconds)
+                profile_changed.clear()
+    finally:
+        if release_watch is not None:
+            release_watch()
+        unsubscribe()
     return latest
 
 
 def set_pwm(pwm_value):
-    health = get_agent_health(force=False)
-    if not health.get("online"):
-        raise RuntimeError("Control agent unavailable; monitoring-only mode")
-    resp = agent_set_pwm(int(pwm_value))
-    if not resp.get("ok"):
-        raise RuntimeError(resp.get("error") or "Failed to set PWM via control agent")
-    return (resp.get("data") or {}).get("pwm", int(pwm_value))
+    backend = shared_backend()
+    if not backend.set_pwm(int(pwm_value)):
+        raise RuntimeError(backend.last_error or f"Failed to set PWM via the {backend.name} backend")
+    return int(pwm_value)
 
 
 def print_usage() -> None:
-    LOGGER.error("Usage: fan.py [status|control|set <pwm>|set-profile <name>|get-profile]")
+    LOGGER.error(
+        "Usage: fan.py [status|control [--apply]|set <pwm>|set-profile <name>|get-profile|calibrate [pwm_path]|"
+        "watch [--interval S] [--format table|jsonl]|bench]"
+    )
 
 
 def main() -> None:
+    configure_logging()
     cmd = sys.argv[1] if len(sys.argv) > 1 else None
     if not cmd:
         print_usage()
@@ -119,10 +287,17 @@ def main() -> None:
         LOGGER.info("Status: %s", get_status())
         return
 
-    if cmd == "control":
-        control_loop(iterations=1)
+    if cmd == "control" and sys.argv[2:] in ([], ["--apply"]):
+        # Monitoring only unless --apply asks for the duties to be written.
+        control_loop(iterations=1, apply=sys.argv[2:] == ["--apply"])
         return
 
+    if cmd in ("watch", "bench"):
+        # watch imports this module, so it is loaded only when asked for.
+        from watch import main as watch_main
+
+        sys.exit(watch_main(sys.argv[1:]))
+
     if cmd == "set":
         if len(sys.argv) != 3:
             print_usage()
@@ -138,6 +313,15 @@ def main() -> None:
         set_profile(sys.argv[2])
         return
 
+    if cmd == "calibrate" and len(sys.argv) <= 3:
+        resp = agent_start_calibration(sys.argv[2] if len(sys.argv) == 3 else None)
+        if not resp.get("ok"):
+            message = (resp.get("data") or {}).get("message") or resp.get("error")
+            LOGGER.error("Failed to start calibration: %s", message)
+            sys.exit(1)
+        LOGGER.info("Calibration started; results appear in the agent's GET /calibration")
+        return
+
     if cmd == "get-profile":
         sys.stdout.write(f"{load_profile()}\n")
         return
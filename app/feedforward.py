@@ -0,0 +1,198 @@
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+PROC_STAT = "/proc/stat"
+PROC_DISKSTATS = "/proc/diskstats"
+SYS_BLOCK = "/sys/block"
+SECTOR_BYTES = 512
+
+FEEDFORWARD_ENABLED = os.getenv("TRUEFAN_FEEDFORWARD", "").strip().lower() in ("1", "true", "yes", "on")
+MAX_BOOST_PWM = int(os.getenv("TRUEFAN_FEEDFORWARD_MAX_PWM", "80"))
+DECAY_SECONDS = float(os.getenv("TRUEFAN_FEEDFORWARD_DECAY", "60"))
+# Disk throughput that earns the full boost (a scrub or resilver runs near this).
+DISK_FULL_BYTES_PER_SECOND = float(os.getenv("TRUEFAN_FEEDFORWARD_DISK_MBPS", "200")) * 1024 * 1024
+# CPU utilisation below this is normal background load and earns nothing.
+CPU_UTIL_FLOOR = 0.3
+# Baseline taken before a new process's first update(), which needs a delta to report anything.
+PRIME_SECONDS = 0.2
+
+_IGNORED_DISK_PREFIXES = ("loop", "ram", "zram", "dm-", "md", "sr")
+
+
+class _ProcFile:
+    """Keeps one /proc file open and re-reads it from offset 0 with a single pread."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._fd: Optional[int] = None
+
+    def read(self, whole: bool = True) -> bytes:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDONLY | os.O_CLOEXEC)
+        data = os.pread(self._fd, self.size, 0)
+        if whole and len(data) == self.size:
+            # The file outgrew the read size; remember the larger size.
+            self.size *= 2
+            return self.read()
+        return data
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class CpuUtilization:
+    """Busy fraction of all CPUs between successive reads of the /proc/stat "cpu" line."""
+
+    def __init__(self, path: str = PROC_STAT):
+        # The aggregate line comes first and is well under 256 bytes.
+        self._file = _ProcFile(path, 256)
+        self._last: Optional[Tuple[int, int]] = None
+
+    def read(self) -> Optional[float]:
+        data = self._file.read(whole=False)
+        # cpu user nice system idle iowait irq softirq steal ...
+        fields = [int(x) for x in data[: data.find(b"\n")].split()[1:9]]
+        total = sum(fields)
+        idle = fields[3] + fields[4]
+        last, self._last = self._last, (total, idle)
+        if last is None or total <= last[0]:
+            return None
+        return 1.0 - (idle - last[1]) / (total - last[0])
+
+
+def whole_disks(sys_block: str = SYS_BLOCK) -> List[str]:
+    """Block devices that are physical disks (no partitions, loop, ram or device-mapper)."""
+    try:
+        names = os.listdir(sys_block)
+    except OSError:
+        return []
+    return sorted(name for name in names if not name.startswith(_IGNORED_DISK_PREFIXES))
+
+
+class DiskThroughput:
+    """Bytes/s read plus written across disks between successive reads of /proc/diskstats."""
+
+    def __init__(self, path: str = PROC_DISKSTATS, disks: Optional[List[str]] = None):
+        self._file = _ProcFile(path, 16 * 1024)
+        self._needles = [f" {disk} ".encode() for disk in (disks if disks is not None else whole_disks())]
+        self._last: Optional[Tuple[float, int]] = None
+
+    def read(self, now: float) -> Optional[float]:
+        data = self._file.read()
+        sectors = 0
+        for needle in self._needles:
+            start = data.find(needle)
+            if start < 0:
+                continue
+            end = data.find(b"\n", start)
+            # major minor name reads merged sectors_read ms writes merged sectors_written ...
+            fields = data[start:end].split()
+            sectors += int(fields[3]) + int(fields[7])
+        last, self._last = self._last, (now, sectors)
+        if last is None or now <= last[0] or sectors < last[1]:
+            return None
+        return (sectors - last[1]) * SECTOR_BYTES / (now - last[0])
+
+
+class FeedForward:
+    """
+    Pre-emptive PWM boost from CPU utilisation and disk throughput.
+
+    Each update() reads /proc/stat and /proc/diskstats once and turns the
+    deltas since the previous call into a demand in [0, 1]: the larger of
+    CPU utilisation above CPU_UTIL_FLOOR and disk throughput relative to
+    disk_full_bps. The boost jumps up to demand * max_boost at once and
+    decays exponentially with time constant decay_seconds afterwards.
+    """
+
+    def __init__(
+        self,
+        max_boost: int = MAX_BOOST_PWM,
+        decay_seconds: float = DECAY_SECONDS,
+        disk_full_bps: float = DISK_FULL_BYTES_PER_SECOND,
+        cpu: Optional[CpuUtilization] = None,
+        disk: Optional[DiskThroughput] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_boost = max_boost
+        self.decay_seconds = decay_seconds
+        self.disk_full_bps = disk_full_bps
+        self.cpu = cpu or CpuUtilization()
+        self.disk = disk or DiskThroughput()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.boost = 0.0
+        self._updated_at: Optional[float] = None
+        self._cpu_util: Optional[float] = None
+        self._disk_bps: Optional[float] = None
+
+    def update(self) -> int:
+        with self._lock:
+            return self._update()
+
+    def _update(self) -> int:
+        now = self.clock()
+        try:
+            self._cpu_util = self.cpu.read()
+        except (OSError, ValueError, IndexError) as e:
+            LOGGER.debug("Failed reading CPU utilisation: %s", e)
+            self._cpu_util = None
+        try:
+            self._disk_bps = self.disk.read(now)
+        except (OSError, ValueError, IndexError) as e:
+            LOGGER.debug("Failed reading disk throughput: %s", e)
+            self._disk_bps = None
+
+        demand = 0.0
+        if self._cpu_util is not None:
+            demand = max(demand, (self._cpu_util - CPU_UTIL_FLOOR) / (1.0 - CPU_UTIL_FLOOR))
+        if self._disk_bps is not None and self.disk_full_bps > 0:
+            demand = max(demand, self._disk_bps / self.disk_full_bps)
+        target = self.max_boost * min(1.0, max(0.0, demand))
+
+        if self._updated_at is not None and self.decay_seconds > 0:
+            self.boost *= math.exp(-(now - self._updated_at) / self.decay_seconds)
+        self.boost = max(self.boost, target)
+        self._updated_at = now
+        return int(round(self.boost))
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "boost_pwm": int(round(self.boost)),
+            "cpu_utilization": round(self._cpu_util, 3) if self._cpu_util is not None else None,
+            "disk_bytes_per_second": round(self._disk_bps) if self._disk_bps is not None else None,
+            "max_boost_pwm": self.max_boost,
+            "decay_seconds": self.decay_seconds,
+        }
+
+
+_SHARED: Optional[FeedForward] = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_feed_forward() -> Optional[FeedForward]:
+    """
+    The process-wide FeedForward, or None unless TRUEFAN_FEEDFORWARD is on.
+
+    Every caller that computes a target duty uses this one instance. It is
+    primed over PRIME_SECONDS when created, so a one-shot `fan.py status`
+    already sees real utilisation.
+    """
+    global _SHARED
+    if not FEEDFORWARD_ENABLED:
+        return None
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = FeedForward()
+            _SHARED.update()
+            time.sleep(PRIME_SECONDS)
+        return _SHARED
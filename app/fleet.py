@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from http.client import HTTPException
+from typing import Any, Dict, List
+
+from flask import Flask, render_template
+
+import assets
+from control_client import Connection, result
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_SECONDS = 5.0
+DEFAULT_TIMEOUT_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+MAX_CONCURRENCY = 128
+STATUS_PATH = "/status"
+
+
+class NodeClient:
+    """
+    One node's keep-alive connection, driven from the asyncio poll loop.
+
+    Requests go through control_client.Connection on a worker thread, so
+    the fleet view speaks HTTP exactly like the rest of the app. Nodes
+    whose server closes after each response (e.g. gunicorn sync workers)
+    simply get a fresh connection per poll.
+    """
+
+    def __init__(self, url: str, timeout: float, executor: Executor):
+        self.url = url
+        self._conn = Connection(url, timeout=timeout)
+        self._executor = executor
+
+    @property
+    def connects(self) -> int:
+        return self._conn.connects
+
+    async def close(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.close)
+
+    async def get(self, path: str) -> Dict[str, Any]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.request, "GET", path)
+
+
+class FleetAggregator:
+    """
+    Poll many TrueFan nodes concurrently and keep a merged in-memory view.
+
+    Each node is polled every interval with its own timeout; failures back
+    off exponentially up to MAX_BACKOFF_SECONDS, and a successful poll
+    resets the node to the normal cadence.
+    """
+
+    def __init__(
+        self,
+        nodes: List[str],
+        interval: float = DEFAULT_INTERVAL_SECONDS,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        # The socket timeout bounds each poll, so a slow node only ties up its own worker.
+        workers = max(1, min(concurrency, len(nodes)))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet")
+        self.clients = {node: NodeClient(node, timeout, self._executor) for node in nodes}
+        self.nodes: Dict[str, Dict[str, Any]] = {
+            node: {
+                "url": node,
+                "ok": False,
+                "status_code": 0,
+                "error": "not polled yet",
+                "latency_ms": None,
+                "last_ok_at": None,
+                "failures": 0,
+                "data": {},
+            }
+            for node in nodes
+        }
+        self._next_due = {node: 0.0 for node in nodes}
+        self._lock = threading.Lock()
+        self._body = b"{}"
+        self.rounds = 0
+
+    async def _poll_node(self, node: str, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                resp = await self.clients[node].get(STATUS_PATH)
+            except socket.timeout:
+                resp = result(False, 0, {}, "timeout")
+            except (OSError, HTTPException) as exc:
+                resp = result(False, 0, {}, f"connection_failed: {exc}")
+            except Exception as exc:
+                # One misbehaving node must not take the poller down with it.
+                LOGGER.exception("Unexpected error polling %s", node)
+                await self.clients[node].close()
+                resp = result(False, 0, {}, f"error: {exc}")
+            latency = time.monotonic() - started
+
+        state = dict(self.nodes[node])
+        state.update(ok=resp["ok"], status_code=resp["status_code"], error=resp["error"])
+        state["latency_ms"] = round(latency * 1000.0, 1)
+        if resp["ok"]:
+            state.update(failures=0, last_ok_at=time.time(), data=resp["data"])
+            self._next_due[node] = started + self.interval
+        else:
+            state["failures"] += 1
+            backoff = min(MAX_BACKOFF_SECONDS, self.interval * 2 ** (state["failures"] - 1))
+            self._next_due[node] = started + backoff
+        with self._lock:
+            self.nodes[node] = state
+
+    async def poll_once(self, force: bool = False) -> Dict[str, Any]:
+        """Poll every node that is due (or all of them with force) concurrently."""
+        now = time.monotonic()
+        due = [node for node in self.clients if force or self._next_due[node] <= now]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._poll_node(node, semaphore) for node in due))
+        self.rounds += 1
+        view = self.view()
+        body = json.dumps(view, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._body = body
+        return view
+
+    async def run(self, stop: asyncio.Event) -> None:
+        try:
+            while not stop.is_set():
+                started = time.monotonic()
+                try:
+                    await self.poll_once()
+                except Exception:
+                    LOGGER.exception("Fleet poll round failed")
+                # Wake for the earliest due node, but at least once per interval.
+                wait = min([self.interval] + [due - time.monotonic() for due in self._next_due.values()])
+                try:
+                    await asyncio.wait_for(stop.wait(), max(0.05, wait, started + 0.05 - time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await asyncio.gather(*(client.close() for client in self.clients.values()))
+            self._executor.shutdown(wait=False)
+
+    def view(self) -> Dict[str, Any]:
+        with self._lock:
+            nodes = {name: dict(state) for name, state in self.nodes.items()}
+
+        online = [state for state in nodes.values() if state["ok"]]
+        hottest = None
+        for name, state in nodes.items():
+            for sensor in state["data"].get("sensors") or []:
+                value = sensor.get("value")
+                if isinstance(value, (int, float)) and (hottest is None or value > hottest["value"]):
+                    hottest = {"node": name, "sensor": sensor.get("name"), "value": value}
+        return {
+            "summary": {
+                "nodes": len(nodes),
+                "online": len(online),
+                "offline": len(nodes) - len(online),
+                "hottest": hottest,
+                "failsafe_engaged": sorted(
+                    name
+                    for name, state in nodes.items()
+                    if ((state["data"].get("events") or {}).get("failsafe") or {}).get("engaged")
+                ),
+            },
+            "nodes": nodes,
+        }
+
+    def body(self) -> bytes:
+        with self._lock:
+            return self._body
+
+    def start_in_thread(self) -> threading.Thread:
+        """Run the poll loop on its own event loop in a daemon thread."""
+
+        def _main() -> None:
+            asyncio.run(self.run(asyncio.Event()))
+
+        thread = threading.Thread(target=_main, name="fleet-poller", daemon=True)
+        thread.start()
+        return thread
+
+
+def create_app(aggregator: FleetAggregator) -> Flask:
+    app = Flask(__name__, static_folder="static", template_folder="templates")
+    assets.install(app)
+
+    @app.route("/")
+    def index():
+        return render_template("fleet.html")
+
+    @app.route("/api/fleet")
+    def fleet():
+        # Encoded once per poll round; every request shares the same bytes.
+        return app.response_class(aggregator.body(), mimetype="application/json")
+
+    return app
+
+
+def _load_nodes(args: argparse.Namespace) -> List[str]:
+    nodes = [n.strip() for n in (args.nodes or "").split(",") if n.strip()]
+    if args.nodes_file:
+        with open(args.nodes_file, "r", encoding="utf-8") as f:
+            nodes += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return list(dict.fromkeys(nodes))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aggregate /status from many TrueFan nodes")
+    parser.add_argument("--nodes", help="comma-separated node URLs (host:port or http://host:port)")
+    parser.add_argument("--nodes-file", help="file with one node URL per line")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_SECONDS)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_SECONDS)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5003)
+    args = parser.parse_args()
+
+    nodes = _load_nodes(args)
+    if not nodes:
+        parser.error("no nodes given (use --nodes or --nodes-file)")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    aggregator = FleetAggregator(nodes, interval=args.interval, timeout=args.timeout)
+    aggregator.start_in_thread()
+    create_app(aggregator).run(host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+bind = "0.0.0.0:5002"
+workers = 2
+# Threads let a long /export stream occupy one slot without blocking other requests.
+threads = 4
+
+
+def when_ready(server):
+    from log_config import configure_logging
+
+    configure_logging()
+    # One sampler in the master feeds every worker through shared memory, so
+    # hardware probes and smartctl forks do not scale with the worker count.
+    # Its thread is running when workers are forked: sampler.py makes each fork
+    # wait out the current tick and has workers drop the master's sampler,
+    # shared backend and profile watcher, so no lock a tick takes is inherited
+    # held. The read pool, MQTT and watcher threads stay in the master; workers
+    # only read snapshots (read_snapshot) and never sample.
+    from sampler import start_background_sampler
+
+    start_background_sampler()
+    server.log.info("Shared sampler started")
+
+
+def post_fork(server, worker):
+    from log_config import configure_logging
+
+    # Each worker gets its own background log writer; threads do not survive fork.
+    configure_logging()
+
+
+def on_exit(server):
+    from sampler import _SAMPLER
+
+    if _SAMPLER is not None:
+        _SAMPLER.stop()
@@ -0,0 +1,293 @@
+import csv
+import heapq
+import io
+import json
+import logging
+import math
+import os
+import shutil
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+LOGGER = logging.getLogger(__name__)
+
+HISTORY_DIR_ENV_VAR = "TRUEFAN_HISTORY_DIR"
+DEFAULT_HISTORY_DIR = "history"
+RETENTION_DAYS = int(os.getenv("TRUEFAN_HISTORY_DAYS", "31"))
+# Records read per seek while streaming; bounds memory per series.
+READ_BATCH_RECORDS = 1024
+# Rows are joined into chunks of roughly this size before being yielded.
+EXPORT_CHUNK_BYTES = 64 * 1024
+AGGREGATES = ("mean", "min", "max", "last")
+
+# Each series is one append-only file per UTC day of fixed-size records:
+# timestamp (f64, Unix seconds) and value (f64). Timestamps only grow, so a
+# range start is found by binary search over record offsets.
+_RECORD = struct.Struct("<dd")
+
+Point = Tuple[float, float]
+Row = Tuple[float, str, float]
+
+
+def get_history_dir() -> str:
+    return os.getenv(HISTORY_DIR_ENV_VAR, "").strip() or DEFAULT_HISTORY_DIR
+
+
+def _day(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+def _series_dir(root: str, series: str) -> str:
+    if not series:
+        raise ValueError("empty series name")
+    name = quote(series, safe="")
+    if name in (".", ".."):
+        # quote() leaves dots alone; these two would name the root or its parent.
+        name = name.replace(".", "%2E")
+    return os.path.join(root, name)
+
+
+def snapshot_values(snapshot: Dict[str, Any]) -> Dict[str, float]:
+    """Flatten a sampler snapshot into series name -> value."""
+    values = {item["name"]: item.get("value") for item in snapshot.get("sensors") or []}
+    values.update(snapshot.get("temperatures") or {})
+    values.update((f"fan/{name}", rpm) for name, rpm in (snapshot.get("fan") or {}).items())
+    values.update((f"pwm/{fan['key']}", fan.get("pwm")) for fan in snapshot.get("fans") or [])
+    return values
+
+
+def is_chart_series(series: str) -> bool:
+    """Source temperatures (cpu, nvme, hdd), fan RPM and PWM; not every raw hwmon input."""
+    return "/" not in series or series.startswith(("fan/", "pwm/"))
+
+
+class HistoryWriter:
+    """
+    Appends samples to the on-disk history; used by the single sampler.
+
+    Files are opened unbuffered in append mode, so every record is visible
+    to readers in other processes as soon as append() returns. Day files
+    older than retention_days are removed when the UTC day rolls over.
+    """
+
+    def __init__(self, root: Optional[str] = None, retention_days: int = RETENTION_DAYS):
+        self.root = root or get_history_dir()
+        self.retention_days = retention_days
+        self._day: Optional[str] = None
+        self._files: Dict[str, BinaryIO] = {}
+        self._last: Dict[str, float] = {}
+
+    def append(self, timestamp: float, values: Dict[str, Optional[float]]) -> int:
+        day = _day(timestamp)
+        if day != self._day:
+            self.close()
+            self._day = day
+            self.prune(timestamp)
+
+        written = 0
+        for series, value in values.items():
+            if not isinstance(value, (int, float)) or not math.isfinite(value):
+                continue
+            # A clock stepping backwards would break the binary search.
+            if timestamp <= self._last.get(series, float("-inf")):
+                continue
+            f = self._files.get(series)
+            if f is None:
+                directory = _series_dir(self.root, series)
+                os.makedirs(directory, exist_ok=True)
+                f = self._files[series] = open(os.path.join(directory, f"{day}.bin"), "ab", buffering=0)
+            f.write(_RECORD.pack(timestamp, float(value)))
+            self._last[series] = timestamp
+            written += 1
+        return written
+
+    def prune(self, now: float) -> None:
+        cutoff = _day(now - self.retention_days * 86400)
+        for series in list_series(self.root):
+            directory = _series_dir(self.root, series)
+            for name in os.listdir(directory):
+                if name.endswith(".bin") and name[:-4] < cutoff:
+                    os.unlink(os.path.join(directory, name))
+            if not os.listdir(directory):
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+def known_series(names: Iterable[str], root: Optional[str] = None) -> List[str]:
+    """names unchanged if every one is a recorded series; ValueError naming the others."""
+    names = list(names)
+    recorded = set(list_series(root))
+    unknown = [name for name in names if name not in recorded]
+    if unknown:
+        raise ValueError(f"unknown series: {', '.join(unknown)}")
+    return names
+
+
+def list_series(root: Optional[str] = None) -> List[str]:
+    root = root or get_history_dir()
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return []
+    return sorted(unquote(name) for name in names if os.path.isdir(os.path.join(root, name)))
+
+
+def _lower_bound(f: BinaryIO, count: int, timestamp: float) -> int:
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(mid * _RECORD.size)
+        if _RECORD.unpack(f.read(_RECORD.size))[0] < timestamp:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def iter_series(series: str, start: float, end: float, root: Optional[str] = None) -> Iterator[Point]:
+    """Yield (timestamp, value) for start <= timestamp <= end, reading in batches."""
+    directory = _series_dir(root or get_history_dir(), series)
+    try:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".bin"))
+    except OSError:
+        return
+    first, last = _day(start), _day(end)
+    for name in names:
+        if not first <= name[:-4] <= last:
+            continue
+        with open(os.path.join(directory, name), "rb") as f:
+            # Ignore a trailing partial record the writer may be appending.
+            count = os.fstat(f.fileno()).st_size // _RECORD.size
+            index = _lower_bound(f, count, start)
+            f.seek(index * _RECORD.size)
+            while index < count:
+                batch = min(READ_BATCH_RECORDS, count - index)
+                for point in _RECORD.iter_unpack(f.read(batch * _RECORD.size)):
+                    if point[0] > end:
+                        return
+                    yield point
+                index += batch
+
+
+def downsample(points: Iterable[Point], step: float, agg: str = "mean") -> Iterator[Point]:
+    """Aggregate points into step-second buckets, labelled by bucket start."""
+    if agg not in AGGREGATES:
+        raise ValueError(f"agg must be one of {', '.join(AGGREGATES)}")
+    bucket = None
+    total = count = 0
+    low = high = latest = 0.0
+    for timestamp, value in points:
+        key = math.floor(timestamp / step) * step
+        if key != bucket:
+            if bucket is not None:
+                yield bucket, _aggregate(agg, total, count, low, high, latest)
+            bucket, total, count, low, high = key, 0.0, 0, value, value
+        total += value
+        count += 1
+        low, high, latest = min(low, value), max(high, value), value
+    if bucket is not None:
+        yield bucket, _aggregate(agg, total, count, low, high, latest)
+
+
+def _aggregate(agg: str, total: float, count: int, low: float, high: float, latest: float) -> float:
+    if agg == "min":
+        return low
+    if agg == "max":
+        return high
+    if agg == "last":
+        return latest
+    return total / count
+
+
+def _tagged(series: str, points: Iterable[Point]) -> Iterator[Row]:
+    for timestamp, value in points:
+        yield timestamp, series, value
+
+
+def iter_rows(
+    series: Iterable[str],
+    start: float,
+    end: float,
+    step: Optional[float] = None,
+    agg: str = "mean",
+    root: Optional[str] = None,
+) -> Iterator[Row]:
+    """
+    Merge several series into one time-ordered stream of rows.
+
+    Only one batch per series is held at a time, so memory does not depend
+    on the length of the range.
+    """
+    streams = []
+    for name in series:
+        points = iter_series(name, start, end, root)
+        if step:
+            points = downsample(points, step, agg)
+        streams.append(_tagged(name, points))
+    return heapq.merge(*streams)
+
+
+def parse_time(value: Optional[str], default: float) -> float:
+    """Accept Unix seconds or ISO 8601 (naive times are UTC)."""
+    if value is None or not value.strip():
+        return default
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(number):
+            raise ValueError(f"time must be finite: {value}")
+        return number
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _chunked(lines: Iterable[str]) -> Iterator[bytes]:
+    buf: List[str] = []
+    size = 0
+    for line in lines:
+        buf.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(buf).encode("utf-8")
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def _csv_lines(rows: Iterable[Row]) -> Iterator[str]:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    yield "timestamp,series,value\n"
+    for timestamp, series, value in rows:
+        writer.writerow((f"{timestamp:.3f}", series, f"{value:g}"))
+        yield out.getvalue()
+        out.seek(0)
+        out.truncate()
+
+
+def _ndjson_lines(rows: Iterable[Row]) -> Iterator[str]:
+    for timestamp, series, value in rows:
+        yield json.dumps({"timestamp": round(timestamp, 3), "series": series, "value": value}) + "\n"
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", _csv_lines),
+    "ndjson": ("application/x-ndjson", _ndjson_lines),
+}
+
+
+def export_chunks(rows: Iterable[Row], fmt: str) -> Iterator[bytes]:
+    """Encode rows as CSV or NDJSON in ~EXPORT_CHUNK_BYTES pieces."""
+    return _chunked(EXPORT_FORMATS[fmt][1](rows))
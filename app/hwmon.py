@@ -1,10 +1,51 @@
 import glob
 import logging
 import os
-from typing import Dict, Iterable, List, Optional, Union
+import re
+import threading
+import time
+from functools import partial
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
 
 LOGGER = logging.getLogger(__name__)
 HWMON_ROOT = "/sys/class/hwmon"
+TOPOLOGY_TTL_SECONDS = 300.0
+
+# Aggregate groups over "device/label" keys; devices deduplicated as nvme_2 etc.
+TEMP_GROUPS: Dict[str, str] = {
+    "cpu_cores": r"^(?:coretemp|k10temp)[^/]*/(?:Core \d+|Tccd\d+)$",
+    "nvme": r"^nvme[^/]*/",
+    "drives": r"^drivetemp[^/]*/",
+    "all": r"",
+}
+
+_INPUT_RE = re.compile(r"^temp([0-9]+)_input$")
+_FAN_RE = re.compile(r"^(?:fan([0-9]+)_input|pwm([0-9]+))$")
+_TOPOLOGY_LOCK = threading.Lock()
+_TOPOLOGY_CACHE: Dict[str, Tuple[float, "Topology"]] = {}
+_TOPOLOGY_GENERATION = 0
+
+
+class TempChannel(NamedTuple):
+    key: str
+    device: str
+    label: str
+    path: str
+
+
+class FanChannel(NamedTuple):
+    key: str
+    device: str
+    index: int
+    label: Optional[str]
+    rpm_path: Optional[str]
+    pwm_path: Optional[str]
+    enable_path: Optional[str]
+
+
+class Topology(NamedTuple):
+    temps: Tuple[TempChannel, ...]
+    fans: Tuple[FanChannel, ...]
 
 
 def get_hwmon_map(root: str = HWMON_ROOT) -> Dict[str, str]:
@@ -83,7 +124,7 @@ def find_best_sensor(
     for keyword in keywords:
         for sensor_name, sensor_path in hwmon_map.items():
             if keyword in sensor_name:
-                LOGGER.info("Matched keyword '%s' to %s", keyword, sensor_path)
+                LOGGER.debug("Matched keyword '%s' to %s", keyword, sensor_path)
                 return sensor_path
 
     raise LookupError(f"No hwmon device matched keywords: {keywords}")
@@ -147,14 +188,308 @@ def get_temp(hwmon_path: str, sensor_keyword: Optional[str] = None) -> float:
         target_input = preferred if preferred in input_files else input_files[0]
         LOGGER.debug("Using default temperature input: %s", target_input)
 
-    with open(target_input, "r", encoding="utf-8") as f:
-        raw = f.read().strip()
+    temp_c = _to_celsius(_read_text(target_input))
+    LOGGER.debug("Read temperature %.2fC from %s", temp_c, target_input)
+    return temp_c
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip()
 
+
+def _to_celsius(raw: str) -> float:
     value = float(raw)
     # hwmon temps are normally in millidegrees C.
-    temp_c = value / 1000.0 if value > 500.0 else value
-    LOGGER.debug("Read temperature %.2fC from %s", temp_c, target_input)
-    return temp_c
+    return value / 1000.0 if value > 500.0 else value
+
+
+def _label(hwmon_dir: str, entries: List[str], name: str) -> Optional[str]:
+    if f"{name}_label" not in entries:
+        return None
+    try:
+        return _read_text(os.path.join(hwmon_dir, f"{name}_label")) or None
+    except OSError:
+        return None
+
+
+def scan_topology(root: str = HWMON_ROOT) -> Topology:
+    """
+    Walk every hwmon device once and index its temperature and fan channels.
+
+    Devices sharing a name are kept and suffixed (nvme, nvme_2, ...).
+    Temperature channels without a temp*_label are labelled tempN. Fan
+    channels pair fanN_input with pwmN/pwmN_enable on the same device and
+    are keyed device/fanN, so keys stay put when another fan device appears.
+
+    Args:
+        root: Base hwmon directory.
+
+    Returns:
+        Topology: Channels in stable device/index order.
+    """
+    if not os.path.isdir(root):
+        return Topology((), ())
+
+    temps: List[TempChannel] = []
+    fans: List[Tuple[str, str, int, Optional[str], bool, bool, bool]] = []
+    seen: Dict[str, int] = {}
+    hwmon_dirs = sorted(
+        glob.glob(os.path.join(root, "hwmon*")),
+        key=lambda p: int(re.sub(r"\D", "", os.path.basename(p)) or 0),
+    )
+    for hwmon_dir in hwmon_dirs:
+        try:
+            name = _read_text(os.path.join(hwmon_dir, "name")).lower()
+            entries = os.listdir(hwmon_dir)
+        except OSError as e:
+            LOGGER.debug("Skipping %s: %s", hwmon_dir, e)
+            continue
+        if not name:
+            continue
+
+        seen[name] = seen.get(name, 0) + 1
+        device = name if seen[name] == 1 else f"{name}_{seen[name]}"
+
+        for index in sorted(int(m.group(1)) for m in map(_INPUT_RE.match, entries) if m):
+            label = _label(hwmon_dir, entries, f"temp{index}") or f"temp{index}"
+            temps.append(
+                TempChannel(
+                    key=f"{device}/{label}",
+                    device=device,
+                    label=label,
+                    path=os.path.join(hwmon_dir, f"temp{index}_input"),
+                )
+            )
+
+        fan_indexes = set()
+        for match in map(_FAN_RE.match, entries):
+            if match:
+                fan_indexes.add(int(match.group(1) or match.group(2)))
+        for index in sorted(fan_indexes):
+            fans.append(
+                (
+                    device,
+                    hwmon_dir,
+                    index,
+                    _label(hwmon_dir, entries, f"fan{index}"),
+                    f"fan{index}_input" in entries,
+                    f"pwm{index}" in entries,
+                    f"pwm{index}_enable" in entries,
+                )
+            )
+
+    fan_channels = tuple(
+        FanChannel(
+            key=f"{device}/fan{index}",
+            device=device,
+            index=index,
+            label=label,
+            rpm_path=os.path.join(hwmon_dir, f"fan{index}_input") if has_rpm else None,
+            pwm_path=os.path.join(hwmon_dir, f"pwm{index}") if has_pwm else None,
+            enable_path=os.path.join(hwmon_dir, f"pwm{index}_enable") if has_enable else None,
+        )
+        for device, hwmon_dir, index, label, has_rpm, has_pwm, has_enable in fans
+    )
+    return Topology(tuple(temps), fan_channels)
+
+
+def get_topology(root: str = HWMON_ROOT, refresh: bool = False) -> Topology:
+    """
+    Return the cached hwmon topology, rescanning after TOPOLOGY_TTL_SECONDS.
+    """
+    global _TOPOLOGY_GENERATION
+    now = time.monotonic()
+    with _TOPOLOGY_LOCK:
+        cached = _TOPOLOGY_CACHE.get(root)
+        if cached is not None and not refresh and now - cached[0] < TOPOLOGY_TTL_SECONDS:
+            return cached[1]
+
+    topology = scan_topology(root)
+    with _TOPOLOGY_LOCK:
+        previous = _TOPOLOGY_CACHE.get(root)
+        if previous is None or previous[1] != topology:
+            _TOPOLOGY_GENERATION += 1
+            LOGGER.debug(
+                "hwmon topology for %s: %d temp, %d fan channels",
+                root,
+                len(topology.temps),
+                len(topology.fans),
+            )
+        _TOPOLOGY_CACHE[root] = (now, topology)
+    return topology
+
+
+def get_temp_channels(root: str = HWMON_ROOT, refresh: bool = False) -> Tuple[TempChannel, ...]:
+    return get_topology(root, refresh).temps
+
+
+def get_fan_channels(root: str = HWMON_ROOT, refresh: bool = False) -> Tuple[FanChannel, ...]:
+    return get_topology(root, refresh).fans
+
+
+def invalidate_topology(root: str = HWMON_ROOT) -> None:
+    with _TOPOLOGY_LOCK:
+        _TOPOLOGY_CACHE.pop(root, None)
+
+
+def topology_generation() -> int:
+    return _TOPOLOGY_GENERATION
+
+
+class SensorFiles:
+    """
+    Keeps hwmon attribute files open and re-reads them with pread.
+
+    Saves an open()/close() pair per attribute per read for long-running
+    readers such as `fan.py watch`. Every handle is dropped when the
+    topology generation changes, and a handle that fails is reopened on
+    the next read.
+
+    Args:
+        root: Base hwmon directory.
+    """
+
+    def __init__(self, root: str = HWMON_ROOT):
+        self.root = root
+        self._fds: Dict[str, int] = {}
+        self._generation = topology_generation()
+
+    def read_text(self, path: str) -> str:
+        if self._generation != topology_generation():
+            self.close()
+            self._generation = topology_generation()
+        fd = self._fds.get(path)
+        if fd is None:
+            fd = self._fds[path] = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+        try:
+            return os.pread(fd, 64, 0).decode("utf-8").strip()
+        except OSError:
+            os.close(self._fds.pop(path))
+            raise
+
+    def close(self) -> None:
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+
+def read_temperature_map(root: str = HWMON_ROOT, files: Optional[SensorFiles] = None) -> Dict[str, float]:
+    """
+    Read every temp*_input on every hwmon device in one pass.
+
+    Args:
+        root: Base hwmon directory.
+        files: Open handles to read through instead of opening each file.
+
+    Returns:
+        Dict[str, float]: "device/label" -> Celsius, in topology order.
+        Unreadable channels are omitted; a vanished device triggers a
+        rescan on the next call.
+    """
+    return _read_temp_channels(get_temp_channels(root), root, files)
+
+
+def _read_temp_channels(
+    channels: Iterable[TempChannel], root: str, files: Optional[SensorFiles] = None
+) -> Dict[str, float]:
+    read = files.read_text if files is not None else _read_text
+    readings: Dict[str, float] = {}
+    for channel in channels:
+        try:
+            readings[channel.key] = _to_celsius(read(channel.path))
+        except FileNotFoundError:
+            invalidate_topology(root)
+        except (OSError, ValueError) as e:
+            LOGGER.debug("Failed reading %s: %s", channel.path, e)
+    return readings
+
+
+def temperature_readers(root: str = HWMON_ROOT) -> Dict[str, Callable[[], Dict[str, float]]]:
+    """
+    One reader per hwmon device, for reading devices concurrently.
+
+    Args:
+        root: Base hwmon directory.
+
+    Returns:
+        Dict[str, Callable]: "hwmon/<device>" -> function returning that
+        device's "device/label" -> Celsius readings, in topology order.
+    """
+    by_device: Dict[str, List[TempChannel]] = {}
+    for channel in get_temp_channels(root):
+        by_device.setdefault(channel.device, []).append(channel)
+    return {
+        f"hwmon/{device}": partial(_read_temp_channels, tuple(channels), root) for device, channels in by_device.items()
+    }
+
+
+def _read_int(path: Optional[str], root: str, files: Optional[SensorFiles] = None) -> Optional[int]:
+    if path is None:
+        return None
+    try:
+        return int(files.read_text(path) if files is not None else _read_text(path))
+    except FileNotFoundError:
+        invalidate_topology(root)
+    except (OSError, ValueError) as e:
+        LOGGER.debug("Failed reading %s: %s", path, e)
+    return None
+
+
+def read_fan_channels(root: str = HWMON_ROOT, files: Optional[SensorFiles] = None) -> List[Dict[str, object]]:
+    """
+    Read RPM, PWM duty and PWM mode for every indexed fan channel.
+
+    Args:
+        root: Base hwmon directory.
+        files: Open handles to read through instead of opening each file.
+
+    Returns:
+        List[Dict[str, object]]: One entry per channel with key, device,
+        index, label, rpm, pwm and pwm_enable (None where a file is absent).
+    """
+    return [
+        {
+            "key": channel.key,
+            "device": channel.device,
+            "index": channel.index,
+            "label": channel.label,
+            "rpm": _read_int(channel.rpm_path, root, files),
+            "pwm": _read_int(channel.pwm_path, root, files),
+            "pwm_enable": _read_int(channel.enable_path, root, files),
+        }
+        for channel in get_fan_channels(root)
+    ]
+
+
+def aggregate_temperatures(
+    readings: Dict[str, float],
+    groups: Optional[Dict[str, str]] = None,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compute count/max/mean per group of readings.
+
+    Args:
+        readings: Output of read_temperature_map().
+        groups: Group name -> regex matched against "device/label" keys.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Stats for every group with members.
+    """
+    patterns = [(name, re.compile(pattern)) for name, pattern in (groups or TEMP_GROUPS).items()]
+    acc: Dict[str, List[float]] = {}
+    for key, value in readings.items():
+        for name, pattern in patterns:
+            if pattern.search(key):
+                stats = acc.setdefault(name, [0, float("-inf"), 0.0])
+                stats[0] += 1
+                stats[1] = max(stats[1], value)
+                stats[2] += value
+
+    return {
+        name: {"count": int(count), "max": peak, "mean": round(total / count, 2)}
+        for name, (count, peak, total) in acc.items()
+    }
 
 
 def _doctest_usage():
@@ -173,6 +508,8 @@ def _doctest_usage():
     >>> p = find_best_sensor(["core", "asus"], root=str(root))
     >>> round(get_temp(p, "package"), 1)
     42.0
+    >>> read_temperature_map(str(root))
+    {'coretemp/Package id 0': 42.0}
     >>> td.cleanup()
     """
 
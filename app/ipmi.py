@@ -0,0 +1,272 @@
+import atexit
+import logging
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from backend import HardwareBackend
+from temperature_sources import _read_temp_smartctl
+
+LOGGER = logging.getLogger(__name__)
+
+IPMITOOL_ENV_VAR = "TRUEFAN_IPMITOOL"
+# Extra ipmitool arguments, e.g. "-I lanplus -H bmc.local -U ADMIN -f /run/ipmi.pass" for a remote BMC.
+IPMI_ARGS_ENV_VAR = "TRUEFAN_IPMI_ARGS"
+# One `sdr list` serves every read within this many seconds (temperatures and fans of one tick).
+CACHE_SECONDS = float(os.getenv("TRUEFAN_IPMI_CACHE", "1.0"))
+# A full SDR walk over KCS takes a second or two on older BMCs.
+TIMEOUT_SECONDS = 10.0
+# Supermicro BMCs treat fans under their lower threshold as failed and ramp everything to 100%.
+MIN_DUTY_PERCENT = int(os.getenv("TRUEFAN_IPMI_MIN_DUTY", "20"))
+
+# Supermicro OEM fan commands (X9 through X13 boards).
+FAN_MODE_GET = ("0x30", "0x45", "0x00")
+FAN_MODE_SET = ("0x30", "0x45", "0x01")
+FAN_DUTY_SET = ("0x30", "0x70", "0x66", "0x01")
+FAN_MODES = {"standard": 0, "full": 1, "optimal": 2, "heavyio": 4}
+# Handed back to the BMC when its mode could not be read before taking control (Supermicro's default).
+DEFAULT_FAN_MODE = "optimal"
+# Zone 0 drives FAN1..FANn (CPU/system), zone 1 drives FANA..FANx (peripheral).
+ZONES = (0, 1)
+
+_READING_RE = re.compile(r"^(-?\d+(?:\.\d+)?)\s+(.+)$")
+
+Temperatures = Dict[str, float]
+FanReadings = Dict[str, int]
+
+
+def parse_sdr(text: str) -> Tuple[Temperatures, FanReadings]:
+    """
+    Temperatures and fan speeds from `ipmitool sdr list` output.
+
+    Lines look like "CPU Temp | 45 degrees C | ok" or "FAN1 | 1400 RPM | ok";
+    sensors with "no reading", or whose units are neither, are skipped.
+    Temperatures are keyed "device/label" like hwmon readings, with the
+    device chosen so the cpu/nvme/hdd sources recognise BMC sensors.
+    """
+    temperatures: Temperatures = {}
+    fans: FanReadings = {}
+    for line in text.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) < 2:
+            continue
+        match = _READING_RE.match(fields[1])
+        if not match:
+            continue
+        name, value, units = fields[0], float(match.group(1)), match.group(2).lower()
+        if units == "degrees c":
+            temperatures[f"{_temperature_device(name)}/{name}"] = value
+        elif units == "rpm":
+            fans[name] = int(value)
+    return temperatures, fans
+
+
+def _temperature_device(name: str) -> str:
+    lowered = name.lower()
+    if lowered.startswith("cpu"):
+        return "ipmi-cpu"
+    if "nvme" in lowered or "m.2" in lowered:
+        return "ipmi-nvme"
+    if "hdd" in lowered:
+        return "ipmi-hdd"
+    return "ipmi"
+
+
+def fan_zone(fan: str) -> int:
+    """FAN1..FANn are zone 0; lettered FANA, FANB, ... are zone 1."""
+    suffix = fan.upper().replace("FAN", "", 1).strip("_ ")
+    return 1 if suffix[:1].isalpha() else 0
+
+
+def duty_percent(pwm: int) -> int:
+    return max(MIN_DUTY_PERCENT, min(100, round(max(0, min(255, int(pwm))) * 100 / 255)))
+
+
+class IpmiBackend(HardwareBackend):
+    """
+    Sensors and fans behind a BMC, through ipmitool.
+
+    Every temperature and fan reading comes from one `ipmitool sdr list`
+    call whose parsed result is shared by all reads within cache_seconds,
+    so a sampler tick costs a single BMC round trip. PWM writes switch the
+    BMC to its "full" fan mode once (otherwise it overrides the duty) and
+    then set the duty per fan zone. The mode found before that is restored
+    by close() (on sampler stop and at interpreter exit) and by releasing
+    the failsafe. The BMC has no lease like the control agent's watchdog,
+    so a killed process leaves the last duty, never below MIN_DUTY_PERCENT.
+    SMART still comes from smartd/smartctl.
+    """
+
+    name = "ipmi"
+
+    def __init__(
+        self,
+        command: Optional[List[str]] = None,
+        cache_seconds: float = CACHE_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if command is None:
+            command = [os.getenv(IPMITOOL_ENV_VAR, "").strip() or "ipmitool"]
+            command += shlex.split(os.getenv(IPMI_ARGS_ENV_VAR, ""))
+        self.command = command
+        self.cache_seconds = cache_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._sdr: Tuple[Temperatures, FanReadings] = ({}, {})
+        self._read_at: Optional[float] = None
+        self._manual = False
+        self._original_mode: Optional[str] = None
+        self._duty: Dict[int, int] = {}
+        # Zone duties to put back when the failsafe releases; {} when the BMC was in charge.
+        self._failsafe_saved: Optional[Dict[int, int]] = None
+        self.calls = 0
+        self.last_error: Optional[str] = None
+
+    def _run(self, *args: str) -> str:
+        self.calls += 1
+        proc = subprocess.run(
+            self.command + list(args),
+            capture_output=True,
+            text=True,
+            timeout=TIMEOUT_SECONDS,
+            check=False,
+        )
+        if proc.returncode != 0:
+            raise OSError(proc.stderr.strip() or f"ipmitool exited with {proc.returncode}")
+        return proc.stdout
+
+    def _failed(self, action: str, error: Exception) -> None:
+        message = f"{action}: {error}"
+        if message != self.last_error:
+            LOGGER.warning("IPMI %s", message)
+        self.last_error = message
+
+    def _readings(self) -> Tuple[Temperatures, FanReadings]:
+        with self._lock:
+            now = self.clock()
+            if self._read_at is None or now - self._read_at >= self.cache_seconds:
+                # A failed call is cached too, so a missing BMC costs one timeout per period, not per read.
+                self._read_at = now
+                try:
+                    self._sdr = parse_sdr(self._run("sdr", "list", "full"))
+                    self.last_error = None
+                except (OSError, subprocess.SubprocessError) as e:
+                    self._failed("sdr list failed", e)
+                    self._sdr = ({}, {})
+            return self._sdr
+
+    def read_temperatures(self) -> Dict[str, float]:
+        return dict(self._readings()[0])
+
+    def read_fans(self) -> List[Dict[str, Any]]:
+        fans = self._readings()[1]
+        channels = []
+        for index, (fan, rpm) in enumerate(fans.items(), start=1):
+            duty = self._duty.get(fan_zone(fan))
+            channels.append(
+                {
+                    "key": fan,
+                    "device": "ipmi",
+                    "index": index,
+                    "label": fan,
+                    "rpm": rpm,
+                    "pwm": round(duty * 255 / 100) if duty is not None else None,
+                    "pwm_enable": 1 if self._manual else None,
+                }
+            )
+        return channels
+
+    def read_smart(self, device: str) -> Optional[Dict[str, Any]]:
+        return _read_temp_smartctl(device)
+
+    def set_fan_mode(self, mode: str) -> bool:
+        """Switch the BMC fan mode ("standard", "full", "optimal", "heavyio")."""
+        try:
+            self._run("raw", *FAN_MODE_SET, f"0x{FAN_MODES[mode]:02x}")
+        except (OSError, subprocess.SubprocessError) as e:
+            self._failed(f"setting fan mode {mode} failed", e)
+            return False
+        self._manual = mode == "full"
+        if not self._manual:
+            self._duty.clear()
+        return True
+
+    def fan_mode(self) -> Optional[str]:
+        try:
+            code = int(self._run("raw", *FAN_MODE_GET).split()[0], 16)
+        except (OSError, subprocess.SubprocessError, IndexError, ValueError) as e:
+            self._failed("reading fan mode failed", e)
+            return None
+        return next((mode for mode, value in FAN_MODES.items() if value == code), str(code))
+
+    def _take_control(self) -> bool:
+        if self._original_mode is None:
+            self._original_mode = self.fan_mode() or DEFAULT_FAN_MODE
+            atexit.register(self.close)
+        return self.set_fan_mode("full")
+
+    def _set_zone(self, zone: int, duty: int) -> bool:
+        try:
+            self._run("raw", *FAN_DUTY_SET, f"0x{zone:02x}", f"0x{duty:02x}")
+        except (OSError, subprocess.SubprocessError) as e:
+            self._failed(f"setting zone {zone} duty failed", e)
+            return False
+        self._duty[zone] = duty
+        return True
+
+    def set_pwm(self, pwm: int, channel: Optional[str] = None) -> bool:
+        """Set the duty of channel's zone (or of every zone); fans share a zone's duty."""
+        # Like the control agent, a held failsafe refuses writes until it is released.
+        if self._failsafe_saved is not None:
+            self.last_error = "Failsafe engaged"
+            return False
+        return self._write(pwm, channel)
+
+    def _write(self, pwm: int, channel: Optional[str]) -> bool:
+        if channel is not None and channel not in self._readings()[1]:
+            LOGGER.error("No IPMI fan %s", channel)
+            self.last_error = f"No IPMI fan {channel}"
+            return False
+        if not self._manual and not self._take_control():
+            return False
+        duty = duty_percent(pwm)
+        return all(self._set_zone(zone, duty) for zone in (ZONES if channel is None else (fan_zone(channel),)))
+
+    def restore_mode(self) -> bool:
+        """Hand fan control back to the BMC in the mode it had before the first write."""
+        if not self._manual or self._original_mode in (None, "full"):
+            return True
+        if not self.set_fan_mode(self._original_mode):
+            return False
+        LOGGER.info("BMC fan mode restored to %s", self._original_mode)
+        return True
+
+    def close(self) -> None:
+        self.restore_mode()
+
+    def engage_failsafe(self) -> bool:
+        if self._failsafe_saved is None:
+            self._failsafe_saved = dict(self._duty) if self._manual else {}
+        return self._write(255, None)
+
+    def release_failsafe(self) -> bool:
+        saved, self._failsafe_saved = self._failsafe_saved, None
+        if saved is None:
+            return True
+        if not saved:
+            return self.restore_mode()
+        return all(self._set_zone(zone, duty) for zone, duty in saved.items())
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "command": self.command[0],
+            "calls": self.calls,
+            "manual": self._manual,
+            "original_mode": self._original_mode,
+            "zone_duty_percent": dict(sorted(self._duty.items())),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,235 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+QUEUE_SIZE = 10000
+DEDUP_WINDOW_SECONDS = float(os.getenv("TRUEFAN_LOG_DEDUP_WINDOW", "60"))
+DEFAULT_RATE = float(os.getenv("TRUEFAN_LOG_RATE", "5"))
+RATE_BURST = 20
+FLUSH_INTERVAL_SECONDS = 5.0
+
+_STATE_LOCK = threading.Lock()
+_STATE: Optional[Tuple[int, "LogThrottle", logging.handlers.QueueListener]] = None
+
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    """Parse "logger=rate,..." (records per second) as in TRUEFAN_LOG_RATE_LIMITS."""
+    rates: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, sep, rate = part.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            rates[name.strip()] = max(0.0, float(rate))
+        except ValueError:
+            continue
+    return rates
+
+
+class _Repeat:
+    __slots__ = ("started", "suppressed", "record")
+
+    def __init__(self, started: float, record: logging.LogRecord):
+        self.started = started
+        self.suppressed = 0
+        self.record = record
+
+
+class LogThrottle(logging.Filter):
+    """
+    Collapse repeated records and cap each logger's record rate.
+
+    The first record for a key (logger, level, message template and args)
+    passes; repeats inside the dedup window are only counted. Once the
+    window has passed, the next occurrence, or flush() if none comes, carries
+    a "[repeated N×]" summary. Each logger also has a token bucket of
+    `rate` records per second (per-logger overrides in `rates`); records
+    over it are dropped and reported by flush(). WARNING and above are
+    never rate limited, only deduplicated, so a flood of debug output
+    cannot hide them. Suppressed records cost a dict lookup and a counter
+    increment, never formatting or I/O.
+    """
+
+    def __init__(
+        self,
+        window: float = DEDUP_WINDOW_SECONDS,
+        rate: float = DEFAULT_RATE,
+        rates: Optional[Dict[str, float]] = None,
+        burst: int = RATE_BURST,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        self.window = window
+        self.rate = rate
+        self.rates = rates or {}
+        self.burst = burst
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._repeats: Dict[tuple, _Repeat] = {}
+        self._buckets: Dict[str, List[float]] = {}
+        self._dropped: Dict[str, int] = {}
+
+    def _rate_for(self, name: str) -> float:
+        # Overrides match the logger or any parent ("sensors" covers "sensors.smart").
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return self.rate
+
+    def _take_token(self, name: str, now: float) -> bool:
+        rate = self._rate_for(name)
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = [float(self.burst), now]
+        bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1.0:
+            self._dropped[name] = self._dropped.get(name, 0) + 1
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        try:
+            key = (record.name, record.levelno, record.msg, record.args)
+            hash(key)
+        except TypeError:
+            key = (record.name, record.levelno, record.msg)
+        now = self.clock()
+        with self._lock:
+            repeat = self._repeats.get(key)
+            if repeat is not None and now - repeat.started < self.window:
+                repeat.suppressed += 1
+                repeat.record = record
+                return False
+            if record.levelno < logging.WARNING and not self._take_token(record.name, now):
+                return False
+            self._repeats[key] = _Repeat(now, record)
+            if repeat is not None and repeat.suppressed:
+                _annotate(record, repeat.suppressed, now - repeat.started)
+        return True
+
+    def flush(self, force: bool = False) -> List[logging.LogRecord]:
+        """Summaries for windows that ended (all windows with force) and rate-limit drops."""
+        now = self.clock()
+        summaries = []
+        with self._lock:
+            for key, repeat in list(self._repeats.items()):
+                if not force and now - repeat.started < self.window:
+                    continue
+                del self._repeats[key]
+                if repeat.suppressed:
+                    record = logging.makeLogRecord(repeat.record.__dict__)
+                    _annotate(record, repeat.suppressed, now - repeat.started)
+                    summaries.append(record)
+            dropped, self._dropped = self._dropped, {}
+        for name, count in dropped.items():
+            summaries.append(
+                logging.makeLogRecord(
+                    {
+                        "name": name,
+                        "levelno": logging.WARNING,
+                        "levelname": "WARNING",
+                        "msg": "Rate limit dropped %d records",
+                        "args": (count,),
+                    }
+                )
+            )
+        return summaries
+
+
+def _annotate(record: logging.LogRecord, count: int, elapsed: float) -> None:
+    record.msg = f"{record.getMessage()} [repeated {count}× in last {elapsed:.0f}s]"
+    record.args = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the queue is full the record is dropped."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_handlers(log_file: Optional[str]) -> List[logging.Handler]:
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=3))
+    formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    log_file: Optional[str] = None,
+    handlers: Optional[List[logging.Handler]] = None,
+) -> LogThrottle:
+    """
+    Route the root logger through a throttled queue to a background writer.
+
+    Callers only run the throttle and a put_nowait(); formatting and I/O
+    happen on the listener thread. Safe to call more than once: it is a
+    no-op in the same process, and rebuilds after a fork (the listener
+    thread does not survive one). Handlers installed by others are kept.
+    """
+    global _STATE
+    with _STATE_LOCK:
+        if _STATE is not None and _STATE[0] == os.getpid():
+            return _STATE[1]
+
+        throttle = LogThrottle(rates=parse_rate_limits(os.getenv("TRUEFAN_LOG_RATE_LIMITS", "")))
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(QUEUE_SIZE)
+        queue_handler = _DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(throttle)
+        listener = logging.handlers.QueueListener(
+            log_queue,
+            *(handlers or _build_handlers(log_file or os.getenv("TRUEFAN_LOG_FILE", "").strip() or None)),
+            respect_handler_level=True,
+        )
+
+        root = logging.getLogger()
+        # Drop the handler a parent process installed; its listener thread did not survive the fork.
+        for handler in list(root.handlers):
+            if isinstance(handler, _DroppingQueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel((level or os.getenv("TRUEFAN_LOG_LEVEL", "INFO")).upper())
+        listener.start()
+        pid = os.getpid()
+        _STATE = (pid, throttle, listener)
+
+    stop = threading.Event()
+
+    def _flush_summaries() -> None:
+        while not stop.wait(FLUSH_INTERVAL_SECONDS):
+            for record in throttle.flush():
+                queue_handler.enqueue(record)
+
+    threading.Thread(target=_flush_summaries, name="log-summaries", daemon=True).start()
+
+    def _shutdown() -> None:
+        if os.getpid() != pid:
+            return
+        stop.set()
+        for record in throttle.flush(force=True):
+            queue_handler.enqueue(record)
+        listener.stop()
+
+    atexit.register(_shutdown)
+    return throttle
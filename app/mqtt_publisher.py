@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from history import snapshot_values
+
+LOGGER = logging.getLogger(__name__)
+
+MQTT_HOST_ENV_VAR = "TRUEFAN_MQTT_HOST"
+MQTT_PORT = int(os.getenv("TRUEFAN_MQTT_PORT", "1883"))
+# Per-series topics live under the prefix; "<prefix>/status" is online/offline.
+MQTT_PREFIX = os.getenv("TRUEFAN_MQTT_PREFIX", "").strip() or f"truefan/{socket.gethostname()}"
+# Also publish every changed sample as one JSON document on "<prefix>/state".
+MQTT_BATCH = os.getenv("TRUEFAN_MQTT_BATCH", "").strip().lower() in ("1", "true", "yes", "on")
+KEEPALIVE_SECONDS = 30
+# Samples waiting while the broker is slow or away; the oldest are dropped first.
+QUEUE_SIZE = int(os.getenv("TRUEFAN_MQTT_QUEUE", "8"))
+MAX_BACKOFF_SECONDS = 60.0
+CONNECT_TIMEOUT_SECONDS = 5.0
+
+# Smallest change worth publishing, by series prefix; temperatures use the default.
+DEFAULT_DEADBAND = float(os.getenv("TRUEFAN_MQTT_DEADBAND", "0.5"))
+DEADBANDS = {"fan/": 50.0, "pwm/": 2.0}
+
+# MQTT 3.1.1 control packets (QoS 0 only).
+CONNECT, CONNACK, PUBLISH, PINGREQ, PINGRESP, DISCONNECT = 0x10, 0x20, 0x30, 0xC0, 0xD0, 0xE0
+CONNACK_ERRORS = {
+    1: "unacceptable protocol version",
+    2: "client identifier rejected",
+    3: "server unavailable",
+    4: "bad user name or password",
+    5: "not authorized",
+}
+
+
+class MqttError(Exception):
+    """The broker refused or broke the MQTT session."""
+
+
+def _remaining_length(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        n, digit = divmod(n, 128)
+        out.append(digit | (0x80 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def _packet(header: int, body: bytes = b"") -> bytes:
+    return bytes((header,)) + _remaining_length(len(body)) + body
+
+
+def _string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack("!H", len(data)) + data
+
+
+def connect_packet(
+    client_id: str,
+    keepalive: int,
+    will: Optional[Tuple[str, str]] = None,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+) -> bytes:
+    flags = 0x02  # clean session
+    payload = _string(client_id)
+    if will is not None:
+        flags |= 0x04 | 0x20  # retained will, QoS 0
+        payload += _string(will[0]) + _string(will[1])
+    if username is not None:
+        flags |= 0x80
+        payload += _string(username)
+        if password is not None:
+            flags |= 0x40
+            payload += _string(password)
+    return _packet(CONNECT, _string("MQTT") + bytes((4, flags)) + struct.pack("!H", keepalive) + payload)
+
+
+def publish_packet(topic: str, payload: str, retain: bool = False) -> bytes:
+    return _packet(PUBLISH | (0x01 if retain else 0), _string(topic) + payload.encode("utf-8"))
+
+
+def topic_for(prefix: str, series: str) -> str:
+    """Series name as a topic level path; MQTT wildcards and spaces are replaced."""
+    return f"{prefix}/" + series.replace(" ", "_").replace("+", "_").replace("#", "_")
+
+
+def _deadband(series: str) -> float:
+    return next((band for prefix, band in DEADBANDS.items() if series.startswith(prefix)), DEFAULT_DEADBAND)
+
+
+class MqttPublisher:
+    """
+    Pushes sampler snapshots to an MQTT broker from its own thread.
+
+    offer() only appends to a bounded queue, so the sampler never waits on
+    the network; when the broker is slow or down the oldest queued samples
+    are dropped. Each series is published (retained) to its own topic only
+    when it moved by more than its deadband since the value last sent, and
+    everything is republished after a reconnect. Connection failures are
+    retried with exponential backoff up to MAX_BACKOFF_SECONDS.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int = MQTT_PORT,
+        prefix: str = MQTT_PREFIX,
+        batch: bool = MQTT_BATCH,
+        queue_size: int = QUEUE_SIZE,
+        keepalive: int = KEEPALIVE_SECONDS,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.prefix = prefix.rstrip("/")
+        self.batch = batch
+        self.keepalive = keepalive
+        self.username = username
+        self.password = password
+        self._queue: Deque[Tuple[float, Dict[str, Any]]] = deque(maxlen=queue_size)
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sock: Optional[socket.socket] = None
+        self._sent: Dict[str, float] = {}
+        self._backoff = 1.0
+        self._retry_at = 0.0
+        self._last_tx = self._last_rx = 0.0
+        self.stats = {"offered": 0, "dropped": 0, "published": 0, "connects": 0, "failures": 0}
+        self.last_error: Optional[str] = None
+
+    def offer(self, snapshot: Dict[str, Any]) -> None:
+        values = snapshot_values(snapshot)
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.stats["dropped"] += 1
+            self._queue.append((snapshot.get("sampled_at") or time.time(), values))
+            self.stats["offered"] += 1
+            self._cond.notify()
+
+    def _connect(self) -> None:
+        sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT_SECONDS)
+        try:
+            sock.sendall(
+                connect_packet(
+                    f"truefan-{socket.gethostname()}-{os.getpid()}",
+                    self.keepalive,
+                    will=(f"{self.prefix}/status", "offline"),
+                    username=self.username,
+                    password=self.password,
+                )
+            )
+            reply = b""
+            while len(reply) < 4:
+                chunk = sock.recv(4 - len(reply))
+                if not chunk:
+                    raise MqttError("connection closed before CONNACK")
+                reply += chunk
+            if reply[0] != CONNACK:
+                raise MqttError(f"expected CONNACK, got packet type {reply[0] >> 4}")
+            if reply[3]:
+                raise MqttError(f"connection refused: {CONNACK_ERRORS.get(reply[3], reply[3])}")
+        except Exception:
+            sock.close()
+            raise
+        self._sock = sock
+        self._sent.clear()
+        self._last_tx = self._last_rx = time.monotonic()
+        self._backoff = 1.0
+        self.stats["connects"] += 1
+        LOGGER.info("MQTT connected to %s:%d as %s", self.host, self.port, self.prefix)
+        self._send(publish_packet(f"{self.prefix}/status", "online", retain=True))
+
+    def _disconnect(self, error: Exception) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self.stats["failures"] += 1
+        self.last_error = str(error) or type(error).__name__
+        self._retry_at = time.monotonic() + self._backoff
+        LOGGER.warning("MQTT %s:%d unavailable (%s); retrying in %.0fs", self.host, self.port, error, self._backoff)
+        self._backoff = min(MAX_BACKOFF_SECONDS, self._backoff * 2)
+
+    def _send(self, data: bytes) -> None:
+        self._sock.sendall(data)
+        self._last_tx = time.monotonic()
+
+    def _publish(self, sampled_at: float, values: Dict[str, Any]) -> int:
+        changed = {}
+        for series, value in values.items():
+            if not isinstance(value, (int, float)):
+                continue
+            last = self._sent.get(series)
+            if last is None or abs(value - last) >= _deadband(series):
+                changed[series] = value
+        if not changed:
+            return 0
+        packets = [publish_packet(topic_for(self.prefix, s), f"{v:g}", retain=True) for s, v in changed.items()]
+        if self.batch:
+            state = {"sampled_at": round(sampled_at, 3), "values": values}
+            packets.append(publish_packet(f"{self.prefix}/state", json.dumps(state, separators=(",", ":"))))
+        self._send(b"".join(packets))
+        self._sent.update(changed)
+        self.stats["published"] += len(packets)
+        return len(packets)
+
+    def _service_socket(self) -> None:
+        """Read whatever the broker sent (PINGRESP) and keep the session alive."""
+        now = time.monotonic()
+        while select.select([self._sock], [], [], 0)[0]:
+            data = self._sock.recv(4096)
+            if not data:
+                raise MqttError("broker closed the connection")
+            self._last_rx = now
+        if now - self._last_rx > 1.5 * self.keepalive:
+            raise MqttError("no reply to keepalive")
+        if now - self._last_tx >= self.keepalive / 2:
+            self._send(_packet(PINGREQ))
+
+    def run_once(self, timeout: float) -> None:
+        """One step of the sender: (re)connect, or send the next queued sample."""
+        if self._sock is None:
+            wait = self._retry_at - time.monotonic()
+            if wait > 0:
+                self._stop.wait(min(wait, timeout))
+                return
+            try:
+                self._connect()
+            except (OSError, MqttError) as e:
+                self._disconnect(e)
+                return
+
+        with self._cond:
+            if not self._queue:
+                self._cond.wait(min(timeout, self.keepalive / 2))
+            sample = self._queue.popleft() if self._queue else None
+        try:
+            if sample is not None:
+                self._publish(*sample)
+            self._service_socket()
+        except (OSError, MqttError) as e:
+            # The sample is lost; the next one republishes whatever moved.
+            self._disconnect(e)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once(1.0)
+            except Exception:
+                LOGGER.exception("MQTT publisher iteration failed")
+                self._stop.wait(1.0)
+        if self._sock is not None:
+            try:
+                self._send(publish_packet(f"{self.prefix}/status", "offline", retain=True) + _packet(DISCONNECT))
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="truefan-mqtt", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def report(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = len(self._queue)
+        return dict(
+            self.stats,
+            broker=f"{self.host}:{self.port}",
+            prefix=self.prefix,
+            connected=self._sock is not None,
+            queued=queued,
+            last_error=self.last_error,
+        )
+
+
+def publisher_from_env() -> Optional[MqttPublisher]:
+    """A publisher for TRUEFAN_MQTT_HOST, or None when MQTT is not configured."""
+    host = os.getenv(MQTT_HOST_ENV_VAR, "").strip()
+    if not host:
+        return None
+    return MqttPublisher(
+        host,
+        username=os.getenv("TRUEFAN_MQTT_USERNAME") or None,
+        password=os.getenv("TRUEFAN_MQTT_PASSWORD") or None,
+    )
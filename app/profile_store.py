@@ -0,0 +1,201 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import tempfile
+import threading
+from typing import Callable, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "cool"
+POLL_INTERVAL_SECONDS = 2.0
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def _parse_profile(text: str) -> Optional[str]:
+    for line in text.splitlines():
+        if line.startswith("profile="):
+            return line.strip().split("=", 1)[1]
+    return None
+
+
+class ProfileStore:
+    """
+    The active fan profile, kept in memory and persisted atomically.
+
+    get() only re-reads the file when its stat signature (mtime, size,
+    inode) changed, so hot paths cost one stat(). set() writes a temp file
+    and renames it over the old one, so readers never see a partial file.
+    Subscribers are called with the new profile on every change, including
+    edits made by other processes once watch() has been started.
+    """
+
+    def __init__(self, path: str, default: str = DEFAULT_PROFILE):
+        self.path = path
+        self.default = default
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._profile = default
+        self._subscribers: List[Callable[[str], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._watch_holders = 0
+        self._stop = threading.Event()
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _refresh(self) -> Tuple[str, bool]:
+        signature = self._stat()
+        with self._lock:
+            if signature == self._signature:
+                return self._profile, False
+            profile = self.default
+            if signature is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        profile = _parse_profile(f.read()) or self.default
+                except OSError as e:
+                    LOGGER.debug("Failed reading profile file %s: %s", self.path, e)
+            changed = profile != self._profile
+            self._signature = signature
+            self._profile = profile
+            return profile, changed
+
+    def get(self) -> str:
+        profile, changed = self._refresh()
+        if changed:
+            self._notify(profile)
+        return profile
+
+    def set(self, name: str) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".profile-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(f"profile={name}\n")
+            os.replace(tmp, self.path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+        with self._lock:
+            changed = name != self._profile
+            self._profile = name
+            self._signature = self._stat()
+        if changed:
+            self._notify(name)
+
+    def subscribe(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _notify(self, profile: str) -> None:
+        LOGGER.info("Profile changed to: %s", profile)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(profile)
+            except Exception:
+                LOGGER.exception("Profile subscriber failed")
+
+    def watch(self) -> Callable[[], None]:
+        """
+        Start a background watcher (inotify, else mtime polling) for external edits.
+
+        Returns a release function; the watcher stops once every caller that
+        started it has released it (or on stop()).
+        """
+        with self._lock:
+            self._watch_holders += 1
+            if self._watcher is None:
+                self._stop = threading.Event()
+                fd = _inotify_fd(os.path.dirname(os.path.abspath(self.path)))
+                self._watcher = threading.Thread(
+                    target=self._watch, args=(fd, self._stop), name="profile-watch", daemon=True
+                )
+                self._watcher.start()
+        released = threading.Event()
+
+        def release() -> None:
+            if released.is_set():
+                return
+            released.set()
+            with self._lock:
+                self._watch_holders -= 1
+                if self._watch_holders > 0:
+                    return
+            self.stop()
+
+        return release
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stop.set()
+            self._watcher = None
+            self._watch_holders = 0
+
+    def forked(self) -> None:
+        """Reset state after fork: the watcher thread (and any lock it held) stayed in the parent."""
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._watch_holders = 0
+
+    def _watch(self, fd: Optional[int], stop: threading.Event) -> None:
+        if fd is None:
+            while not stop.wait(POLL_INTERVAL_SECONDS):
+                self.get()
+            return
+
+        name = os.path.basename(self.path).encode()
+        try:
+            while not stop.is_set():
+                ready, _, _ = select.select([fd], [], [], POLL_INTERVAL_SECONDS)
+                # Timeouts also re-check, in case the directory was replaced.
+                if not ready or name in _inotify_names(os.read(fd, 4096)):
+                    self.get()
+        finally:
+            os.close(fd)
+
+
+def _inotify_fd(directory: str) -> Optional[int]:
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, directory.encode(), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _inotify_names(buf: bytes) -> List[bytes]:
+    names = []
+    offset = 0
+    while offset + _INOTIFY_EVENT.size <= len(buf):
+        _wd, _mask, _cookie, length = _INOTIFY_EVENT.unpack_from(buf, offset)
+        offset += _INOTIFY_EVENT.size
+        names.append(buf[offset : offset + length].rstrip(b"\0"))
+        offset += length
+    return names
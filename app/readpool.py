@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# 0 workers reads every source inline, one after another.
+READ_WORKERS = int(os.getenv("TRUEFAN_READ_WORKERS", "4"))
+READ_DEADLINE_SECONDS = float(os.getenv("TRUEFAN_READ_DEADLINE", "0.25"))
+LATENCY_WINDOW = 64
+
+
+class LatencyStats:
+    """Rolling read latency of one source over its last `window` reads."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.reads = 0
+        self.errors = 0
+        self.missed_deadlines = 0
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.reads += 1
+
+    def report(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        report: Dict[str, Any] = {
+            "reads": self.reads,
+            "errors": self.errors,
+            "missed_deadlines": self.missed_deadlines,
+        }
+        if ordered:
+            report.update(
+                mean_ms=round(1000.0 * sum(ordered) / len(ordered), 3),
+                p50_ms=round(1000.0 * ordered[len(ordered) // 2], 3),
+                p95_ms=round(1000.0 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                max_ms=round(1000.0 * ordered[-1], 3),
+            )
+        return report
+
+
+class SourceResult(NamedTuple):
+    value: Any
+    stale: bool
+    age_seconds: Optional[float]
+
+
+class DeadlineReader:
+    """
+    Runs one tick's source reads on a small worker pool under a deadline.
+
+    A source whose read has not finished by the deadline is reported with
+    its last value and stale=True; the read keeps running and its result is
+    used on a later tick, and no second read of that source is started
+    while one is in flight. A read that raises also reports the last value
+    as stale. Latency is tracked per source, so one slow device shows up in
+    report() instead of delaying everything else.
+    """
+
+    def __init__(
+        self,
+        workers: int = READ_WORKERS,
+        deadline: float = READ_DEADLINE_SECONDS,
+        window: int = LATENCY_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.workers = max(0, workers)
+        self.deadline = deadline
+        self.window = window
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="truefan-read") if workers > 0 else None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        # source -> clock time its newest read was submitted
+        self._submitted_at: Dict[str, float] = {}
+        # source -> (last good value, clock time it was read)
+        self._last: Dict[str, Tuple[Any, float]] = {}
+        self.stats: Dict[str, LatencyStats] = {}
+
+    def _stats(self, name: str) -> LatencyStats:
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = LatencyStats(self.window)
+        return stats
+
+    def _finished(self, name: str, started: float, future: Future) -> None:
+        done_at = self.clock()
+        with self._lock:
+            if self._inflight.get(name) is future:
+                del self._inflight[name]
+            stats = self._stats(name)
+            stats.record(done_at - started)
+            error = future.exception()
+            if error is None:
+                self._last[name] = (future.result(), done_at)
+            else:
+                stats.errors += 1
+                LOGGER.debug("Read of %s failed: %s", name, error)
+
+    def _result(self, name: str, now: float) -> SourceResult:
+        with self._lock:
+            last = self._last.get(name)
+        if last is None:
+            return SourceResult(None, True, None)
+        return SourceResult(last[0], True, round(now - last[1], 3))
+
+    def read_all(self, tasks: Dict[str, Callable[[], Any]]) -> Dict[str, SourceResult]:
+        """Run tasks (source name -> read function) and return their results in the same order."""
+        if self._executor is None:
+            return {name: self._read_inline(name, read) for name, read in tasks.items()}
+
+        futures: Dict[str, Future] = {}
+        carried: Dict[str, float] = {}
+        for name, read in tasks.items():
+            started = self.clock()
+            with self._lock:
+                future = self._inflight.get(name)
+                submitted = future is None or future.done()
+                if submitted:
+                    future = self._inflight[name] = self._executor.submit(read)
+                    self._submitted_at[name] = started
+                else:
+                    carried[name] = self._submitted_at[name]
+            if submitted:
+                # Registered after the insert (and outside the lock: it runs at
+                # once if the read is already done), so it always clears it.
+                future.add_done_callback(partial(self._finished, name, started))
+            futures[name] = future
+        wait(futures.values(), timeout=max(0.0, self.deadline))
+
+        now = self.clock()
+        results = {}
+        for name, future in futures.items():
+            if future.done() and future.exception() is None:
+                # A read left over from an earlier tick is as old as its submission.
+                age = round(now - carried[name], 3) if name in carried else 0.0
+                results[name] = SourceResult(future.result(), False, age)
+                continue
+            if not future.done():
+                with self._lock:
+                    self._stats(name).missed_deadlines += 1
+            results[name] = self._result(name, now)
+        return results
+
+    def _read_inline(self, name: str, read: Callable[[], Any]) -> SourceResult:
+        future: Future = Future()
+        started = self.clock()
+        try:
+            future.set_result(read())
+        except Exception as e:  # recorded like a failed pooled read
+            future.set_exception(e)
+        self._finished(name, started, future)
+        if future.exception() is None:
+            return SourceResult(future.result(), False, 0.0)
+        return self._result(name, self.clock())
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "deadline_seconds": self.deadline,
+                "in_flight": sorted(self._inflight),
+                "sources": {name: stats.report() for name, stats in sorted(self.stats.items())},
+            }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,199 @@
+import argparse
+import bisect
+import csv
+import json
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fan import PROFILE_CURVES, RPM_PROFILE_CURVES
+from history import iter_series, parse_time
+
+try:
+    import numpy as np
+except ImportError:  # optional: replay falls back to a bisect-per-sample loop
+    np = None
+
+Curve = Tuple[Tuple[Tuple[float, int], ...], int]
+DEFAULT_THRESHOLDS = (70.0, 80.0)
+
+
+def curve_table(curve: Curve) -> Tuple[List[float], List[int]]:
+    """
+    Turn a hottest-first curve into ascending thresholds and the PWM for each band.
+
+    pwm = levels[bisect_right(thresholds, temp)] reproduces determine_pwm():
+    levels[0] is the floor and levels[i] applies from thresholds[i - 1] up.
+    """
+    steps, floor = curve
+    ordered = sorted((float(threshold), int(pwm)) for threshold, pwm in steps)
+    return [threshold for threshold, _ in ordered], [int(floor)] + [pwm for _, pwm in ordered]
+
+
+def resolve_curves(names: Optional[Iterable[str]] = None) -> Dict[str, Curve]:
+    """Built-in curves by name; RPM profiles replay the PWM curve they mirror."""
+    curves: Dict[str, Curve] = {}
+    for name in names or sorted(PROFILE_CURVES):
+        base = name[: -len("-rpm")] if name in RPM_PROFILE_CURVES else name
+        if base not in PROFILE_CURVES:
+            raise ValueError(f"unknown profile: {name}")
+        curves[name] = PROFILE_CURVES[base]
+    return curves
+
+
+def load_curves(path: str) -> Dict[str, Curve]:
+    """Candidate curves from JSON: {"name": {"steps": [[70, 255], [55, 180]], "floor": 100}}."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {
+        name: (tuple((float(t), int(p)) for t, p in spec["steps"]), int(spec["floor"])) for name, spec in raw.items()
+    }
+
+
+def load_history_trace(series: str, start: float, end: float, root: Optional[str] = None) -> Tuple[Any, Any]:
+    """Read one series from the history store into (timestamps, values) arrays."""
+    timestamps, values = array("d"), array("d")
+    for timestamp, value in iter_series(series, start, end, root):
+        timestamps.append(timestamp)
+        values.append(value)
+    return _as_arrays(timestamps, values)
+
+
+def load_csv_trace(path: str, series: str) -> Tuple[Any, Any]:
+    """Read one series from an /export CSV (timestamp,series,value)."""
+    timestamps, values = array("d"), array("d")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row["series"] == series:
+                timestamps.append(float(row["timestamp"]))
+                values.append(float(row["value"]))
+    return _as_arrays(timestamps, values)
+
+
+def _as_arrays(timestamps: array, values: array) -> Tuple[Any, Any]:
+    if np is None:
+        return timestamps, values
+    return np.frombuffer(timestamps, dtype=np.float64), np.frombuffer(values, dtype=np.float64)
+
+
+def _durations(timestamps: Sequence[float]) -> Any:
+    """Seconds each sample stays in effect; the last repeats the one before it."""
+    if np is not None:
+        ts = np.asarray(timestamps, dtype=np.float64)
+        if len(ts) < 2:
+            return np.zeros(len(ts))
+        dt = np.diff(ts)
+        return np.append(dt, dt[-1])
+    dt = array("d", (b - a for a, b in zip(timestamps, timestamps[1:])))
+    if dt:
+        dt.append(dt[-1])
+    elif len(timestamps):
+        dt.append(0.0)
+    return dt
+
+
+def _band_index(temps: Sequence[float], thresholds: List[float]) -> Any:
+    return np.searchsorted(np.asarray(thresholds), np.asarray(temps, dtype=np.float64), side="right")
+
+
+def replay_pwm(temps: Sequence[float], curve: Curve) -> Any:
+    """PWM per sample for a whole temperature trace."""
+    thresholds, levels = curve_table(curve)
+    if np is not None:
+        return np.asarray(levels, dtype=np.int16)[_band_index(temps, thresholds)]
+    return array("h", (levels[bisect.bisect_right(thresholds, temp)] for temp in temps))
+
+
+def _summarize(temps: Sequence[float], curve: Curve, dt: Any, total: float) -> Tuple[Any, Dict[str, Any]]:
+    thresholds, levels = curve_table(curve)
+    if np is not None:
+        index = _band_index(temps, thresholds)
+        pwm = np.asarray(levels, dtype=np.int16)[index]
+        changes = int(np.count_nonzero(pwm[1:] != pwm[:-1]))
+        # Seconds per curve band; bands sharing a PWM level are merged below.
+        per_band = np.bincount(index, weights=dt, minlength=len(levels))
+        weighted = float(np.dot(per_band, levels))
+    else:
+        pwm = replay_pwm(temps, curve)
+        changes = sum(1 for a, b in zip(pwm, pwm[1:]) if a != b)
+        per_band = [0.0] * len(levels)
+        for temp, seconds in zip(temps, dt):
+            per_band[bisect.bisect_right(thresholds, temp)] += seconds
+        weighted = sum(level * seconds for level, seconds in zip(levels, per_band))
+
+    seconds_at: Dict[int, float] = {}
+    for level, seconds in zip(levels, per_band):
+        if seconds:
+            seconds_at[level] = seconds_at.get(level, 0.0) + float(seconds)
+    return pwm, {
+        "pwm_changes": changes,
+        "mean_duty_percent": round(100.0 * weighted / (255.0 * total), 2) if total else 0.0,
+        "seconds_at_pwm": {level: round(s, 1) for level, s in sorted(seconds_at.items())},
+    }
+
+
+def evaluate_profiles(
+    timestamps: Sequence[float],
+    temps: Sequence[float],
+    curves: Dict[str, Curve],
+    thresholds: Iterable[float] = DEFAULT_THRESHOLDS,
+    keep_series: bool = False,
+) -> Dict[str, Any]:
+    """
+    Replay one temperature trace through every candidate curve.
+
+    The trace is open loop (recorded temperatures do not react to the
+    replayed PWM), so time above each temperature threshold is reported
+    once for the trace; per profile the report covers the PWM it would
+    have commanded. With keep_series the PWM arrays are included.
+    """
+    started = time.perf_counter()
+    dt = _durations(timestamps)
+    total = float(sum(dt)) if np is None else float(np.sum(dt))
+    if np is not None:
+        temps = np.asarray(temps, dtype=np.float64)
+        above = {str(t): round(float(np.sum(dt[temps >= t])), 1) for t in thresholds}
+    else:
+        above = {str(t): round(sum(d for v, d in zip(temps, dt) if v >= t), 1) for t in thresholds}
+
+    profiles: Dict[str, Any] = {}
+    for name, curve in curves.items():
+        pwm, profiles[name] = _summarize(temps, curve, dt, total)
+        if keep_series:
+            profiles[name]["pwm"] = pwm
+    return {
+        "samples": len(temps),
+        "seconds": round(total, 1),
+        "seconds_above": above,
+        "profiles": profiles,
+        "vectorized": np is not None,
+        "elapsed_seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded temperatures through fan profile curves")
+    parser.add_argument("--series", default="cpu", help="history series driving the curve (default: cpu)")
+    parser.add_argument("--from", dest="start", help="range start (Unix seconds or ISO 8601; default: 7 days ago)")
+    parser.add_argument("--to", dest="end", help="range end (default: now)")
+    parser.add_argument("--csv", help="read the trace from an /export CSV instead of the history store")
+    parser.add_argument("--profile", action="append", help="built-in profile to replay (repeatable; default: all)")
+    parser.add_argument("--curves", help="JSON file of candidate curves to replay as well")
+    parser.add_argument("--threshold", type=float, action="append", help="temperature threshold (repeatable)")
+    args = parser.parse_args()
+
+    if args.csv:
+        timestamps, temps = load_csv_trace(args.csv, args.series)
+    else:
+        end = parse_time(args.end, time.time())
+        timestamps, temps = load_history_trace(args.series, parse_time(args.start, end - 7 * 86400), end)
+
+    curves = resolve_curves(args.profile)
+    if args.curves:
+        curves.update(load_curves(args.curves))
+    report = evaluate_profiles(timestamps, temps, curves, args.threshold or DEFAULT_THRESHOLDS)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from backend import HardwareBackend, shared_backend
+from cadence import AdaptiveCadence, interval_bounds_from_env
+from control import is_read_only_mode
+from control_client import get_agent_health
+from events import ThermalEventEngine, default_rules
+from fan import PROFILE_STORE, curve_breakpoints, load_profile
+from feedforward import shared_feed_forward
+from history import HistoryWriter, snapshot_values
+from hwmon import aggregate_temperatures
+from mqtt_publisher import publisher_from_env
+from readpool import DeadlineReader, SourceResult
+from sensors import cached_smart_state, fan_rpms_from_channels
+from temperature_sources import backed_off_sources, get_source_capabilities, get_temperature_sources
+from virtual_sensors import load_virtual_sensors
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_PATH_ENV_VAR = "TRUEFAN_SNAPSHOT_PATH"
+# Cheap hwmon reads stay fast; smartctl forks back off while drives are flat.
+HWMON_INTERVAL_BOUNDS = interval_bounds_from_env(
+    "TRUEFAN_SAMPLE_MIN_INTERVAL", 0.5, "TRUEFAN_SAMPLE_MAX_INTERVAL", 5.0
+)
+SMART_INTERVAL_BOUNDS = interval_bounds_from_env(
+    "TRUEFAN_SMART_MIN_INTERVAL", 15.0, "TRUEFAN_SMART_MAX_INTERVAL", 300.0
+)
+SNAPSHOT_MAX_AGE_SECONDS = 15.0
+SEGMENT_SIZE = 256 * 1024
+READ_RETRIES = 64
+
+# Segment layout: sequence counter (u64), payload length (u32), JSON payload.
+# The sequence is odd while the writer is mid-update, so readers never lock:
+# they retry until they see the same even sequence before and after copying.
+_HEADER = struct.Struct("<QI")
+_SEQ = struct.Struct("<Q")
+
+_READER_LOCK = threading.Lock()
+_READER: Optional["SnapshotReader"] = None
+_SAMPLER: Optional["Sampler"] = None
+
+
+def get_snapshot_path() -> str:
+    path = os.getenv(SNAPSHOT_PATH_ENV_VAR, "").strip()
+    if path:
+        return path
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "truefan-snapshot")
+
+
+class SnapshotWriter:
+    """Single writer for the shared snapshot segment."""
+
+    def __init__(self, path: Optional[str] = None, size: int = SEGMENT_SIZE):
+        self.path = path or get_snapshot_path()
+        self.size = size
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+        self._seq = _SEQ.unpack_from(self._mm, 0)[0]
+        if self._seq % 2:
+            # A previous writer died mid-update; move back to a stable state.
+            self._seq += 1
+            _SEQ.pack_into(self._mm, 0, self._seq)
+
+    def write(self, snapshot: Dict[str, Any]) -> int:
+        payload = json.dumps(snapshot, separators=(",", ":")).encode("utf-8")
+        if len(payload) > self.size - _HEADER.size:
+            raise ValueError(f"snapshot of {len(payload)} bytes exceeds segment size {self.size}")
+
+        self._seq += 1
+        _SEQ.pack_into(self._mm, 0, self._seq)
+        self._mm[_HEADER.size : _HEADER.size + len(payload)] = payload
+        _HEADER.pack_into(self._mm, 0, self._seq, len(payload))
+        self._seq += 1
+        _SEQ.pack_into(self._mm, 0, self._seq)
+        return self._seq // 2
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class SnapshotReader:
+    """Lock-free reader for the shared snapshot segment."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_snapshot_path()
+        self._mm: Optional[mmap.mmap] = None
+        self._cached: tuple = (-1, None)
+
+    def _open(self) -> bool:
+        if self._mm is not None:
+            return True
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            size = os.fstat(fd).st_size
+            if size <= _HEADER.size:
+                return False
+            self._mm = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        return True
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        if not self._open():
+            return None
+
+        mm = self._mm
+        for _ in range(READ_RETRIES):
+            seq = _SEQ.unpack_from(mm, 0)[0]
+            if seq == 0:
+                return None
+            if seq % 2:
+                continue
+            cached_seq, cached = self._cached
+            if seq == cached_seq:
+                return cached
+
+            length = _HEADER.unpack_from(mm, 0)[1]
+            payload = mm[_HEADER.size : _HEADER.size + length]
+            if _SEQ.unpack_from(mm, 0)[0] != seq:
+                continue
+            try:
+                snapshot = json.loads(payload)
+            except ValueError:
+                continue
+            snapshot["version"] = seq // 2
+            self._cached = (seq, snapshot)
+            return snapshot
+
+        LOGGER.debug("Snapshot segment busy after %d retries", READ_RETRIES)
+        return None
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class Sampler:
+    """
+    Samples hardware and publishes each snapshot into the shared segment.
+
+    hwmon and SMART are separate groups, each with its own AdaptiveCadence:
+    every tick re-reads hwmon, while smartctl is only forked when the SMART
+    group is due and otherwise contributes its last values.
+    """
+
+    def __init__(self, path: Optional[str] = None, backend: Optional[HardwareBackend] = None):
+        self.writer = SnapshotWriter(path)
+        self.backend = backend or shared_backend()
+        self.hwmon_cadence = AdaptiveCadence(*HWMON_INTERVAL_BOUNDS)
+        self.smart_cadence = AdaptiveCadence(*SMART_INTERVAL_BOUNDS)
+        self._smart_devices: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._smart_prefetched: Dict[str, SourceResult] = {}
+        self._smart_due_at = 0.0
+        self.reads = DeadlineReader()
+        self.mqtt = publisher_from_env()
+        self.virtual = load_virtual_sensors()
+        self.events = ThermalEventEngine(
+            rules=default_rules() + self.virtual.alert_rules(),
+            actuator=None if is_read_only_mode() else self.drive_all_fans_full,
+            releaser=None if is_read_only_mode() else self.backend.release_failsafe,
+        )
+        self.history = HistoryWriter()
+        self.feedforward = shared_feed_forward()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Held for a whole tick; forks wait for it (see _before_fork).
+        self._tick = threading.RLock()
+        self._unsubscribe: Optional[Callable[[], None]] = None
+        self._release_watch: Optional[Callable[[], None]] = None
+
+    def wake(self, *_args: Any) -> None:
+        """Sample immediately instead of waiting out the current interval."""
+        self._wake.set()
+
+    def drive_all_fans_full(self) -> bool:
+        """Failsafe actuator: full duty on every channel."""
+        return self.backend.engage_failsafe()
+
+    def _read_smart(self, device: str, due: bool) -> Optional[Dict[str, Any]]:
+        prefetched = self._smart_prefetched.pop(device, None)
+        if prefetched is not None:
+            if not prefetched.stale:
+                self._smart_devices[device] = prefetched.value
+                return prefetched.value
+            # smartctl overran the deadline: report the last value as stale.
+            info = prefetched.value if prefetched.value is not None else self._smart_devices.get(device)
+            return dict(info, stale=True) if info is not None else None
+        # Devices that failed are paced by the source backoff, not the SMART cadence.
+        if due or self._smart_devices.get(device) is None:
+            self._smart_devices[device] = self.backend.read_smart(device)
+            return self._smart_devices[device]
+        # Between due ticks only the age of the last value moves on.
+        return cached_smart_state(device)
+
+    def _read(self, smart_due: bool) -> Tuple[Dict[str, float], Set[str]]:
+        """Stage 1: one deadline-bounded round of hwmon (and, when due, SMART) reads."""
+        tasks = self.backend.temperature_reads()
+        if smart_due:
+            # Drives SMART was asked about before are read alongside hwmon.
+            for device in self._smart_devices:
+                tasks[f"smart {device}"] = partial(self.backend.read_smart, device)
+        readings: Dict[str, float] = {}
+        stale_keys: Set[str] = set()
+        for name, result in self.reads.read_all(tasks).items():
+            if name.startswith("smart "):
+                self._smart_prefetched[name[len("smart ") :]] = result
+            elif result.value:
+                readings.update(result.value)
+                if result.stale:
+                    stale_keys.update(result.value)
+        return readings, stale_keys
+
+    def _sources(
+        self, readings: Dict[str, float], stale_keys: Set[str], smart_due: bool, now: float
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """Stage 2: named sources (SMART fallback, virtual sensors) and the flat value map."""
+        sensors = get_temperature_sources(
+            include_hdd=True,
+            readings=readings,
+            smart_reader=lambda device: self._read_smart(device, smart_due),
+            stale_keys=stale_keys,
+        )
+        self._smart_prefetched.clear()
+        values = dict(readings)
+        values.update((item["name"], item["value"]) for item in sensors)
+        for name, value in self.virtual.update(values, now).items():
+            sensors.append({"name": name, "value": value, "virtual": True})
+        return sensors, values
+
+    def _pace(
+        self, groups: Dict[str, Dict[str, float]], values: Dict[str, float], smart_due: bool, now: float
+    ) -> None:
+        """Stage 3: pick the next hwmon interval and, after a SMART round, the next SMART one."""
+        # The rate is taken on group means and the curve sensor, not on every raw reading:
+        # per-core jitter alone would otherwise keep the interval at its fastest bound.
+        trend = {f"group/{name}": stats["mean"] for name, stats in groups.items()}
+        # Curve steps apply to whichever sensor drives the curve (cpu unless configured).
+        curve_sensor, curve_temp = self.virtual.curve_sensor, values.get(self.virtual.curve_sensor)
+        if curve_temp is not None:
+            trend[curve_sensor] = curve_temp
+            self.hwmon_cadence.update(trend, now, {curve_sensor: curve_breakpoints(load_profile())})
+        else:
+            self.hwmon_cadence.update(trend, now)
+        if smart_due:
+            smart = {
+                device: info["value"]
+                for device, info in self._smart_devices.items()
+                if info is not None and info["state"] == "active"
+            }
+            self._smart_due_at = now + self.smart_cadence.update(smart, now)
+
+    def _react(self, values: Dict[str, float], now: float) -> List[Dict[str, Any]]:
+        """Stage 4: read the fans, evaluate alert rules (and the failsafe) and the feed-forward."""
+        fans = self.backend.read_fans()
+        self.events.evaluate({"time": now, "values": values, "fans": fans, "skipped": backed_off_sources()})
+        if self.events.critical_active():
+            self.hwmon_cadence.interval = self.hwmon_cadence.min_interval
+        if self.feedforward is not None:
+            self.feedforward.update()
+        return fans
+
+    def collect(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        smart_due = now >= self._smart_due_at
+        readings, stale_keys = self._read(smart_due)
+        sensors, values = self._sources(readings, stale_keys, smart_due, now)
+        groups = aggregate_temperatures(readings)
+        self._pace(groups, values, smart_due, now)
+        # Reported only: the control lease is renewed by the code that writes duties, never from here.
+        agent = get_agent_health(force=False)
+        fans = self._react(values, now)
+
+        return {
+            "sampled_at": time.time(),
+            "sensors": sensors,
+            "temperatures": readings,
+            "temperature_groups": groups,
+            "fan": fan_rpms_from_channels(fans),
+            "fans": fans,
+            "capabilities": get_source_capabilities(),
+            "agent": agent,
+            "sampling": {
+                "hwmon": self.hwmon_cadence.report(),
+                "smart": dict(self.smart_cadence.report(), devices=sorted(self._smart_devices)),
+                "reads": self.reads.report(),
+            },
+            "mqtt": self.mqtt.report() if self.mqtt is not None else None,
+            "events": self.events.report(),
+            "feedforward": self.feedforward.report() if self.feedforward is not None else None,
+        }
+
+    def sample_once(self) -> int:
+        snapshot = self.collect()
+        try:
+            self.history.append(snapshot["sampled_at"], snapshot_values(snapshot))
+        except OSError as e:
+            LOGGER.warning("Failed appending to history in %s: %s", self.history.root, e)
+        if self.mqtt is not None:
+            self.mqtt.offer(snapshot)
+        return self.writer.write(snapshot)
+
+    def _run(self) -> None:
+        LOGGER.info(
+            "Sampler publishing to %s (hwmon %.1f-%.1fs, smart %.0f-%.0fs)",
+            self.writer.path,
+            *HWMON_INTERVAL_BOUNDS,
+            *SMART_INTERVAL_BOUNDS,
+        )
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                with self._tick:
+                    self.sample_once()
+            except Exception:
+                LOGGER.exception("Sampler iteration failed")
+            self._wake.wait(max(0.0, self.hwmon_cadence.interval - (time.monotonic() - started)))
+            self._wake.clear()
+
+    def start(self) -> None:
+        # Profile edits from any worker (or by hand) republish at once, so the
+        # curve breakpoints and every worker's cached /status follow them.
+        self._unsubscribe = PROFILE_STORE.subscribe(self.wake)
+        self._release_watch = PROFILE_STORE.watch()
+        if self.mqtt is not None:
+            self.mqtt.start()
+        self._thread = threading.Thread(target=self._run, name="truefan-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+        if self._release_watch is not None:
+            self._release_watch()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.mqtt is not None:
+            self.mqtt.stop()
+        self.reads.close()
+        self.backend.close()
+        self.writer.close()
+        self.history.close()
+
+
+def start_background_sampler() -> Sampler:
+    global _SAMPLER
+    if _SAMPLER is None:
+        _SAMPLER = Sampler()
+        _SAMPLER.start()
+    return _SAMPLER
+
+
+# gunicorn starts the sampler in the master (when_ready) and forks workers
+# from it afterwards. Only the forking thread survives a fork, so a lock the
+# sampler held at that moment (profile store, SMART cache, backend) would stay
+# locked forever in the worker. Forks therefore wait for the current tick to
+# finish, and the worker drops its copy of the sampler: its threads, read
+# pool and open files belong to the master, and workers only read snapshots.
+# (The lock is reentrant, so a fork from the sampler thread itself still runs.)
+def _before_fork() -> None:
+    if _SAMPLER is not None:
+        _SAMPLER._tick.acquire()
+
+
+def _after_fork_in_parent() -> None:
+    if _SAMPLER is not None:
+        _SAMPLER._tick.release()
+
+
+def _after_fork_in_child() -> None:
+    global _SAMPLER
+    _SAMPLER = None
+
+
+os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent, after_in_child=_after_fork_in_child)
+
+
+def read_snapshot(max_age_seconds: float = SNAPSHOT_MAX_AGE_SECONDS) -> Optional[Dict[str, Any]]:
+    """
+    Return the latest shared snapshot, or None when no live sampler publishes one.
+
+    Callers fall back to sampling in-process when this returns None, so a
+    dev server or a dead sampler degrades to the per-worker behaviour.
+    """
+    global _READER
+    with _READER_LOCK:
+        if _READER is None:
+            _READER = SnapshotReader()
+        reader = _READER
+
+    snapshot = reader.read()
+    if snapshot is None:
+        return None
+    if time.time() - float(snapshot.get("sampled_at") or 0.0) > max_age_seconds:
+        return None
+    return snapshot
@@ -1,15 +1,25 @@
-import glob
 import json
 import logging
-import os
 import subprocess
-from typing import Any, Dict, Iterable, Optional, Union
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from hwmon import read_fan_channels
+from smartd import SMARTD
 
 LOGGER = logging.getLogger(__name__)
 _SMART_DENIED = False
 _SMART_DENIED_WARNED = False
 HWMON_ROOT = "/sys/class/hwmon"
 
+# smartctl -n standby reports these instead of touching a spun-down drive.
+LOW_POWER_MARKERS = ("standby mode", "sleep mode")
+
+_SMART_LOCK = threading.Lock()
+# device -> (last temperature, monotonic time it was read, last power state)
+_SMART_LAST: Dict[str, Tuple[Optional[float], float, str]] = {}
+
 TEMP_ATTRIBUTE_NAMES = {
     "temperature_celsius",
     "temperature_case",
@@ -64,40 +74,33 @@ def get_smart_capabilities() -> Dict[str, bool]:
     return {"smart_available": not _SMART_DENIED}
 
 
-def read_fan_rpms():
-    fans = {}
-    for hwmon_path in glob.glob(os.path.join(HWMON_ROOT, "hwmon*")):
-        try:
-            name_file = os.path.join(hwmon_path, "name")
-            with open(name_file, "r", encoding="utf-8") as f:
-                name = f.read().strip().lower()
-
-            if "nct" not in name and "asus" not in name:
-                continue
-
-            for fan_file in glob.glob(os.path.join(hwmon_path, "fan*_input")):
-                label = os.path.basename(fan_file).replace("_input", "")
-                try:
-                    with open(fan_file, "r", encoding="utf-8") as f:
-                        rpm = int(f.read().strip())
-                    fans[label] = rpm
-                except Exception:
-                    continue
-        except Exception:
-            continue
-    return fans
+def read_fan_rpms(root: str = HWMON_ROOT) -> Dict[str, int]:
+    """Return fan key -> RPM for every channel with a tachometer."""
+    return fan_rpms_from_channels(read_fan_channels(root))
 
 
-def read_smartctl_temperature(device: str) -> Union[float, Dict[str, bool], None]:
+def fan_rpms_from_channels(channels: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    return {str(ch["key"]): int(ch["rpm"]) for ch in channels if ch.get("rpm") is not None}
+
+
+def _is_low_power(data: Dict[str, Any], stderr: str) -> bool:
+    messages = data.get("smartctl", {}).get("messages", [])
+    texts = [str(m.get("string", "")) for m in messages if isinstance(m, dict)]
+    texts.append(stderr)
+    return any(marker in text.lower() for text in texts for marker in LOW_POWER_MARKERS)
+
+
+def _run_smartctl(device: str) -> Tuple[str, Optional[float]]:
     """
-    Read disk temperature using smartctl JSON output.
+    Run smartctl without waking sleeping drives.
 
     Returns:
-        float temperature in Celsius, or None if not available/supported.
+        (state, temperature) where state is "active", "standby", "denied"
+        or "unavailable".
     """
     try:
         proc = subprocess.run(
-            ["smartctl", "--json", "-A", device],
+            ["smartctl", "--json", "-n", "standby", "-A", device],
             capture_output=True,
             text=True,
             check=False,
@@ -105,32 +108,108 @@ def read_smartctl_temperature(device: str) -> Union[float, Dict[str, bool], None
         )
     except FileNotFoundError:
         LOGGER.warning("smartctl binary not found; SMART unavailable for %s", device)
-        return None
+        return "unavailable", None
     except Exception:
         LOGGER.exception("smartctl execution failed for %s", device)
-        return None
+        return "unavailable", None
 
     if "permission denied" in (proc.stderr or "").lower():
         _mark_smart_denied(device, proc.stderr or "")
-        return {"_smart_denied": True}
+        return "denied", None
 
     if not proc.stdout:
+        if _is_low_power({}, proc.stderr or ""):
+            return "standby", None
         LOGGER.error("smartctl produced no JSON output for %s", device)
-        return None
+        return "unavailable", None
 
     try:
         data = json.loads(proc.stdout)
     except json.JSONDecodeError:
         LOGGER.exception("Invalid smartctl JSON for %s", device)
-        return None
+        return "unavailable", None
+
+    if _is_low_power(data, proc.stderr or ""):
+        LOGGER.debug("Skipping SMART read for %s: drive is in standby", device)
+        return "standby", None
 
     temp = _to_float(data.get("temperature", {}).get("current"))
     if temp is not None:
-        return temp
+        return "active", temp
 
     temp = _extract_from_attributes(data)
     if temp is not None:
-        return temp
+        return "active", temp
 
     LOGGER.info("Temperature not supported or unavailable for %s", device)
-    return None
+    return "unavailable", None
+
+
+def _smart_state(device: str, state: str, cached: bool) -> Dict[str, Any]:
+    last = _SMART_LAST.get(device) if state in ("active", "standby") else None
+    value, read_at = (last[0], last[1]) if last else (None, None)
+    return {
+        "device": device,
+        "state": state,
+        "value": value,
+        "age_seconds": None if read_at is None else round(time.monotonic() - read_at, 1),
+        "cached": cached,
+    }
+
+
+def read_smart_state(device: str) -> Dict[str, Any]:
+    """
+    Poll one drive, reusing its last temperature while it sleeps.
+
+    A recent record in smartd's attribute log is used when there is one
+    (reported as cached, since smartd took it); smartctl is only run
+    otherwise.
+
+    Returns:
+        Dict with device, state ("active", "standby", "denied" or
+        "unavailable"), value (last known Celsius or None), age_seconds of
+        that value and whether it came from cache.
+    """
+    reading = SMARTD.temperature(device)
+    if reading is not None:
+        temp, sampled_at = reading
+        with _SMART_LOCK:
+            # Age counts from when smartd took the sample, not from now.
+            _SMART_LAST[device] = (temp, time.monotonic() - max(0.0, time.time() - sampled_at), "active")
+            return _smart_state(device, "active", cached=True)
+
+    state, temp = _run_smartctl(device)
+    with _SMART_LOCK:
+        if state == "active":
+            _SMART_LAST[device] = (temp, time.monotonic(), state)
+        elif state == "standby" and device in _SMART_LAST:
+            value, read_at, _previous = _SMART_LAST[device]
+            _SMART_LAST[device] = (value, read_at, state)
+        return _smart_state(device, state, cached=state != "active")
+
+
+def cached_smart_state(device: str) -> Optional[Dict[str, Any]]:
+    """Return the last polled state for a drive without running smartctl."""
+    with _SMART_LOCK:
+        last = _SMART_LAST.get(device)
+        if last is None:
+            return None
+        return _smart_state(device, last[2], cached=True)
+
+
+def read_smartctl_temperature(device: str) -> Union[float, Dict[str, bool], None]:
+    """
+    Read disk temperature using smartctl JSON output.
+
+    Drives in standby are not woken; their last known temperature is
+    returned instead (see read_smart_state() for the state and age).
+
+    Returns:
+        float temperature in Celsius, or None if not available/supported.
+    """
+    info = read_smart_state(device)
+    if info["state"] == "denied":
+        return {"_smart_denied": True}
+    if info["state"] == "unavailable":
+        return None
+    return info["value"]
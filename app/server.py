@@ -1,21 +1,35 @@
 import copy
+import json
 import logging
+import math
 import os
+import threading
+import time
 
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request
 from werkzeug.exceptions import HTTPException
 
+import assets
+import history
 from control import ReadOnlyModeError
 from control import load_profile as control_load_profile
 from control import set_profile as control_set_profile
-from sensors import read_fan_rpms
+from sensors import fan_rpms_from_channels
+from backend import shared_backend
 from control_client import get_agent_health
-from control_client import set_pwm as agent_set_pwm
-from sensors import get_smart_capabilities
-from temperature_sources import get_temperature_sources
+from hwmon import aggregate_temperatures, read_fan_channels, read_temperature_map
+from log_config import configure_logging
+from sampler import read_snapshot
+from temperature_sources import get_source_capabilities, get_temperature_sources
+
+try:
+    import orjson
+except ImportError:  # optional: faster encoder when installed
+    orjson = None
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
 LOGGER = logging.getLogger(__name__)
+asset_url = assets.install(app)
 
 DEFAULT_SENSORS = [
     {"name": "cpu", "value": 0.0},
@@ -31,30 +45,64 @@ DEFAULT_STATUS = {
     "sensors": copy.deepcopy(DEFAULT_SENSORS),
     "capabilities": {"smart_available": True},
     "fan": {"current_pwm": 0, "available_pwms": []},
+    "fans": [],
     "system": {"profile": "unknown", "uptime": "0h 0m", "load": "0.00 / 0.00 / 0.00"},
 }
 
 
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+API_INDEX = {
+    "status": "ok",
+    "message": "TrueFan API",
+    "endpoints": ["/sensors", "/sensors?mode=all", "/status", "/history", "/export", "/pwm/<value>", "/set/<profile>"],
+}
+
+# Fallback and static bodies are encoded once; the live ones are encoded once
+# per snapshot version (see _cached_body) and shared by every request.
+DEFAULT_SENSORS_BODY = _dumps(DEFAULT_SENSORS)
+DEFAULT_STATUS_BODY = _dumps(DEFAULT_STATUS)
+API_INDEX_BODY = _dumps(API_INDEX)
+
+_RESPONSE_LOCK = threading.Lock()
+_RESPONSE_CACHE = {}
+
+
 def _default_sensors():
     return copy.deepcopy(DEFAULT_SENSORS)
 
 
-def _default_status():
-    return {
-        "mode": "monitoring-only",
-        "agent_available": False,
-        "pwm_control_enabled": False,
-        "agent": {"online": False, "status_code": 0, "error": "uninitialized", "age_seconds": 0.0},
-        "sensors": _default_sensors(),
-        "capabilities": {"smart_available": True},
-        "fan": {"current_pwm": 0, "available_pwms": []},
-        "system": {"profile": "unknown", "uptime": "0h 0m", "load": "0.00 / 0.00 / 0.00"},
-    }
+def _json_body(body: bytes, status_code: int = 200):
+    return app.response_class(body, status=status_code, mimetype="application/json")
+
+
+def _cached_body(endpoint: str, key, build) -> bytes:
+    """
+    Return the encoded body for endpoint, rebuilding only when key changes.
+
+    key is None when there is no shared snapshot to version against; the
+    body is then built per request as before.
+    """
+    if key is None:
+        return _dumps(build())
+    with _RESPONSE_LOCK:
+        cached = _RESPONSE_CACHE.get(endpoint)
+    if cached is not None and cached[0] == key:
+        return cached[1]
 
+    body = _dumps(build())
+    with _RESPONSE_LOCK:
+        _RESPONSE_CACHE[endpoint] = (key, body)
+    return body
 
-def _get_agent_control_state():
+
+def _get_agent_control_state(snapshot=None):
     try:
-        health = get_agent_health(force=False)
+        health = snapshot["agent"] if snapshot else get_agent_health(force=False)
         if health.get("online"):
             return {
                 "mode": "full-control",
@@ -69,27 +117,30 @@ def _get_agent_control_state():
         "mode": "monitoring-only",
         "pwm_control_enabled": False,
         "agent_available": False,
-        "agent": get_agent_health(force=False),
+        "agent": snapshot["agent"] if snapshot else get_agent_health(force=False),
     }
 
 
-def _build_status_payload() -> dict:
-    payload = _default_status()
-    control_state = _get_agent_control_state()
-
-    payload["mode"] = control_state["mode"]
-    payload["agent_available"] = control_state["agent_available"]
-    payload["pwm_control_enabled"] = control_state["pwm_control_enabled"]
-    payload["agent"] = control_state["agent"]
-    payload["sensors"] = get_sensors_data() or _default_sensors()
-    payload["fan"] = read_fan_rpms()
-    payload["capabilities"] = get_smart_capabilities()
-    payload["system"] = {
-        "profile": get_profile() or DEFAULT_STATUS["system"]["profile"],
-        "uptime": get_uptime() or DEFAULT_STATUS["system"]["uptime"],
-        "load": get_cpu_load() or DEFAULT_STATUS["system"]["load"],
+def _build_status_payload(snapshot=None, profile=None) -> dict:
+    control_state = _get_agent_control_state(snapshot)
+    fans = snapshot["fans"] if snapshot else read_fan_channels()
+    return {
+        "sampled_at": snapshot.get("sampled_at") if snapshot else time.time(),
+        "mode": control_state["mode"],
+        "agent_available": control_state["agent_available"],
+        "pwm_control_enabled": control_state["pwm_control_enabled"],
+        "agent": control_state["agent"],
+        "sensors": get_sensors_data() or DEFAULT_SENSORS,
+        "capabilities": snapshot["capabilities"] if snapshot else get_source_capabilities(),
+        "fan": fan_rpms_from_channels(fans),
+        "fans": fans,
+        "events": snapshot.get("events") if snapshot else None,
+        "system": {
+            "profile": profile or get_profile() or DEFAULT_STATUS["system"]["profile"],
+            "uptime": get_uptime() or DEFAULT_STATUS["system"]["uptime"],
+            "load": get_cpu_load() or DEFAULT_STATUS["system"]["load"],
+        },
     }
-    return payload
 
 
 def _require_write_access():
@@ -124,7 +175,8 @@ def get_profile():
 
 def get_sensors_data():
     try:
-        sensors = get_temperature_sources(include_hdd=True)
+        snapshot = read_snapshot()
+        sensors = snapshot["sensors"] if snapshot else get_temperature_sources(include_hdd=True)
         if not sensors:
             LOGGER.warning("No temperature sources detected; using defaults")
             return _default_sensors()
@@ -134,6 +186,18 @@ def get_sensors_data():
         return _default_sensors()
 
 
+def get_all_temperatures():
+    try:
+        snapshot = read_snapshot()
+        if snapshot and "temperatures" in snapshot:
+            return {"temperatures": snapshot["temperatures"], "groups": snapshot["temperature_groups"]}
+        readings = read_temperature_map()
+        return {"temperatures": readings, "groups": aggregate_temperatures(readings)}
+    except Exception:
+        LOGGER.exception("Failed to enumerate temperatures")
+        return {"temperatures": {}, "groups": {}}
+
+
 def get_uptime():
     try:
         with open("/proc/uptime", "r", encoding="utf-8") as f:
@@ -162,22 +226,83 @@ def index():
 
 @app.route("/api")
 def api_index():
-    return jsonify(
-        {
-            "status": "ok",
-            "message": "TrueFan API",
-            "endpoints": ["/sensors", "/status", "/pwm/<value>", "/set/<profile>"],
-        }
-    )
+    return _json_body(API_INDEX_BODY)
 
 
 @app.route("/sensors")
 def sensors():
     try:
-        return jsonify(get_sensors_data())
+        snapshot = read_snapshot()
+        if request.args.get("mode") == "all":
+            key = snapshot["version"] if snapshot else None
+            return _json_body(_cached_body("sensors_all", key, get_all_temperatures))
+        key = snapshot["version"] if snapshot else None
+        return _json_body(_cached_body("sensors", key, get_sensors_data))
     except Exception:
         LOGGER.exception("Unexpected /sensors failure; returning defaults")
-        return jsonify(_default_sensors())
+        return _json_body(DEFAULT_SENSORS_BODY)
+
+
+def _requested_series():
+    """Series named in ?series=a,b, each checked against the recorded series."""
+    return history.known_series(name for name in request.args.get("series", "").split(",") if name)
+
+
+@app.route("/history")
+def history_points():
+    # Seeds the dashboard charts; later points arrive with each /status poll.
+    try:
+        seconds = min(float(request.args.get("seconds") or 900), 86400.0)
+        step = float(request.args.get("step") or 5) or None
+        if not (math.isfinite(seconds) and seconds > 0):
+            raise ValueError("seconds must be a positive number")
+        if step is not None and not (math.isfinite(step) and step > 0):
+            raise ValueError("step must be a positive number")
+        names = _requested_series()
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
+    end = time.time()
+    if not names:
+        names = [name for name in history.list_series() if history.is_chart_series(name)]
+    series = {}
+    for name in names:
+        points = history.iter_series(name, end - seconds, end)
+        if step:
+            points = history.downsample(points, step)
+        series[name] = [[round(t, 3), round(v, 2)] for t, v in points]
+    return _json_body(_dumps({"from": end - seconds, "to": end, "step": step, "series": series}))
+
+
+@app.route("/export")
+def export():
+    try:
+        end = history.parse_time(request.args.get("to"), time.time())
+        start = history.parse_time(request.args.get("from"), end - 86400)
+        fmt = request.args.get("format", "csv").lower()
+        if fmt not in history.EXPORT_FORMATS:
+            raise ValueError("format must be csv or ndjson")
+        step = float(request.args.get("step") or 0) or None
+        if step is not None and not (math.isfinite(step) and step > 0):
+            raise ValueError("step must be a positive number")
+        agg = request.args.get("agg", "mean").lower()
+        if agg not in history.AGGREGATES:
+            raise ValueError(f"agg must be one of {', '.join(history.AGGREGATES)}")
+        series = _requested_series() or history.list_series()
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
+    rows = history.iter_rows(series, start, end, step=step, agg=agg)
+    mimetype = history.EXPORT_FORMATS[fmt][0]
+    # No Content-Length: the body is produced lazily and sent chunked.
+    return Response(
+        history.export_chunks(rows, fmt),
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f'attachment; filename="truefan-history.{fmt}"',
+            "Cache-Control": "no-store",
+        },
+    )
 
 
 @app.route("/pwm/<value>", methods=["POST"])
@@ -187,14 +312,10 @@ def set_pwm(value):
         if not allowed:
             return _api_result(False, reason, None, 403)
 
-        resp = agent_set_pwm(int(value))
-        if resp.get("ok"):
-            return _api_result(True, None, {"pwm": (resp.get("data") or {}).get("pwm", int(value))}, 200)
-
-        status_code = int(resp.get("status_code") or 503)
-        if status_code == 0:
-            status_code = 503
-        return _api_result(False, "Control agent unavailable; monitoring-only mode", None, status_code)
+        backend = shared_backend()
+        if backend.set_pwm(int(value)):
+            return _api_result(True, None, {"pwm": int(value)}, 200)
+        return _api_result(False, backend.last_error or "PWM write failed; monitoring-only mode", None, 503)
     except ReadOnlyModeError as exc:
         LOGGER.exception("Write blocked in read-only mode")
         return _api_result(False, str(exc), None, 403)
@@ -238,10 +359,13 @@ def shutdown_container():
 @app.route("/status")
 def status():
     try:
-        return jsonify(_build_status_payload())
+        snapshot = read_snapshot()
+        profile = get_profile()
+        key = (snapshot["version"], profile) if snapshot else None
+        return _json_body(_cached_body("status", key, lambda: _build_status_payload(snapshot, profile)))
     except Exception:
         LOGGER.exception("Unexpected /status failure; returning defaults")
-        return jsonify(_default_status())
+        return _json_body(DEFAULT_STATUS_BODY)
 
 
 @app.errorhandler(404)
@@ -263,4 +387,5 @@ def handle_unexpected_error(err):
 
 
 if __name__ == "__main__":
+    configure_logging()
     app.run(host="127.0.0.1", port=5002)
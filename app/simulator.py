@@ -0,0 +1,223 @@
+import argparse
+import json
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from backend import HardwareBackend
+from fan import PROFILE_CURVES, determine_pwm
+from temperature_sources import get_temperature_sources
+
+AMBIENT_C = 30.0
+MAX_STEP_SECONDS = 1.0
+
+LoadFunction = Callable[[float], float]
+
+
+def step_load(idle: float = 15.0, busy: float = 95.0, period: float = 600.0, duty: float = 0.5) -> LoadFunction:
+    """CPU heat load in watts alternating between idle and busy every period."""
+
+    def load(t: float) -> float:
+        return busy if (t % period) < period * duty else idle
+
+    return load
+
+
+class ThermalNode:
+    """
+    One lumped body: C dT/dt = P - G(pwm) (T - ambient).
+
+    Conductance to ambient grows with fan duty as
+    G = g_idle + g_fan * (pwm / 255) ** exponent.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        capacity: float,
+        g_idle: float,
+        g_fan: float,
+        load: LoadFunction,
+        fan: str,
+        exponent: float = 0.8,
+        ambient: float = AMBIENT_C,
+    ):
+        self.key = key
+        self.capacity = capacity
+        self.g_idle = g_idle
+        self.g_fan = g_fan
+        self.load = load
+        self.fan = fan
+        self.exponent = exponent
+        self.ambient = ambient
+        self.temp = ambient
+
+    def conductance(self, pwm: int) -> float:
+        return self.g_idle + self.g_fan * (max(0, min(255, pwm)) / 255.0) ** self.exponent
+
+    def advance(self, t: float, dt: float, pwm: int) -> None:
+        # Exact solution for constant load and airflow over the step, so
+        # large steps stay stable however stiff the node is.
+        g = self.conductance(pwm)
+        steady = self.ambient + self.load(t) / g
+        self.temp = steady + (self.temp - steady) * math.exp(-g * dt / self.capacity)
+
+
+class ThermalPlant:
+    """CPU, NVMe and HDD nodes cooled by two fans, on a simulated clock."""
+
+    def __init__(self, cpu_load: Optional[LoadFunction] = None, ambient: float = AMBIENT_C):
+        self.time = 0.0
+        self.nodes = [
+            ThermalNode("coretemp/Package id 0", 400.0, 0.8, 3.2, cpu_load or step_load(), "fan1", ambient=ambient),
+            ThermalNode("nvme/Composite", 20.0, 0.1, 0.3, lambda t: 4.0, "fan2", ambient=ambient),
+            ThermalNode("drivetemp/temp1", 600.0, 0.15, 0.35, lambda t: 7.0, "fan2", ambient=ambient),
+        ]
+        self.pwm: Dict[str, int] = {"fan1": 0, "fan2": 0}
+        self.max_rpm = {"fan1": 2000, "fan2": 1400}
+        self.start_pwm = 40
+
+    def advance(self, seconds: float) -> None:
+        while seconds > 0:
+            dt = min(MAX_STEP_SECONDS, seconds)
+            for node in self.nodes:
+                node.advance(self.time, dt, self.pwm[node.fan])
+            self.time += dt
+            seconds -= dt
+
+    def rpm(self, fan: str) -> int:
+        pwm = self.pwm[fan]
+        return 0 if pwm < self.start_pwm else round(self.max_rpm[fan] * pwm / 255.0)
+
+
+class SimulatedBackend(HardwareBackend):
+    """A ThermalPlant behind the backend interface; time only moves via advance()."""
+
+    name = "sim"
+
+    def __init__(self, plant: Optional[ThermalPlant] = None):
+        self.plant = plant or ThermalPlant()
+        self.writes = 0
+        self._saved: Optional[Dict[str, int]] = None
+
+    def read_temperatures(self) -> Dict[str, float]:
+        return {node.key: round(node.temp, 1) for node in self.plant.nodes}
+
+    def read_fans(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "key": fan,
+                "device": "simfan",
+                "index": index,
+                "label": None,
+                "rpm": self.plant.rpm(fan),
+                "pwm": pwm,
+                "pwm_enable": 1,
+            }
+            for index, (fan, pwm) in enumerate(sorted(self.plant.pwm.items()), start=1)
+        ]
+
+    def read_smart(self, device: str) -> Optional[Dict[str, Any]]:
+        # Simulated drives report through hwmon, so smartctl has nothing to add.
+        return None
+
+    def _write(self, pwm: int, channel: Optional[str]) -> bool:
+        pwm = max(0, min(255, int(pwm)))
+        for fan in [channel] if channel is not None else list(self.plant.pwm):
+            if fan not in self.plant.pwm:
+                self.last_error = f"No simulated fan {fan}"
+                return False
+            self.plant.pwm[fan] = pwm
+        self.writes += 1
+        return True
+
+    def set_pwm(self, pwm: int, channel: Optional[str] = None) -> bool:
+        # Like the control agent, a held failsafe refuses writes until it is released.
+        if self._saved is not None:
+            self.last_error = "Failsafe engaged"
+            return False
+        return self._write(pwm, channel)
+
+    def engage_failsafe(self) -> bool:
+        if self._saved is None:
+            self._saved = dict(self.plant.pwm)
+        return self._write(255, None)
+
+    def release_failsafe(self) -> bool:
+        if self._saved is not None:
+            self.plant.pwm.update(self._saved)
+            self._saved = None
+        return True
+
+    def advance(self, seconds: float) -> None:
+        self.plant.advance(seconds)
+
+
+def run_closed_loop(
+    profile: str,
+    duration: float = 3600.0,
+    interval: float = 5.0,
+    backend: Optional[SimulatedBackend] = None,
+    hot_threshold: float = 80.0,
+    clock: Callable[[], float] = time.perf_counter,
+) -> Dict[str, Any]:
+    """
+    Drive the simulated plant with a profile's curve and report how it did.
+
+    Each iteration is the real control path (sources -> determine_pwm ->
+    PWM write) followed by interval seconds of simulated time. clock
+    times the run for the wall_seconds/speedup figures.
+    """
+    backend = backend or SimulatedBackend()
+    iterations = int(duration / interval)
+    cpu_trace: List[float] = []
+    pwm_changes = 0
+    pwm_total = 0
+    last_pwm: Optional[int] = None
+
+    started = clock()
+    for _ in range(iterations):
+        sources = get_temperature_sources(
+            include_hdd=True,
+            readings=backend.read_temperatures(),
+            smart_reader=backend.read_smart,
+        )
+        cpu = next((item["value"] for item in sources if item["name"] == "cpu"), 0.0)
+        pwm = determine_pwm(cpu, profile)
+        if pwm != last_pwm:
+            backend.set_pwm(pwm)
+            pwm_changes += last_pwm is not None
+            last_pwm = pwm
+        cpu_trace.append(cpu)
+        pwm_total += pwm
+        backend.advance(interval)
+    wall = clock() - started
+
+    return {
+        "profile": profile,
+        "simulated_seconds": iterations * interval,
+        "iterations": iterations,
+        "max_cpu": max(cpu_trace, default=None),
+        "mean_cpu": round(sum(cpu_trace) / len(cpu_trace), 2) if cpu_trace else None,
+        "seconds_above_threshold": sum(interval for value in cpu_trace if value >= hot_threshold),
+        "mean_duty_percent": round(100.0 * pwm_total / (255.0 * iterations), 1) if iterations else None,
+        "pwm_changes": pwm_changes,
+        "wall_seconds": round(wall, 4),
+        "loop_rate_hz": round(iterations / wall, 1) if wall > 0 else None,
+        "speedup": round(iterations * interval / wall, 1) if wall > 0 else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark fan profiles against a simulated thermal plant")
+    parser.add_argument("--profile", action="append", help="profile to run (repeatable; default: all)")
+    parser.add_argument("--duration", type=float, default=3600.0, help="simulated seconds per profile")
+    parser.add_argument("--interval", type=float, default=5.0, help="control interval in simulated seconds")
+    args = parser.parse_args()
+
+    for profile in args.profile or sorted(PROFILE_CURVES):
+        print(json.dumps(run_closed_loop(profile, args.duration, args.interval)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import glob
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+SMARTD_DIR_ENV_VAR = "TRUEFAN_SMARTD_ATTRLOG_DIR"
+DEFAULT_SMARTD_DIR = "/var/lib/smartmontools"
+BY_ID_DIR = "/dev/disk/by-id"
+# Logged readings feed the fan curve and the hdd_critical failsafe, so they may be no older
+# than the slowest SMART sample interval (300 s). smartd logs every 30 minutes by default
+# (-i 1800); run it with -i 300 or less to avoid smartctl forks entirely, otherwise smartctl
+# fills in once the newest record is too old.
+MAX_AGE_SECONDS = float(os.getenv("TRUEFAN_SMARTD_MAX_AGE", "300"))
+# How often the attrlog directory and /dev/disk/by-id are re-listed.
+RESCAN_SECONDS = 300.0
+# Only this much of a file's end is read when first opened or after a long gap.
+TAIL_BYTES = 8192
+
+# ATA attribute IDs carrying the drive temperature, most specific first.
+ATA_TEMP_IDS = ("194", "190")
+
+_ATTRLOG_RE = re.compile(r"attrlog\.(.+)\.(ata|scsi|nvme)\.csv$")
+_NON_ALNUM_RE = re.compile(r"[^0-9A-Za-z]")
+
+Reading = Tuple[float, float]
+
+
+def _ident(text: str) -> str:
+    """Model and serial with every separator dropped, for matching attrlog names to by-id links."""
+    return _NON_ALNUM_RE.sub("", text).upper()
+
+
+def parse_attrlog_line(line: str, kind: str) -> Optional[Reading]:
+    """
+    Temperature and sample time from one attrlog record, or None.
+
+    Records are "YYYY-MM-DD HH:MM:SS;" (local time) followed by
+    "id;normalized;raw;" triples for ATA and "name;value;" pairs for SCSI.
+    """
+    fields = [field.strip() for field in line.split(";")]
+    if len(fields) < 3:
+        return None
+    try:
+        sampled_at = time.mktime(time.strptime(fields[0], "%Y-%m-%d %H:%M:%S"))
+    except ValueError:
+        return None
+    values = fields[1:]
+    try:
+        if kind == "ata":
+            raws = {values[i]: values[i + 2] for i in range(0, len(values) - 2, 3)}
+            raw = next((raws[attr] for attr in ATA_TEMP_IDS if attr in raws), None)
+            # The low byte is the current temperature; higher bytes may pack min/max.
+            return (float(int(raw) & 0xFF), sampled_at) if raw is not None else None
+        pairs = {values[i].lower(): values[i + 1] for i in range(0, len(values) - 1, 2)}
+        raw = pairs.get("temperature")
+        return (float(raw), sampled_at) if raw else None
+    except ValueError:
+        return None
+
+
+class AttrlogTail:
+    """
+    Follows one smartd attrlog file from a remembered offset.
+
+    Each poll reads only the bytes appended since the last one and parses
+    only the newest complete record. A file that shrinks or is replaced
+    (rotation) is picked up again from its last TAIL_BYTES.
+    """
+
+    def __init__(self, path: str, kind: str):
+        self.path = path
+        self.kind = kind
+        self.reading: Optional[Reading] = None
+        self._inode: Optional[int] = None
+        self._mtime: Optional[int] = None
+        self._offset = 0
+        self._partial = b""
+
+    def poll(self) -> Optional[Reading]:
+        st = os.stat(self.path)
+        skip_partial_line = False
+        # Same size but a new mtime means the file was rewritten in place.
+        rewritten = st.st_size < self._offset or (st.st_size == self._offset and st.st_mtime_ns != self._mtime)
+        self._mtime = st.st_mtime_ns
+        if st.st_ino != self._inode or rewritten or st.st_size - self._offset > TAIL_BYTES:
+            self._inode = st.st_ino
+            self._offset = max(0, st.st_size - TAIL_BYTES)
+            self._partial = b""
+            skip_partial_line = self._offset > 0
+        if st.st_size == self._offset:
+            return self.reading
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        self._offset += len(data)
+        data = self._partial + data
+        if skip_partial_line:
+            data = data[data.find(b"\n") + 1 :]
+        lines = data.split(b"\n")
+        self._partial = lines.pop()
+        for line in reversed(lines):
+            reading = parse_attrlog_line(line.decode("utf-8", "replace"), self.kind)
+            if reading is not None:
+                self.reading = reading
+                break
+        return self.reading
+
+
+class SmartdAttrlogs:
+    """
+    Drive temperatures from the attribute logs smartd already writes (-A).
+
+    Devices are matched to attrlog files through /dev/disk/by-id: the
+    model and serial in a by-id link name equal those in the attrlog file
+    name once separators are dropped. temperature() returns None when no
+    log covers the device or its newest record is older than max_age, so
+    callers fall back to smartctl.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        by_id_dir: str = BY_ID_DIR,
+        max_age: float = MAX_AGE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.directory = directory or os.getenv(SMARTD_DIR_ENV_VAR, "").strip() or DEFAULT_SMARTD_DIR
+        self.by_id_dir = by_id_dir
+        self.max_age = max_age
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tails: Dict[str, AttrlogTail] = {}
+        self._scanned_at: Optional[float] = None
+
+    def _logs_by_ident(self) -> Dict[str, Tuple[str, str]]:
+        logs = {}
+        for path in glob.glob(os.path.join(self.directory, "*attrlog.*.csv")):
+            match = _ATTRLOG_RE.search(os.path.basename(path))
+            if match:
+                logs[_ident(match.group(1))] = (path, match.group(2))
+        return logs
+
+    def _device_links(self) -> List[Tuple[str, str]]:
+        """(kernel device name, model+serial ident) for each whole-disk by-id link."""
+        try:
+            names = os.listdir(self.by_id_dir)
+        except OSError:
+            return []
+        links = []
+        for name in names:
+            bus, _, rest = name.partition("-")
+            if bus not in ("ata", "scsi", "nvme", "usb") or "-part" in rest:
+                continue
+            target = os.path.basename(os.path.realpath(os.path.join(self.by_id_dir, name)))
+            links.append((target, _ident(rest)))
+        return links
+
+    def _rescan(self) -> None:
+        logs = self._logs_by_ident()
+        tails = {}
+        for target, ident in self._device_links() if logs else ():
+            if ident not in logs:
+                continue
+            path, kind = logs[ident]
+            previous = self._tails.get(target)
+            tails[target] = previous if previous is not None and previous.path == path else AttrlogTail(path, kind)
+        if set(tails) != set(self._tails):
+            LOGGER.info("smartd attrlogs in %s cover: %s", self.directory, ", ".join(sorted(tails)) or "none")
+        self._tails = tails
+
+    def _tail_for(self, device: str) -> Optional[AttrlogTail]:
+        now = time.monotonic()
+        if self._scanned_at is None or now - self._scanned_at >= RESCAN_SECONDS:
+            self._scanned_at = now
+            self._rescan()
+        name = os.path.basename(device)
+        for target, tail in self._tails.items():
+            # /dev/nvme0 is the controller; its by-id links point at namespaces (nvme0n1).
+            if target == name or (name.startswith("nvme") and target.startswith(name + "n")):
+                return tail
+        return None
+
+    def temperature(self, device: str) -> Optional[Reading]:
+        """(Celsius, Unix time of the record) from smartd's log, or None."""
+        with self._lock:
+            tail = self._tail_for(device)
+            if tail is None:
+                return None
+            try:
+                reading = tail.poll()
+            except OSError as e:
+                LOGGER.debug("Failed reading smartd attrlog %s: %s", tail.path, e)
+                return None
+        if reading is None or self.clock() - reading[1] > self.max_age:
+            return None
+        return reading
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "devices": {
+                    target: {
+                        "path": tail.path,
+                        "age_seconds": round(self.clock() - tail.reading[1]) if tail.reading else None,
+                    }
+                    for target, tail in sorted(self._tails.items())
+                },
+            }
+
+
+SMARTD = SmartdAttrlogs()
@@ -1,166 +1,305 @@
 (() => {
-  const POLL_MS = 2000;
+  const POLL_MS = 5000;
+  const WINDOW_SECONDS = 900;
+  const HISTORY_STEP_SECONDS = 5;
+  const COLORS = ["#39ff88", "#ffcc66", "#66ccff", "#ff6b6b", "#c792ea", "#f78c6c"];
 
   const FALLBACK = {
-    profile: "unknown",
-    uptime: "0h 0m",
-    load: "0.00 / 0.00 / 0.00",
-    pwm: "--",
-    pwm_control_enabled: false,
-    capabilities: { smart_available: true },
-    sensors: [
-      { name: "cpu", value: 0 },
-      { name: "nvme", value: 0 },
-      { name: "hdd", value: 0 },
-    ],
+    mode: "monitoring-only",
+    agent_available: false,
+    capabilities: { smart_available: false },
+    sensors: [],
+    fan: {},
+    fans: [],
   };
 
   const els = {
-    sensorList: document.querySelector("#sensor-list"),
-    fanGraph: document.querySelector("#fan-graph"),
-    profile: document.querySelector("#profile"),
-    uptime: document.querySelector("#uptime"),
-    load: document.querySelector("#load"),
-    pwmValue: document.querySelector("#pwm-value"),
-    pwmSlider: document.querySelector("#pwm-slider"),
-    applyPwmBtn: document.querySelector("#apply-pwm"),
-    smartWarning: document.querySelector("#smart-warning"),
-    debugToggle: document.querySelector("#show-debug-json"),
-    debugJson: document.querySelector("#debug-json"),
+    mode: document.getElementById("mode"),
+    agent: document.getElementById("agent"),
+    smart: document.getElementById("smart"),
+    cpu: document.getElementById("temp-cpu"),
+    nvme: document.getElementById("temp-nvme"),
+    hdd: document.getElementById("temp-hdd"),
+    fanSpeeds: document.getElementById("fan-speeds"),
+    warning: document.getElementById("smart-warning"),
+    updated: document.getElementById("updated-at"),
   };
 
-  let firstLoad = true;
-  let lastStatusPayload = null;
-
+  // Only touch the DOM when the text actually changes.
   function setText(el, value) {
     if (!el) return;
-    el.textContent = String(value);
+    const text = String(value);
+    if (el.textContent !== text) {
+      el.textContent = text;
+    }
   }
 
-  function normalizeStatus(payload) {
-    const data = payload && typeof payload === "object" ? payload : {};
-    const sensors = Array.isArray(data.sensors) && data.sensors.length
-      ? data.sensors
-      : FALLBACK.sensors;
-
-    return {
-      profile: data.profile || FALLBACK.profile,
-      uptime: data.uptime || FALLBACK.uptime,
-      load: data.load || FALLBACK.load,
-      pwm: data.pwm ?? FALLBACK.pwm,
-      pwm_control_enabled: data.pwm_control_enabled ?? FALLBACK.pwm_control_enabled,
-      capabilities: {
-        smart_available: data?.capabilities?.smart_available ?? FALLBACK.capabilities.smart_available,
-      },
-      sensors,
-    };
+  function findTemp(sensors, name) {
+    const match = sensors.find((item) => item && item.name === name);
+    if (!match || match.value === undefined || match.value === null) {
+      return "--";
+    }
+    if (match.state === "standby") {
+      return `${match.value} C (standby, ${Math.round(match.age_seconds || 0)}s ago)`;
+    }
+    return `${match.value} C`;
   }
 
-  function renderSensors(sensors) {
-    if (!els.sensorList) return;
-    els.sensorList.innerHTML = "";
+  class Chart {
+    // Canvas time-series chart. New points scroll the existing image left and
+    // draw only the new segments; a full redraw happens on seed, resize, or
+    // when a value outgrows the y range.
+    constructor(canvas, legend) {
+      this.canvas = canvas;
+      this.legend = legend;
+      this.ctx = canvas.getContext("2d");
+      this.min = Number(canvas.dataset.min);
+      this.max = Number(canvas.dataset.max);
+      this.series = new Map();
+      this.now = null;
+      this.stale = true;
+      this.resize();
+    }
 
-    sensors.forEach((item) => {
-      const li = document.createElement("li");
-      const name = item?.name ?? "unknown";
-      const value = item?.value ?? "--";
-      li.textContent = `${name}: ${value}`;
-      els.sensorList.appendChild(li);
-    });
-  }
+    resize() {
+      const dpr = window.devicePixelRatio || 1;
+      const width = Math.round(this.canvas.clientWidth * dpr);
+      const height = Math.round(this.canvas.clientHeight * dpr);
+      if (width !== this.canvas.width || height !== this.canvas.height) {
+        this.canvas.width = width;
+        this.canvas.height = height;
+        this.stale = true;
+      }
+    }
+
+    ensure(name) {
+      let series = this.series.get(name);
+      if (!series) {
+        const color = COLORS[this.series.size % COLORS.length];
+        const label = document.createElement("span");
+        label.style.color = color;
+        if (this.legend) this.legend.appendChild(label);
+        series = { points: [], color, label, name: name.replace(/^(fan|pwm)\//, "") };
+        this.series.set(name, series);
+      }
+      return series;
+    }
 
-  function render(data) {
-    setText(els.profile, data.profile);
-    setText(els.uptime, data.uptime);
-    setText(els.load, data.load);
-    setText(els.pwmValue, data.pwm);
-    if (els.pwmSlider) {
-      els.pwmSlider.disabled = !data.pwm_control_enabled;
-      els.pwmSlider.title = data.pwm_control_enabled ? "" : "Monitoring-only mode: control agent unavailable";
+    seed(name, points) {
+      const series = this.ensure(name);
+      series.points = points.slice();
+      const last = points[points.length - 1];
+      if (last) {
+        this.fit(last[1]);
+        setText(series.label, `${series.name} ${last[1]}`);
+      }
+      this.stale = true;
     }
-    if (els.applyPwmBtn) {
-      els.applyPwmBtn.disabled = !data.pwm_control_enabled;
+
+    append(name, t, value) {
+      const series = this.ensure(name);
+      const last = series.points[series.points.length - 1];
+      if (last && t <= last[0]) return;
+      series.points.push([t, value]);
+      const cutoff = t - WINDOW_SECONDS;
+      while (series.points.length > 2 && series.points[1][0] < cutoff) {
+        series.points.shift();
+      }
+      this.fit(value);
+      setText(series.label, `${series.name} ${value}`);
     }
-    if (els.smartWarning) {
-      els.smartWarning.style.display = data.capabilities.smart_available ? "none" : "block";
+
+    fit(value) {
+      if (value > this.max) {
+        this.max = Math.ceil((value * 1.1) / 100) * 100;
+        this.stale = true;
+      }
     }
-    renderSensors(data.sensors);
 
-    if (els.fanGraph) {
-      const numeric = data.sensors
-        .map((s) => Number(s?.value))
-        .filter((v) => Number.isFinite(v));
-      const max = numeric.length ? Math.max(...numeric) : 0;
-      els.fanGraph.textContent = `Fan graph placeholder | max sensor: ${max}`;
+    x(t) {
+      return this.canvas.width - ((this.now - t) / WINDOW_SECONDS) * this.canvas.width;
     }
-  }
 
-  function updateDebugView() {
-    if (!els.debugToggle || !els.debugJson) return;
+    y(value) {
+      const h = this.canvas.height;
+      return h - ((value - this.min) / (this.max - this.min)) * h;
+    }
+
+    redraw(now) {
+      const { ctx, canvas } = this;
+      this.now = now;
+      ctx.clearRect(0, 0, canvas.width, canvas.height);
+      ctx.lineWidth = window.devicePixelRatio || 1;
+      for (const series of this.series.values()) {
+        const points = series.points;
+        if (points.length < 2) continue;
+        ctx.strokeStyle = series.color;
+        ctx.beginPath();
+        ctx.moveTo(this.x(points[0][0]), this.y(points[0][1]));
+        for (let i = 1; i < points.length; i += 1) {
+          ctx.lineTo(this.x(points[i][0]), this.y(points[i][1]));
+        }
+        ctx.stroke();
+      }
+      this.stale = false;
+    }
 
-    if (els.debugToggle.checked) {
-      els.debugJson.style.display = "block";
-      els.debugJson.textContent = JSON.stringify(lastStatusPayload ?? {}, null, 2);
-    } else {
-      els.debugJson.style.display = "none";
-      els.debugJson.textContent = "";
+    advance(now) {
+      if (this.stale || this.now === null) {
+        this.redraw(now);
+        return;
+      }
+      const { ctx, canvas } = this;
+      const pxPerSecond = canvas.width / WINDOW_SECONDS;
+      // Shift by whole pixels and carry the remainder, so the image stays sharp.
+      const shift = Math.floor((now - this.now) * pxPerSecond);
+      if (shift > 0) {
+        ctx.globalCompositeOperation = "copy";
+        ctx.drawImage(canvas, -shift, 0);
+        ctx.globalCompositeOperation = "source-over";
+        this.now += shift / pxPerSecond;
+      }
+      ctx.lineWidth = window.devicePixelRatio || 1;
+      for (const series of this.series.values()) {
+        const n = series.points.length;
+        if (n < 2) continue;
+        const [t0, v0] = series.points[n - 2];
+        const [t1, v1] = series.points[n - 1];
+        ctx.strokeStyle = series.color;
+        ctx.beginPath();
+        ctx.moveTo(this.x(t0), this.y(v0));
+        ctx.lineTo(this.x(t1), this.y(v1));
+        ctx.stroke();
+      }
     }
   }
 
-  function showLoading() {
-    setText(els.profile, "Loading...");
-    setText(els.uptime, "Loading...");
-    setText(els.load, "Loading...");
-    setText(els.pwmValue, "Loading...");
+  const charts = {};
+  document.querySelectorAll("canvas[data-chart]").forEach((canvas) => {
+    const kind = canvas.dataset.chart;
+    charts[kind] = new Chart(canvas, document.querySelector(`[data-legend="${kind}"]`));
+  });
+
+  function chartFor(series) {
+    if (series.startsWith("fan/")) return charts.rpm;
+    if (series.startsWith("pwm/")) return charts.pwm;
+    return charts.temps;
+  }
+
+  const fanRows = new Map();
+  let lastSampledAt = null;
 
-    if (els.sensorList) {
-      els.sensorList.innerHTML = "<li>Loading sensors...</li>";
+  function renderFans(fan) {
+    if (!els.fanSpeeds) return;
+    for (const [name, value] of Object.entries(fan)) {
+      let entry = fanRows.get(name);
+      if (!entry) {
+        const row = document.createElement("div");
+        row.className = "row";
+        const left = document.createElement("span");
+        left.textContent = `${name}:`;
+        const right = document.createElement("span");
+        row.appendChild(left);
+        row.appendChild(right);
+        els.fanSpeeds.appendChild(row);
+        entry = { row, right };
+        fanRows.set(name, entry);
+      }
+      setText(entry.right, `${value} RPM`);
+      entry.row.classList.toggle("muted", Number(value) === 0);
     }
+    for (const [name, entry] of fanRows) {
+      if (!(name in fan)) {
+        entry.row.remove();
+        fanRows.delete(name);
+      }
+    }
+  }
 
-    if (els.fanGraph) {
-      els.fanGraph.textContent = "Loading fan data...";
+  function appendPoints(status, sensors, fan) {
+    const t = Number(status.sampled_at);
+    if (!Number.isFinite(t) || t === lastSampledAt) return;
+    lastSampledAt = t;
+
+    for (const item of sensors) {
+      const value = Number(item && item.value);
+      if (item && Number.isFinite(value) && charts.temps) charts.temps.append(item.name, t, value);
+    }
+    for (const [name, value] of Object.entries(fan)) {
+      if (charts.rpm && Number.isFinite(Number(value))) charts.rpm.append(`fan/${name}`, t, Number(value));
+    }
+    for (const channel of Array.isArray(status.fans) ? status.fans : []) {
+      if (charts.pwm && channel && channel.pwm !== null && Number.isFinite(Number(channel.pwm))) {
+        charts.pwm.append(`pwm/${channel.key}`, t, Number(channel.pwm));
+      }
     }
+    Object.values(charts).forEach((chart) => chart.advance(t));
   }
 
-  function showError(err) {
-    console.error("Dashboard update failed:", err);
-    const fallback = normalizeStatus(null);
-    render(fallback);
-    lastStatusPayload = { error: String(err), fallback };
-    updateDebugView();
+  function render(status) {
+    const safe = status && typeof status === "object" ? status : {};
+    const capabilities = safe.capabilities && typeof safe.capabilities === "object" ? safe.capabilities : {};
+    const sensors = Array.isArray(safe.sensors) ? safe.sensors : [];
+    const fan = safe.fan && typeof safe.fan === "object" ? safe.fan : {};
+    const smartAvailable = capabilities.smart_available !== false;
+
+    setText(els.mode, safe.mode || "monitoring-only");
+    setText(els.agent, safe.agent_available ? "online" : "offline");
+    setText(els.smart, smartAvailable ? "available" : "unavailable");
+    setText(els.cpu, findTemp(sensors, "cpu"));
+    setText(els.nvme, findTemp(sensors, "nvme"));
+    setText(els.hdd, findTemp(sensors, "hdd"));
+    setText(els.updated, new Date().toLocaleTimeString());
+    if (els.warning) {
+      els.warning.classList.toggle("hidden", smartAvailable);
+    }
+    renderFans(fan);
+    appendPoints(safe, sensors, fan);
+  }
 
-    if (els.sensorList) {
-      const li = document.createElement("li");
-      li.textContent = "Error: failed to fetch /status";
-      li.style.color = "#ff6b6b";
-      els.sensorList.appendChild(li);
+  async function seedCharts() {
+    try {
+      const res = await fetch(`/history?seconds=${WINDOW_SECONDS}&step=${HISTORY_STEP_SECONDS}`, { cache: "no-store" });
+      if (!res.ok) return;
+      const payload = await res.json();
+      for (const [name, points] of Object.entries(payload.series || {})) {
+        const chart = chartFor(name);
+        if (chart && points.length) chart.seed(name, points);
+      }
+      Object.values(charts).forEach((chart) => chart.redraw(payload.to));
+    } catch (_error) {
+      // Charts fill in from live updates instead.
     }
   }
 
-  async function tick() {
+  async function pollStatus() {
+    if (document.hidden) return;
     try {
       const res = await fetch("/status", { cache: "no-store" });
       if (!res.ok) {
         throw new Error(`HTTP ${res.status}`);
       }
-      const payload = await res.json();
-      lastStatusPayload = payload;
-      const data = normalizeStatus(payload);
-      render(data);
-      updateDebugView();
-      firstLoad = false;
-    } catch (err) {
-      showError(err);
-      firstLoad = false;
+      render(await res.json());
+    } catch (_error) {
+      render(FALLBACK);
     }
   }
 
-  document.addEventListener("DOMContentLoaded", () => {
-    if (els.debugToggle) {
-      els.debugToggle.addEventListener("change", updateDebugView);
+  window.addEventListener("resize", () => {
+    Object.values(charts).forEach((chart) => {
+      chart.resize();
+      if (chart.stale && chart.now !== null) chart.redraw(chart.now);
+    });
+  });
+
+  document.addEventListener("visibilitychange", async () => {
+    if (!document.hidden) {
+      // Fill the gap left while the page was hidden, then resume.
+      await seedCharts();
+      pollStatus();
     }
-    if (firstLoad) showLoading();
-    tick();
-    window.setInterval(tick, POLL_MS);
   });
+
+  seedCharts().then(pollStatus);
+  window.setInterval(pollStatus, POLL_MS);
 })();
@@ -1,60 +1,237 @@
 import logging
-from typing import Iterable, Optional
+import os
+import threading
+import time
+from typing import AbstractSet, Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
-from hwmon import find_best_sensor, get_temp
-from sensors import read_smartctl_temperature
+from hwmon import read_temperature_map, topology_generation
+from sensors import get_smart_capabilities, read_smart_state
+from smartd import SMARTD
 
 LOGGER = logging.getLogger(__name__)
 
+SmartReader = Callable[[str], Optional[Dict[str, Any]]]
 
-def _read_temp_smartctl(device: str) -> Optional[float]:
-    temp = read_smartctl_temperature(device)
-    if isinstance(temp, dict) and temp.get("_smart_denied"):
+SOURCE_BACKOFF_INITIAL_SECONDS = float(os.getenv("TRUEFAN_SOURCE_BACKOFF_MIN", "30"))
+SOURCE_BACKOFF_MAX_SECONDS = float(os.getenv("TRUEFAN_SOURCE_BACKOFF_MAX", "600"))
+# Distinct hwmon key sets are few (one per topology); this only bounds pathological input.
+RESOLUTION_CACHE_SIZE = 64
+
+CPU_KEYWORDS = ("coretemp", "k10temp", "cpu")
+# Drive each source falls back to SMART for when hwmon has no reading.
+SMART_DEVICES = {"nvme": "/dev/nvme0", "hdd": "/dev/sda"}
+NVME_KEYWORDS = ("nvme",)
+HDD_KEYWORDS = ("drivetemp", "hdd", "ata")
+
+
+class SourceBackoff:
+    """
+    Negative cache for sources whose reads fail.
+
+    A failed source is not probed again until its backoff expires; the
+    delay doubles per consecutive failure up to maximum. Every entry is
+    dropped when the hwmon topology generation changes, so a newly loaded
+    driver or hot-plugged drive is probed again at once.
+    """
+
+    def __init__(
+        self,
+        initial: float = SOURCE_BACKOFF_INITIAL_SECONDS,
+        maximum: float = SOURCE_BACKOFF_MAX_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        generation: Callable[[], int] = topology_generation,
+    ):
+        self.initial = initial
+        self.maximum = maximum
+        self.clock = clock
+        self.generation = generation
+        self._lock = threading.Lock()
+        self._generation = generation()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+
+    def _sync_generation(self) -> None:
+        generation = self.generation()
+        if generation != self._generation:
+            self._generation = generation
+            if self._entries:
+                LOGGER.info("hwmon topology changed; re-probing %d backed-off sources", len(self._entries))
+                self._entries.clear()
+
+    def should_probe(self, key: str) -> bool:
+        with self._lock:
+            self._sync_generation()
+            entry = self._entries.get(key)
+            return entry is None or self.clock() >= entry["retry_at"]
+
+    def failed(self, key: str, reason: str) -> float:
+        """Record a failure; returns the delay before the next probe."""
+        with self._lock:
+            entry = self._entries.setdefault(key, {"failures": 0})
+            entry["failures"] += 1
+            delay = min(self.maximum, self.initial * 2 ** (entry["failures"] - 1))
+            entry["retry_at"] = self.clock() + delay
+            entry["reason"] = reason
+            return delay
+
+    def succeeded(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        now = self.clock()
+        with self._lock:
+            return {
+                key: {
+                    "failures": entry["failures"],
+                    "retry_in_seconds": round(max(0.0, entry["retry_at"] - now), 1),
+                    "reason": entry["reason"],
+                }
+                for key, entry in self._entries.items()
+            }
+
+
+SMART_BACKOFF = SourceBackoff()
+_RESOLVED: Dict[Tuple[str, FrozenSet[str]], Optional[str]] = {}
+_LAST_RESOLVED: Dict[str, Optional[str]] = {}
+
+
+def _read_temp_smartctl(device: str) -> Optional[Dict[str, Any]]:
+    info = read_smart_state(device)
+    if info["state"] == "denied":
         return None
-    if temp is None:
-        LOGGER.error("smartctl JSON temp unavailable for %s", device)
-    return temp
+    if info["value"] is None:
+        if info["state"] != "standby":
+            LOGGER.error("smartctl JSON temp unavailable for %s", device)
+        return None
+    return info
+
 
+def _hwmon_source(name: str, value: float, stale_keys: AbstractSet[str]) -> Dict[str, Any]:
+    source: Dict[str, Any] = {"name": name, "value": value}
+    if _LAST_RESOLVED.get(name) in stale_keys:
+        source["stale"] = True
+    return source
 
-def _read_temp_hwmon(
-    source_name: str,
+
+def _append_source(
+    sources: List[Dict[str, Any]],
+    name: str,
+    hwmon_value: Optional[float],
+    device: str,
+    smart_reader: SmartReader,
+    stale_keys: AbstractSet[str] = frozenset(),
+    probe_smart: bool = True,
+) -> None:
+    if hwmon_value is not None:
+        sources.append(_hwmon_source(name, hwmon_value, stale_keys))
+        return
+
+    # A device already known to be absent costs nothing until its backoff expires.
+    if not SMART_BACKOFF.should_probe(device):
+        return
+    smart = smart_reader(device)
+    if smart is None and not probe_smart:
+        # Nothing cached and no probe this time: not a failure.
+        return
+    if smart is not None:
+        SMART_BACKOFF.succeeded(device)
+        source = {
+            "name": name,
+            "value": smart["value"],
+            "state": smart["state"],
+            "age_seconds": smart["age_seconds"],
+        }
+        if smart.get("stale"):
+            source["stale"] = True
+        sources.append(source)
+    else:
+        delay = SMART_BACKOFF.failed(device, "no valid temperature")
+        LOGGER.warning("Skipping %s source: no valid temperature; retrying %s in %.0fs", name, device, delay)
+
+
+def _select_key(
+    readings: Dict[str, float],
     hwmon_keywords: Iterable[str],
     sensor_keyword: Optional[str] = None,
-) -> Optional[float]:
-    try:
-        hwmon_path = find_best_sensor(hwmon_keywords)
-        return float(get_temp(hwmon_path, sensor_keyword))
-    except Exception as exc:
-        LOGGER.error("hwmon read failed for %s: %s", source_name, exc)
-        return None
+) -> Optional[str]:
+    """Pick one reading key the way find_best_sensor() + get_temp() would."""
+    label_keyword = (sensor_keyword or "").lower()
+    for keyword in hwmon_keywords:
+        for key in readings:
+            device, label = key.split("/", 1)
+            if keyword not in device:
+                continue
+            if not label_keyword or label_keyword in label.lower():
+                return key
+    return None
+
+
+def _resolve(name: str, readings: Dict[str, float], keys: FrozenSet[str]) -> Optional[float]:
+    """
+    Look up the hwmon reading for a source, memoized per set of reading keys.
+
+    The key set only changes with the topology, so misses (and the CPU
+    "package" label fallback) are resolved once rather than on every call.
+    """
+    cache_key = (name, keys)
+    if cache_key not in _RESOLVED:
+        if name == "cpu":
+            key = _select_key(readings, CPU_KEYWORDS, "package") or _select_key(readings, CPU_KEYWORDS)
+        else:
+            key = _select_key(readings, NVME_KEYWORDS if name == "nvme" else HDD_KEYWORDS)
+        if len(_RESOLVED) >= RESOLUTION_CACHE_SIZE:
+            _RESOLVED.clear()
+        _RESOLVED[cache_key] = key
+    key = _RESOLVED[cache_key]
+    _LAST_RESOLVED[name] = key
+    return readings[key] if key is not None else None
+
+
+def get_source_capabilities() -> Dict[str, Any]:
+    """SMART availability plus which hwmon key each source uses, any SMART backoff and smartd logs."""
+    return dict(
+        get_smart_capabilities(),
+        sources={name: {"hwmon": key} for name, key in sorted(_LAST_RESOLVED.items())},
+        smart_backoff=SMART_BACKOFF.report(),
+        smartd=SMARTD.report(),
+    )
 
 
-def get_temperature_sources(include_hdd: bool = False):
+def backed_off_sources() -> Set[str]:
+    """Sources whose SMART fallback is currently skipped by the backoff."""
+    return {name for name, device in SMART_DEVICES.items() if not SMART_BACKOFF.should_probe(device)}
+
+
+def get_temperature_sources(
+    include_hdd: bool = False,
+    readings: Optional[Dict[str, float]] = None,
+    smart_reader: Optional[SmartReader] = None,
+    stale_keys: AbstractSet[str] = frozenset(),
+    probe_smart: bool = True,
+):
+    """
+    cpu, nvme and (with include_hdd) hdd temperatures from hwmon readings,
+    falling back to SMART for drives. Sources resolved to a reading key in
+    stale_keys (one that missed the read deadline) are flagged "stale".
+    With probe_smart=False, smart_reader only returns cached readings and a
+    drive it has nothing for is left out without counting as a failure.
+    """
+    if readings is None:
+        readings = read_temperature_map()
+    if smart_reader is None:
+        smart_reader = _read_temp_smartctl
     sources = []
+    keys = frozenset(readings)
 
-    cpu_temp = _read_temp_hwmon("cpu", ["coretemp", "k10temp", "cpu"], "package")
-    if cpu_temp is None:
-        cpu_temp = _read_temp_hwmon("cpu", ["coretemp", "k10temp", "cpu"])
+    cpu_temp = _resolve("cpu", readings, keys)
     if cpu_temp is not None:
-        sources.append({"name": "cpu", "value": cpu_temp})
+        sources.append(_hwmon_source("cpu", cpu_temp, stale_keys))
     else:
         LOGGER.error("Skipping cpu source: no valid temperature")
 
-    nvme_temp = _read_temp_hwmon("nvme", ["nvme"])
-    if nvme_temp is None:
-        nvme_temp = _read_temp_smartctl("/dev/nvme0")
-    if nvme_temp is not None:
-        sources.append({"name": "nvme", "value": nvme_temp})
-    else:
-        LOGGER.error("Skipping nvme source: no valid temperature")
-
-    if include_hdd:
-        hdd_temp = _read_temp_hwmon("hdd", ["drivetemp", "hdd", "ata"])
-        if hdd_temp is None:
-            hdd_temp = _read_temp_smartctl("/dev/sda")
-        if hdd_temp is not None:
-            sources.append({"name": "hdd", "value": hdd_temp})
-        else:
-            LOGGER.error("Skipping hdd source: no valid temperature")
+    for name in ("nvme", "hdd") if include_hdd else ("nvme",):
+        _append_source(
+            sources, name, _resolve(name, readings, keys), SMART_DEVICES[name], smart_reader, stale_keys, probe_smart
+        )
 
     return sources
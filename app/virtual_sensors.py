@@ -0,0 +1,294 @@
+import ast
+import fnmatch
+import json
+import logging
+import operator
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from events import CRITICAL, WARNING, Rule, ThresholdRule
+
+LOGGER = logging.getLogger(__name__)
+
+VIRTUAL_SENSORS_ENV_VAR = "TRUEFAN_VIRTUAL_SENSORS"
+DEFAULT_VIRTUAL_SENSORS_FILE = "virtual_sensors.json"
+# Names the temperature sources already use; a virtual sensor may not shadow them.
+RESERVED_NAMES = ("cpu", "nvme", "hdd")
+
+Values = Dict[str, float]
+# Compiled expression: (sensor values, monotonic seconds) -> value, or None when an input is missing.
+Evaluator = Callable[[Values, float], Optional[float]]
+
+_BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_AGGREGATES = {"max": max, "min": min, "sum": sum, "mean": lambda xs: sum(xs) / len(xs)}
+
+
+class _Window(ABC):
+    """Samples from the last `seconds`; each push and evict is amortised O(1)."""
+
+    def __init__(self, seconds: float):
+        if seconds <= 0:
+            raise ValueError("window length must be positive")
+        self.seconds = seconds
+        self.points: Deque[Tuple[float, float]] = deque()
+
+    def evict(self, now: float) -> None:
+        cutoff = now - self.seconds
+        while self.points and self.points[0][0] <= cutoff:
+            self._dropped(self.points.popleft())
+
+    def push(self, now: float, value: float) -> None:
+        self.points.append((now, value))
+
+    def _dropped(self, point: Tuple[float, float]) -> None:
+        pass
+
+    @abstractmethod
+    def value(self) -> Optional[float]:
+        """The window's aggregate, or None while it is empty."""
+
+
+class MeanWindow(_Window):
+    def __init__(self, seconds: float):
+        super().__init__(seconds)
+        self.total = 0.0
+
+    def push(self, now: float, value: float) -> None:
+        super().push(now, value)
+        self.total += value
+
+    def _dropped(self, point: Tuple[float, float]) -> None:
+        self.total -= point[1]
+
+    def value(self) -> Optional[float]:
+        return self.total / len(self.points) if self.points else None
+
+
+class ExtremeWindow(_Window):
+    """Running max (or min) over the window via a monotonic deque."""
+
+    def __init__(self, seconds: float, largest: bool = True):
+        super().__init__(seconds)
+        self.largest = largest
+
+    def push(self, now: float, value: float) -> None:
+        # Points the new value dominates can never be the extreme again.
+        while self.points and (self.points[-1][1] <= value if self.largest else self.points[-1][1] >= value):
+            self.points.pop()
+        self.points.append((now, value))
+
+    def value(self) -> Optional[float]:
+        return self.points[0][1] if self.points else None
+
+
+class DeltaWindow(_Window):
+    """Change across the window: newest minus oldest sample."""
+
+    def value(self) -> Optional[float]:
+        return self.points[-1][1] - self.points[0][1] if self.points else None
+
+
+WINDOWS: Dict[str, Callable[[float], _Window]] = {
+    "avg": MeanWindow,
+    "max_over": lambda seconds: ExtremeWindow(seconds, largest=True),
+    "min_over": lambda seconds: ExtremeWindow(seconds, largest=False),
+    "delta": DeltaWindow,
+}
+
+
+def _lookup(name: str) -> Evaluator:
+    return lambda values, _now: values.get(name)
+
+
+def _matcher(pattern: str) -> Callable[[Values], List[float]]:
+    cache: Dict[FrozenSet[str], List[str]] = {}
+
+    def matching(values: Values) -> List[float]:
+        keys = frozenset(values)
+        names = cache.get(keys)
+        if names is None:
+            # Sensor names only change with the hwmon topology.
+            cache.clear()
+            names = cache[keys] = [key for key in values if fnmatch.fnmatchcase(key, pattern)]
+        return [values[name] for name in names if values[name] is not None]
+
+    return matching
+
+
+def _unary(operand: Evaluator, fn: Callable[[float], float]) -> Evaluator:
+    def evaluate(values: Values, now: float) -> Optional[float]:
+        value = operand(values, now)
+        return None if value is None else fn(value)
+
+    return evaluate
+
+
+def _as_list(inner: Evaluator) -> Callable[[Values, float], List[float]]:
+    def evaluate(values: Values, now: float) -> List[float]:
+        value = inner(values, now)
+        return [] if value is None else [value]
+
+    return evaluate
+
+
+def _string_arg(node: ast.Call, func: str) -> str:
+    if len(node.args) != 1 or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, str):
+        raise ValueError(f"{func}() takes one string literal")
+    return node.args[0].value
+
+
+def _compile_aggregate(node: ast.Call, func: str) -> Evaluator:
+    parts: List[Callable[[Values, float], List[float]]] = []
+    for arg in node.args:
+        if isinstance(arg, ast.Call) and isinstance(arg.func, ast.Name) and arg.func.id == "match":
+            matching = _matcher(_string_arg(arg, "match"))
+            parts.append(lambda values, _now, matching=matching: matching(values))
+        else:
+            parts.append(_as_list(_compile(arg)))
+    if not parts:
+        raise ValueError(f"{func}() needs at least one argument")
+    aggregate = _AGGREGATES[func]
+
+    def evaluate(values: Values, now: float) -> Optional[float]:
+        found = [v for part in parts for v in part(values, now)]
+        return aggregate(found) if found else None
+
+    return evaluate
+
+
+def _compile_window(node: ast.Call, func: str) -> Evaluator:
+    if len(node.args) != 2 or not isinstance(node.args[1], ast.Constant):
+        raise ValueError(f"{func}() takes an expression and a window length in seconds")
+    inner = _compile(node.args[0])
+    window = WINDOWS[func](float(node.args[1].value))
+
+    def evaluate(values: Values, now: float) -> Optional[float]:
+        window.evict(now)
+        value = inner(values, now)
+        if value is not None:
+            window.push(now, value)
+        return window.value()
+
+    return evaluate
+
+
+def _compile(node: ast.AST) -> Evaluator:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        constant = float(node.value)
+        return lambda _values, _now: constant
+    if isinstance(node, ast.Name):
+        return _lookup(node.id)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _unary(_compile(node.operand), operator.neg if isinstance(node.op, ast.USub) else operator.pos)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left, right = _compile(node.left), _compile(node.right)
+
+        def binary(values: Values, now: float) -> Optional[float]:
+            a, b = left(values, now), right(values, now)
+            if a is None or b is None:
+                return None
+            try:
+                return op(a, b)
+            except ZeroDivisionError:
+                return None
+
+        return binary
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        func = node.func.id
+        if func == "sensor":
+            return _lookup(_string_arg(node, "sensor"))
+        if func == "abs" and len(node.args) == 1:
+            return _unary(_compile(node.args[0]), abs)
+        if func in _AGGREGATES:
+            return _compile_aggregate(node, func)
+        if func in WINDOWS:
+            return _compile_window(node, func)
+        raise ValueError(f"unknown function {func}()")
+    raise ValueError(f"unsupported syntax: {ast.unparse(node)}")
+
+
+def compile_expression(text: str) -> Evaluator:
+    """
+    Parse an expression once into an evaluator with its own window state.
+
+    Expressions use sensor names (or sensor("name with/slashes")), numbers,
+    + - * /, abs(), aggregates max/min/sum/mean over values and
+    match("glob") sets, and windows avg/max_over/min_over/delta(expr, seconds).
+    """
+    try:
+        tree = ast.parse(text.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"invalid expression {text!r}: {e.msg}") from None
+    return _compile(tree.body)
+
+
+class VirtualSensor:
+    def __init__(self, name: str, expression: str, alert: Optional[Dict[str, Any]] = None):
+        if name in RESERVED_NAMES:
+            raise ValueError(f"{name} is a built-in source")
+        self.name = name
+        self.expression = expression
+        self.evaluate = compile_expression(expression)
+        self.rule: Optional[Rule] = None
+        if alert is not None:
+            if "high" not in alert:
+                raise ValueError("alert needs a high threshold")
+            high = float(alert["high"])
+            severity = CRITICAL if alert.get("severity") == CRITICAL else WARNING
+            self.rule = ThresholdRule(f"{name}_alert", name, high, float(alert.get("clear", high)), severity)
+
+
+class VirtualSensors:
+    """
+    Derived sensors evaluated on every sample, in definition order.
+
+    update() adds each virtual value to the values it is given, so later
+    definitions (and curves, alert rules, history and MQTT downstream) see
+    them exactly like real sensors.
+    """
+
+    def __init__(self, sensors: Optional[List[VirtualSensor]] = None, curve_sensor: str = "cpu"):
+        self.sensors = sensors or []
+        self.curve_sensor = curve_sensor
+
+    def update(self, values: Values, now: float) -> Values:
+        """Evaluate every sensor against values (updated in place); return the virtual ones."""
+        out: Values = {}
+        for sensor in self.sensors:
+            value = sensor.evaluate(values, now)
+            if value is not None:
+                values[sensor.name] = out[sensor.name] = round(value, 3)
+        return out
+
+    def alert_rules(self) -> List[Rule]:
+        return [sensor.rule for sensor in self.sensors if sensor.rule is not None]
+
+
+def load_virtual_sensors(path: Optional[str] = None) -> VirtualSensors:
+    """
+    Read definitions like {"sensors": {"hdd_max": "max(match('drivetemp*'))"}, "curve_sensor": "cpu"}.
+
+    A definition may also be {"expr": "...", "alert": {"high": 55, "clear": 50, "severity": "critical"}}.
+    A missing file means no virtual sensors; a bad definition is logged and skipped.
+    """
+    path = path or os.getenv(VIRTUAL_SENSORS_ENV_VAR, "").strip() or DEFAULT_VIRTUAL_SENSORS_FILE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        return VirtualSensors()
+    except (OSError, ValueError) as e:
+        LOGGER.error("Ignoring virtual sensors in %s: %s", path, e)
+        return VirtualSensors()
+
+    sensors = []
+    for name, spec in (config.get("sensors") or {}).items():
+        spec = spec if isinstance(spec, dict) else {"expr": spec}
+        try:
+            sensors.append(VirtualSensor(name, str(spec["expr"]), spec.get("alert")))
+        except (KeyError, TypeError, ValueError) as e:
+            LOGGER.error("Skipping virtual sensor %s: %s", name, e)
+    return VirtualSensors(sensors, str(config.get("curve_sensor") or "cpu"))
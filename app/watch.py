@@ -0,0 +1,243 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from backend import HardwareBackend, get_backend
+from fan import determine_pwm, feed_forward_boost, load_profile
+from hwmon import HWMON_ROOT, SensorFiles, _read_text, get_fan_channels, get_temp_channels
+from temperature_sources import get_temperature_sources
+from virtual_sensors import VirtualSensors, load_virtual_sensors
+
+SMART_DEVICES = ("/dev/nvme0", "/dev/sda")
+FORMATS = ("table", "jsonl")
+
+
+class Watcher:
+    """
+    Samples one backend repeatedly for `fan.py watch`.
+
+    The backend keeps its hwmon files open and the hwmon topology stays
+    cached, so a tick costs one pread per attribute. smartctl only runs
+    every smart_interval seconds (never when 0); other ticks reuse its last
+    reading.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[HardwareBackend] = None,
+        smart_interval: float = 60.0,
+        virtual: Optional[VirtualSensors] = None,
+    ):
+        self.backend = backend or get_backend(keep_open=True)
+        self.smart_interval = smart_interval
+        self.virtual = virtual if virtual is not None else load_virtual_sensors()
+        self._smart: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._smart_due_at = 0.0
+
+    def _read_smart(self, device: str, due: bool) -> Optional[Dict[str, Any]]:
+        if due:
+            self._smart[device] = self.backend.read_smart(device)
+        return self._smart.get(device)
+
+    def sample(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        now = time.monotonic()
+        smart_due = self.smart_interval > 0 and now >= self._smart_due_at
+        if smart_due:
+            self._smart_due_at = now + self.smart_interval
+
+        readings = self.backend.read_temperatures()
+        sensors = get_temperature_sources(
+            include_hdd=True,
+            readings=readings,
+            smart_reader=lambda device: self._read_smart(device, smart_due),
+            # Between due ticks the cache is only looked up, so a drive with no
+            # reading yet is not reported to SMART_BACKOFF as a failed probe.
+            probe_smart=smart_due,
+        )
+        fans = self.backend.read_fans()
+        values = dict(readings, **{item["name"]: item["value"] for item in sensors})
+        virtual = self.virtual.update(values, now)
+        profile = load_profile()
+        curve_temp = values.get(self.virtual.curve_sensor)
+        sample = {
+            "time": round(time.time(), 3),
+            "profile": profile,
+            "cpu": values.get("cpu"),
+            "nvme": values.get("nvme"),
+            "hdd": values.get("hdd"),
+            "pwm": determine_pwm(curve_temp, profile, feed_forward_boost()) if curve_temp is not None else None,
+            "fans": {fan["key"]: {"rpm": fan["rpm"], "pwm": fan["pwm"]} for fan in fans},
+            "read_ms": round((time.perf_counter() - started) * 1000.0, 3),
+        }
+        if self.virtual.sensors:
+            sample["virtual"] = virtual
+        return sample
+
+
+def _cell(value: Any, width: int) -> str:
+    if value is None:
+        return "--".rjust(width)
+    if isinstance(value, float):
+        return f"{value:.1f}".rjust(width)
+    return str(value).rjust(width)
+
+
+class TableFormatter:
+    """Fixed-width columns; the header is repeated when the set of fans changes."""
+
+    def __init__(self) -> None:
+        self._fans: Optional[List[str]] = None
+
+    def __call__(self, sample: Dict[str, Any]) -> str:
+        fans = list(sample["fans"])
+        lines = []
+        if fans != self._fans:
+            self._fans = fans
+            header = f"{'time':>10} {'cpu':>6} {'nvme':>6} {'hdd':>6} {'pwm':>4}"
+            header += "".join(f" {fan[-16:]:>16}" for fan in fans) + f" {'read_ms':>8}"
+            lines.append(header)
+        clock = time.strftime("%H:%M:%S", time.localtime(sample["time"]))
+        row = f"{clock:>10} {_cell(sample['cpu'], 6)} {_cell(sample['nvme'], 6)} {_cell(sample['hdd'], 6)}"
+        row += f" {_cell(sample['pwm'], 4)}"
+        for fan in fans:
+            rpm, pwm = sample["fans"][fan]["rpm"], sample["fans"][fan]["pwm"]
+            row += " " + f"{_cell(rpm, 6)} rpm/{_cell(pwm, 3)}".rjust(16)
+        row += f" {sample['read_ms']:>8.2f}"
+        lines.append(row)
+        return "\n".join(lines) + "\n"
+
+
+def _jsonl(sample: Dict[str, Any]) -> str:
+    return json.dumps(sample, separators=(",", ":")) + "\n"
+
+
+def watch(
+    interval: float = 1.0,
+    fmt: str = "table",
+    count: Optional[int] = None,
+    out: TextIO = sys.stdout,
+    watcher: Optional[Watcher] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> int:
+    """
+    Print one line per sample until interrupted (or count samples).
+
+    Ticks are scheduled on the monotonic clock; a tick that overruns skips
+    the missed slots rather than bunching samples together.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    watcher = watcher or Watcher()
+    formatter = TableFormatter() if fmt == "table" else _jsonl
+    written = 0
+    next_at = time.monotonic()
+    while count is None or written < count:
+        out.write(formatter(watcher.sample()))
+        out.flush()
+        written += 1
+        if count is not None and written >= count:
+            break
+        next_at += interval
+        now = time.monotonic()
+        if next_at < now:
+            next_at = now + interval - (now - next_at) % interval
+        sleep(next_at - now)
+    return written
+
+
+def _latency(name: str, read: Callable[[], Any], samples: int) -> Dict[str, Any]:
+    times: List[float] = []
+    error = None
+    for _ in range(samples):
+        started = time.perf_counter()
+        try:
+            read()
+        except (OSError, ValueError) as e:
+            error = str(e)
+            break
+        times.append((time.perf_counter() - started) * 1e6)
+    result: Dict[str, Any] = {"source": name, "samples": len(times)}
+    if times:
+        times.sort()
+        result.update(
+            median_us=round(statistics.median(times), 1),
+            p95_us=round(times[min(len(times) - 1, int(len(times) * 0.95))], 1),
+            max_us=round(times[-1], 1),
+        )
+    if error:
+        result["error"] = error
+    return result
+
+
+def bench(samples: int = 200, smart_samples: int = 1, root: str = HWMON_ROOT) -> List[Dict[str, Any]]:
+    """
+    Read latency per source on this machine.
+
+    Each hwmon temperature and fan input is timed both opened per read (as
+    the sampler does) and through a kept-open handle (as watch does);
+    smartctl is timed per device, and "tick" is one full watch sample.
+    """
+    files = SensorFiles(root)
+    results = []
+    inputs = [(f"temp {ch.key}", ch.path) for ch in get_temp_channels(root)]
+    inputs += [(f"fan {ch.key}", ch.rpm_path) for ch in get_fan_channels(root) if ch.rpm_path]
+    for name, path in inputs:
+        results.append(_latency(f"{name} (open)", partial(_read_text, path), samples))
+        results.append(_latency(f"{name} (pread)", partial(files.read_text, path), samples))
+    files.close()
+
+    backend = get_backend(keep_open=True)
+    if smart_samples > 0:
+        for device in SMART_DEVICES:
+            results.append(_latency(f"smartctl {device}", partial(backend.read_smart, device), smart_samples))
+    watcher = Watcher(backend, smart_interval=0)
+    results.append(_latency("tick", watcher.sample, samples))
+    return results
+
+
+def _print_bench(results: List[Dict[str, Any]], fmt: str, out: TextIO) -> None:
+    if fmt == "jsonl":
+        for result in results:
+            out.write(_jsonl(result))
+        return
+    width = max([len(result["source"]) for result in results] + [6])
+    out.write(f"{'source':<{width}} {'samples':>7} {'median_us':>10} {'p95_us':>10} {'max_us':>10}\n")
+    for result in results:
+        line = f"{result['source']:<{width}} {result['samples']:>7}"
+        line += "".join(f" {_cell(result.get(key), 10)}" for key in ("median_us", "p95_us", "max_us"))
+        if "error" in result:
+            line += f"  {result['error']}"
+        out.write(line + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="fan.py", description="Terminal telemetry")
+    commands = parser.add_subparsers(dest="command", required=True)
+    watch_cmd = commands.add_parser("watch", help="print one line per sample")
+    watch_cmd.add_argument("--interval", type=float, default=1.0, help="seconds between samples (default: 1)")
+    watch_cmd.add_argument("--format", choices=FORMATS, default="table")
+    watch_cmd.add_argument("--count", type=int, help="stop after this many samples")
+    watch_cmd.add_argument(
+        "--smart-interval", type=float, default=60.0, help="seconds between smartctl reads (0 disables)"
+    )
+    bench_cmd = commands.add_parser("bench", help="report per-source read latency")
+    bench_cmd.add_argument("--samples", type=int, default=200, help="reads per hwmon source (default: 200)")
+    bench_cmd.add_argument("--smart-samples", type=int, default=1, help="reads per smartctl device (0 skips)")
+    bench_cmd.add_argument("--format", choices=FORMATS, default="table")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        _print_bench(bench(args.samples, args.smart_samples), args.format, sys.stdout)
+        return 0
+    if args.interval <= 0:
+        parser.error("--interval must be > 0")
+    try:
+        watch(args.interval, args.format, args.count, watcher=Watcher(smart_interval=args.smart_interval))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    return 0
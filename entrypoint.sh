@@ -17,4 +17,4 @@ if ! sensors | grep -q .; then
 fi
 
 echo "[truefan] Launching with gunicorn..."
-exec gunicorn -w 2 -b 0.0.0.0:5002 server:app
+exec gunicorn -c gunicorn.conf.py server:app
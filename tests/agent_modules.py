@@ -0,0 +1,35 @@
+import importlib
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Dict
+
+AGENT_DIR = Path(__file__).resolve().parents[1] / "truefan-control"
+# app/ has modules with the same names (hwmon); these must never resolve to the other tree's.
+AGENT_MODULE_NAMES = frozenset(path.stem for path in AGENT_DIR.glob("*.py"))
+
+_LOADED: Dict[str, ModuleType] = {}
+
+
+def load_agent_module(name: str) -> ModuleType:
+    """
+    Import a truefan-control module, with its own imports resolved inside truefan-control.
+
+    The agent's modules are swapped into sys.modules only for the import and
+    kept here afterwards, so app/ modules of the same name stay importable.
+    """
+    if name in _LOADED:
+        return _LOADED[name]
+    saved_path = list(sys.path)
+    saved_modules = {key: sys.modules.pop(key) for key in AGENT_MODULE_NAMES if key in sys.modules}
+    sys.modules.update(_LOADED)
+    sys.path.insert(0, str(AGENT_DIR))
+    try:
+        return importlib.import_module(name)
+    finally:
+        for key in AGENT_MODULE_NAMES:
+            module = sys.modules.pop(key, None)
+            if module is not None:
+                _LOADED[key] = module
+        sys.modules.update(saved_modules)
+        sys.path[:] = saved_path
@@ -0,0 +1,72 @@
+import os
+
+from agent_modules import load_agent_module
+
+os.environ.setdefault("TRUEFAN_AGENT_SECRET", "test-secret")
+main = load_agent_module("main")
+
+
+def _channels(tmp_path, monkeypatch):
+    hw = tmp_path / "hwmon0"
+    hw.mkdir()
+    for name in ("pwm1", "pwm2"):
+        (hw / name).write_text("90\n", encoding="utf-8")
+        (hw / f"{name}_enable").write_text("5\n", encoding="utf-8")
+    # The agent discovers resolved paths.
+    paths = [os.path.realpath(hw / name) for name in ("pwm1", "pwm2")]
+
+    def write(pwm, pwm_files):
+        target = (pwm_files or paths)[0]
+        (hw / os.path.basename(target)).write_text(str(pwm), encoding="utf-8")
+        (hw / f"{os.path.basename(target)}_enable").write_text("1", encoding="utf-8")
+        return target
+
+    monkeypatch.setattr(main, "discover_pwm_files", lambda: list(paths))
+    monkeypatch.setattr(main, "write_pwm_value", write)
+    monkeypatch.setattr(main, "_SAVED_STATES", {})
+    monkeypatch.setattr(main, "_FAILSAFE", {"held": False})
+    return hw, paths
+
+
+def _duties(hw):
+    return [(hw / name).read_text(encoding="utf-8").strip() for name in ("pwm1", "pwm2")]
+
+
+def test_failsafe_holds_until_release(tmp_path, monkeypatch):
+    hw, paths = _channels(tmp_path, monkeypatch)
+
+    assert main.set_pwm(main.SetPwmBody(pwm=255, failsafe=True), None)["status"] == "ok"
+    assert _duties(hw) == ["255", "255"]
+
+    # A control loop or dashboard write must not lower the duty under a held failsafe.
+    for body in (main.SetPwmBody(pwm=70, all_channels=True), main.SetPwmBody(pwm=70, pwm_path=paths[0])):
+        assert main.set_pwm(body, None).status_code == 409
+    assert main.calibrate(main.CalibrateBody(), None).status_code == 409
+    assert _duties(hw) == ["255", "255"]
+
+    assert main.release(None) == {"status": "ok", "restored": {paths[0]: True, paths[1]: True}}
+    assert _duties(hw) == ["90", "90"]
+    assert (hw / "pwm1_enable").read_text(encoding="utf-8") == "5"
+    assert main.set_pwm(main.SetPwmBody(pwm=70, all_channels=True), None)["status"] == "ok"
+    assert _duties(hw) == ["70", "70"]
+
+
+def test_expired_lease_drops_the_failsafe_hold(tmp_path, monkeypatch):
+    _hw, paths = _channels(tmp_path, monkeypatch)
+    main.set_pwm(main.SetPwmBody(pwm=255, failsafe=True), None)
+
+    main.WATCHDOG.on_trip()
+
+    assert main._FAILSAFE["held"] is False
+    assert main.set_pwm(main.SetPwmBody(pwm=70, pwm_path=paths[0]), None)["status"] == "ok"
+
+
+def test_symlinked_pwm_path_is_accepted(tmp_path, monkeypatch):
+    hw, paths = _channels(tmp_path, monkeypatch)
+    (tmp_path / "class").mkdir()
+    (tmp_path / "class" / "hwmon3").symlink_to(hw, target_is_directory=True)
+
+    resp = main.set_pwm(main.SetPwmBody(pwm=70, pwm_path=str(tmp_path / "class" / "hwmon3" / "pwm2")), None)
+
+    assert resp["status"] == "ok"
+    assert main.set_pwm(main.SetPwmBody(pwm=70, pwm_path=str(tmp_path / "pwm9")), None).status_code == 404
@@ -0,0 +1,145 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import pytest  # noqa: E402
+
+import backend  # noqa: E402
+import fan  # noqa: E402
+import hwmon  # noqa: E402
+from agent_modules import load_agent_module  # noqa: E402
+
+calibration = load_agent_module("calibration")
+pwm = load_agent_module("pwm")
+
+
+def _fake_fan(tmp_path):
+    hw = tmp_path / "hwmon" / "hwmon3"
+    hw.mkdir(parents=True)
+    (hw / "name").write_text("nct6798\n", encoding="utf-8")
+    (hw / "pwm2").write_text("140\n", encoding="utf-8")
+    (hw / "pwm2_enable").write_text("5\n", encoding="utf-8")
+    (hw / "fan2_input").write_text("0\n", encoding="utf-8")
+
+    def settle(_seconds):
+        # Stalls below 60, needs 80 to restart, then ~10 RPM per PWM step.
+        pwm = int((hw / "pwm2").read_text(encoding="utf-8"))
+        spinning = int((hw / "fan2_input").read_text(encoding="utf-8")) > 0
+        rpm = pwm * 10 if pwm >= (60 if spinning else 80) else 0
+        (hw / "fan2_input").write_text(f"{rpm}\n", encoding="utf-8")
+
+    return hw, settle
+
+
+def test_calibration_sweep_records_table_and_restores_channel(tmp_path):
+    hw, settle = _fake_fan(tmp_path)
+
+    result = calibration.calibrate_channel(str(hw / "pwm2"), step=16, root=str(tmp_path / "hwmon"), sleep=settle)
+
+    table = dict(result["table"])
+    assert table[255] == 2550
+    assert table[63] == 630
+    assert table[47] == 0
+    assert result["stall_pwm"] == 47
+    assert result["start_pwm"] == 95
+    assert (hw / "pwm2").read_text(encoding="utf-8") == "140"
+    assert (hw / "pwm2_enable").read_text(encoding="utf-8") == "5"
+
+
+def test_abort_stops_sweep_and_restores_channel(tmp_path):
+    hw, settle = _fake_fan(tmp_path)
+    polls = []
+
+    def sleep(seconds):
+        polls.append(seconds)
+        settle(seconds)
+        if len(polls) == 3:
+            calibration._ABORT.set()
+
+    try:
+        with pytest.raises(calibration.CalibrationAborted):
+            calibration.calibrate_channel(str(hw / "pwm2"), root=str(tmp_path / "hwmon"), sleep=sleep)
+    finally:
+        calibration._ABORT.clear()
+    assert len(polls) == 3
+    assert (hw / "pwm2").read_text(encoding="utf-8") == "140"
+    assert (hw / "pwm2_enable").read_text(encoding="utf-8") == "5"
+
+
+def test_failsafe_state_round_trips(tmp_path):
+    hw, _settle = _fake_fan(tmp_path)
+    saved = pwm.read_channel_state(str(hw / "pwm2"))
+    (hw / "pwm2").write_text("255", encoding="utf-8")
+    (hw / "pwm2_enable").write_text("1", encoding="utf-8")
+
+    assert pwm.restore_channel_state(str(hw / "pwm2"), saved)
+    assert saved == {"pwm": 140, "enable": 5}
+    assert (hw / "pwm2").read_text(encoding="utf-8") == "140"
+    assert (hw / "pwm2_enable").read_text(encoding="utf-8") == "5"
+
+
+def test_rpm_profile_inverts_calibration_per_channel():
+    slow = {"table": [[0, 0], [64, 0], [128, 600], [255, 1200]], "start_pwm": 96}
+    fast = {"table": [[0, 0], [64, 900], [128, 1800], [255, 3000]], "start_pwm": 48}
+
+    targets = fan.channel_pwm_targets(60.0, "cool-rpm", {"slow": slow, "fast": fast})
+
+    assert targets == {"slow": 255, "fast": 114}
+    assert fan.rpm_to_pwm(slow, 300) == 96
+    assert fan.channel_pwm_targets(60.0, "cool", {"slow": slow}) == {"slow": 180}
+
+
+class RecordingBackend(backend.HardwareBackend):
+    name = "recording"
+
+    def __init__(self):
+        self.writes = []
+
+    def read_temperatures(self):
+        return {}
+
+    def read_fans(self):
+        return []
+
+    def read_smart(self, device):
+        return None
+
+    def set_pwm(self, pwm, channel=None):
+        self.writes.append((pwm, channel))
+        return True
+
+
+def test_rpm_profile_targets_are_written_per_calibrated_channel(tmp_path, monkeypatch):
+    slow = {"table": [[0, 0], [64, 0], [128, 600], [255, 1200]], "start_pwm": 96}
+    # The agent reports the resolved path; hwmon indexes the channel through a symlinked directory.
+    (tmp_path / "devices").mkdir()
+    (tmp_path / "devices" / "pwm1").write_text("0", encoding="utf-8")
+    (tmp_path / "class").symlink_to(tmp_path / "devices", target_is_directory=True)
+    channel = hwmon.FanChannel("nct6798/fan1", "nct6798", 1, None, None, str(tmp_path / "class" / "pwm1"), None)
+    recorder = RecordingBackend()
+    monkeypatch.setattr(fan, "read_sensor_values", lambda: {"cpu": 60.0})
+    monkeypatch.setattr(fan, "load_profile", lambda: "cool-rpm")
+    tables = {str(tmp_path / "devices" / "pwm1"): slow}
+    monkeypatch.setattr(fan, "agent_get_calibration", lambda: {"ok": True, "data": {"channels": tables}})
+    monkeypatch.setattr(fan, "get_fan_channels", lambda: (channel,))
+    monkeypatch.setattr(fan, "shared_backend", lambda: recorder)
+
+    status = fan.control_loop(iterations=1, apply=True)
+
+    assert status["channel_pwm"] == {"nct6798/fan1": 255}
+    assert status["applied"] is True
+    assert recorder.writes == [(255, "nct6798/fan1")]
+
+    monkeypatch.setattr(fan, "load_profile", lambda: "quiet")
+    recorder.writes.clear()
+    assert "channel_pwm" not in fan.control_loop(iterations=1, apply=True)
+    assert recorder.writes == [(70, None)]
+
+    # Without apply the loop only reports.
+    recorder.writes.clear()
+    assert fan.control_loop(iterations=1)["applied"] is False
+    assert recorder.writes == []
@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import events  # noqa: E402
+
+
+def _sample(t, fans=None, **values):
+    return {"time": t, "values": values, "fans": fans or []}
+
+
+def test_threshold_hysteresis_and_failsafe_latency():
+    calls = []
+    clock = iter([10.25]).__next__
+    engine = events.ThermalEventEngine(
+        rules=[events.ThresholdRule("cpu_critical", "cpu", high=90.0, clear=80.0, severity=events.CRITICAL)],
+        actuator=lambda: calls.append("full") or True,
+        releaser=lambda: calls.append("restore") or True,
+        clock=clock,
+    )
+
+    assert engine.evaluate(_sample(9.0, cpu=85.0)) == []
+    raised = engine.evaluate(_sample(10.0, cpu=91.0))
+    assert [e["event"] for e in raised] == ["raised"]
+    assert calls == ["full"]
+    assert engine.failsafe["engaged"] is True
+    assert engine.failsafe["last_latency_ms"] == 250.0
+
+    # Inside the hysteresis band: still critical, no second actuation.
+    assert engine.evaluate(_sample(11.0, cpu=84.0)) == []
+    assert calls == ["full"]
+
+    cleared = engine.evaluate(_sample(12.0, cpu=79.0))
+    assert [e["event"] for e in cleared] == ["cleared"]
+    assert engine.failsafe["engaged"] is False
+    assert calls == ["full", "restore"]
+    assert engine.report()["counters"] == {"cpu_critical": 1}
+
+
+def test_rate_stall_and_lost_rules():
+    engine = events.ThermalEventEngine(
+        rules=[
+            events.RateOfRiseRule("cpu_rising", "cpu", limit=2.0),
+            events.FanStallRule("fan_stall", min_pwm=128, consecutive=2),
+            events.SensorLostRule("sensor_lost", ["hdd"], consecutive=1),
+        ],
+        actuator=lambda: False,
+    )
+    stalled = [{"key": "fan1", "rpm": 0, "pwm": 200, "pwm_enable": 1}]
+
+    engine.evaluate(_sample(0.0, stalled, cpu=50.0, hdd=35.0))
+    raised = engine.evaluate(_sample(1.0, stalled, cpu=53.0))
+
+    assert {(e["rule"], e["subject"]) for e in raised} == {
+        ("cpu_rising", "cpu"),
+        ("fan_stall", "fan1"),
+        ("sensor_lost", "hdd"),
+    }
+    assert engine.failsafe["engaged"] is False
+    assert engine.failsafe["failures"] == 1
+
+
+def test_empty_header_is_not_a_stall():
+    rule = events.FanStallRule("fan_stall", min_pwm=128, consecutive=2)
+    empty = {"key": "fan3", "rpm": 0, "pwm": 255, "pwm_enable": 5}
+    spinning = {"key": "fan1", "rpm": 900, "pwm": 200, "pwm_enable": 5}
+
+    for t in range(3):
+        assert rule.evaluate(_sample(t, [empty, spinning])) == {"fan1": False}
+    # A fan seen spinning that stops is judged even in automatic mode.
+    stopped = dict(spinning, rpm=0)
+    assert rule.evaluate(_sample(3, [empty, stopped])) == {"fan1": False}
+    assert rule.evaluate(_sample(4, [empty, stopped])) == {"fan1": True}
+
+
+def test_sensor_lost_is_debounced_and_ignores_backed_off_sources():
+    rule = events.SensorLostRule("sensor_lost", ["nvme", "hdd"], consecutive=3)
+    assert rule.evaluate(_sample(0, nvme=40.0, hdd=35.0)) == {"nvme": False, "hdd": False}
+
+    for t in (1, 2):
+        sample = dict(_sample(t, nvme=40.0), skipped={"hdd"})
+        assert rule.evaluate(sample) == {"nvme": False}
+    assert rule.evaluate(_sample(3)) == {"nvme": False, "hdd": False}
+    assert rule.evaluate(_sample(4)) == {"nvme": False, "hdd": False}
+    assert rule.evaluate(_sample(5)) == {"nvme": True, "hdd": True}
+    assert rule.evaluate(_sample(6, nvme=41.0)) == {"nvme": False, "hdd": True}
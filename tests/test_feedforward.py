@@ -0,0 +1,108 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import fan  # noqa: E402
+import feedforward  # noqa: E402
+
+
+class FakeProc:
+    def __init__(self, tmp_path):
+        self.stat = tmp_path / "stat"
+        self.diskstats = tmp_path / "diskstats"
+        self.cpu = [0, 0, 0, 0]  # user, system, idle, iowait
+        self.sectors = 0
+        self.now = 0.0
+        self.write()
+
+    def write(self):
+        user, system, idle, iowait = self.cpu
+        self.stat.write_text(f"cpu  {user} 0 {system} {idle} {iowait} 0 0 0 0 0\ncpu0 {user} 0 {system} {idle}\n")
+        self.diskstats.write_text(
+            f"   8       0 sda 100 0 {self.sectors} 10 50 0 {self.sectors} 20 0 30 40 0 0 0 0\n"
+            f"   8       1 sda1 100 0 999999 10 50 0 999999 20 0 30 40 0 0 0 0\n"
+            f"   7       0 loop0 1 0 888888 0 0 0 0 0 0 0 0 0 0 0 0\n"
+        )
+
+    def tick(self, seconds, busy_fraction=0.0, disk_bytes_per_second=0.0):
+        jiffies = int(seconds * 100)
+        busy = int(jiffies * busy_fraction)
+        self.cpu[0] += busy
+        self.cpu[2] += jiffies - busy
+        # Reads and writes count separately; split the traffic evenly.
+        self.sectors += int(disk_bytes_per_second * seconds / feedforward.SECTOR_BYTES / 2)
+        self.now += seconds
+        self.write()
+
+    def feedforward(self, **kwargs):
+        return feedforward.FeedForward(
+            cpu=feedforward.CpuUtilization(str(self.stat)),
+            disk=feedforward.DiskThroughput(str(self.diskstats), disks=["sda"]),
+            clock=lambda: self.now,
+            **kwargs,
+        )
+
+
+def test_readers_compute_deltas_from_whole_disks(tmp_path):
+    proc = FakeProc(tmp_path)
+    cpu = feedforward.CpuUtilization(str(proc.stat))
+    disk = feedforward.DiskThroughput(str(proc.diskstats), disks=["sda"])
+    assert cpu.read() is None
+    assert disk.read(proc.now) is None
+
+    proc.tick(2.0, busy_fraction=0.25, disk_bytes_per_second=1024 * 1024)
+    assert cpu.read() == 0.25
+    assert disk.read(proc.now) == 1024 * 1024
+
+
+def test_burst_boosts_immediately_and_decays(tmp_path):
+    proc = FakeProc(tmp_path)
+    ff = proc.feedforward(max_boost=80, decay_seconds=30, disk_full_bps=100 * 1024 * 1024)
+    assert ff.update() == 0
+
+    proc.tick(5, busy_fraction=0.1)
+    assert ff.update() == 0
+
+    # A scrub starting: disk throughput at the full-boost rate.
+    proc.tick(5, disk_bytes_per_second=100 * 1024 * 1024)
+    assert ff.update() == 80
+    assert ff.report()["disk_bytes_per_second"] == 100 * 1024 * 1024
+
+    proc.tick(30)
+    assert ff.update() == round(80 * 0.3679)
+    proc.tick(120)
+    assert ff.update() <= 2
+
+    # A fully busy CPU also earns the full boost.
+    proc.tick(5, busy_fraction=1.0)
+    assert ff.update() == 80
+
+
+def test_boost_raises_curve_pwm_capped_at_full_duty():
+    assert fan.determine_pwm(60.0, "cool") == 180
+    assert fan.determine_pwm(60.0, "cool", 40) == 220
+    assert fan.determine_pwm(75.0, "cool", 40) == 255
+    calibration = {"table": [[0, 0], [100, 600], [255, 2400]], "start_pwm": 60}
+    plain = fan.channel_pwm_targets(60.0, "cool-rpm", {"pwm1": calibration})
+    boosted = fan.channel_pwm_targets(60.0, "cool-rpm", {"pwm1": calibration}, boost=30)
+    assert boosted["pwm1"] == plain["pwm1"] + 30
+
+
+def test_one_primed_instance_feeds_every_duty(monkeypatch):
+    monkeypatch.setattr(feedforward, "FEEDFORWARD_ENABLED", True)
+    monkeypatch.setattr(feedforward, "PRIME_SECONDS", 0.0)
+    monkeypatch.setattr(feedforward, "_SHARED", None)
+    shared = feedforward.shared_feed_forward()
+    assert shared is feedforward.shared_feed_forward()
+    # Primed on creation, so the first caller already has a delta to work from.
+    assert shared._updated_at is not None
+
+    monkeypatch.setattr(shared, "update", lambda: 25)
+    monkeypatch.setattr(fan, "read_sensor_values", lambda: {"cpu": 60.0})
+    monkeypatch.setattr(fan, "load_profile", lambda: "cool")
+    status = fan.get_status()
+    assert (status["feedforward_pwm"], status["pwm"]) == (25, 205)
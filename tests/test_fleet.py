@@ -0,0 +1,113 @@
+import asyncio
+import json
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import fleet  # noqa: E402
+
+
+def _stand_in_node(cpu):
+    """Serve a canned /status over HTTP/1.1 keep-alive and count connections."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            self.server.connections += 1
+
+        def do_GET(self):
+            body = json.dumps({"sensors": [{"name": "cpu", "value": cpu}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _dead_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_aggregator_merges_nodes_and_reuses_connections():
+    servers = [_stand_in_node(40.0), _stand_in_node(71.5)]
+    dead = f"127.0.0.1:{_dead_port()}"
+    nodes = [f"127.0.0.1:{s.server_address[1]}" for s in servers] + [dead]
+    aggregator = fleet.FleetAggregator(nodes, interval=5.0, timeout=1.0)
+
+    async def scenario():
+        for _ in range(3):
+            await aggregator.poll_once(force=True)
+        view = aggregator.view()
+        for client in aggregator.clients.values():
+            await client.close()
+        return view
+
+    try:
+        view = asyncio.run(scenario())
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    assert view["summary"] == {
+        "nodes": 3,
+        "online": 2,
+        "offline": 1,
+        "hottest": {"node": nodes[1], "sensor": "cpu", "value": 71.5},
+        "failsafe_engaged": [],
+    }
+    assert view["nodes"][dead]["failures"] == 3
+    assert view["nodes"][dead]["error"].startswith("connection_failed")
+    # Three polls per node over a single keep-alive connection.
+    assert [s.connections for s in servers] == [1, 1]
+    assert json.loads(aggregator.body())["summary"]["online"] == 2
+
+
+def test_failed_node_backs_off_exponentially():
+    aggregator = fleet.FleetAggregator([f"127.0.0.1:{_dead_port()}"], interval=5.0, timeout=1.0)
+    node = next(iter(aggregator.clients))
+
+    asyncio.run(aggregator.poll_once())
+    first = aggregator._next_due[node]
+    asyncio.run(aggregator.poll_once(force=True))
+    second = aggregator._next_due[node]
+
+    # No poll is due yet, so an unforced round skips the node entirely.
+    asyncio.run(aggregator.poll_once())
+    assert aggregator.nodes[node]["failures"] == 2
+    assert second - first > 5.0
+
+
+def test_unexpected_poll_error_is_logged_and_contained(caplog):
+    aggregator = fleet.FleetAggregator(["127.0.0.1:1"], interval=5.0, timeout=1.0)
+    node = next(iter(aggregator.clients))
+
+    async def broken(path):
+        raise RuntimeError("bad payload")
+
+    aggregator.clients[node].get = broken
+    view = asyncio.run(aggregator.poll_once())
+
+    assert view["nodes"][node]["error"] == "error: bad payload"
+    assert view["nodes"][node]["failures"] == 1
+    assert "Unexpected error polling 127.0.0.1:1" in caplog.text
@@ -0,0 +1,111 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import json  # noqa: E402
+import os  # noqa: E402
+import time  # noqa: E402
+
+import history  # noqa: E402
+import server  # noqa: E402
+
+# 2026-01-01T00:00:00Z; the samples below straddle midnight into 2026-01-02.
+DAY_START = 1767225600.0
+
+
+def _fill(root, seconds=200):
+    writer = history.HistoryWriter(root=str(root), retention_days=3650)
+    start = DAY_START + 86400 - 100
+    for i in range(seconds):
+        writer.append(start + i, {"cpu": 40.0 + i % 10, "coretemp/Package id 0": 50.0, "hdd": None})
+    writer.close()
+    return start
+
+
+def test_range_query_spans_day_files_and_skips_gaps(tmp_path):
+    start = _fill(tmp_path)
+
+    assert history.list_series(str(tmp_path)) == ["coretemp/Package id 0", "cpu"]
+    assert sorted(p.name for p in (tmp_path / "cpu").iterdir()) == ["2026-01-01.bin", "2026-01-02.bin"]
+
+    points = list(history.iter_series("cpu", start + 95, start + 104.5, root=str(tmp_path)))
+    assert [ts - start for ts, _ in points] == list(range(95, 105))
+    assert points[0][1] == 45.0
+
+    buckets = list(history.downsample(history.iter_series("cpu", start, start + 199, str(tmp_path)), 10.0, "max"))
+    assert len(buckets) == 20
+    assert all(value == 49.0 for _, value in buckets)
+
+
+def test_writer_ignores_backwards_timestamps_and_prunes_old_days(tmp_path):
+    writer = history.HistoryWriter(root=str(tmp_path), retention_days=1)
+    writer.append(DAY_START, {"cpu": 40.0})
+    writer.append(DAY_START - 5, {"cpu": 41.0})
+    assert len(list(history.iter_series("cpu", DAY_START - 10, DAY_START + 10, str(tmp_path)))) == 1
+
+    writer.append(DAY_START + 3 * 86400, {"cpu": 42.0})
+    writer.close()
+    assert [p.name for p in (tmp_path / "cpu").iterdir()] == ["2026-01-04.bin"]
+
+
+def test_export_streams_csv_and_ndjson(tmp_path, monkeypatch):
+    start = _fill(tmp_path)
+    monkeypatch.setenv(history.HISTORY_DIR_ENV_VAR, str(tmp_path))
+    monkeypatch.setattr(history, "EXPORT_CHUNK_BYTES", 256)
+    client = server.app.test_client()
+
+    res = client.get(f"/export?series=cpu,coretemp/Package id 0&from={start}&to={start + 99}")
+    assert res.status_code == 200
+    assert res.is_streamed
+    assert "Content-Length" not in res.headers
+    lines = res.get_data(as_text=True).splitlines()
+    assert lines[0] == "timestamp,series,value"
+    assert len(lines) == 1 + 2 * 100
+    assert lines[1:3] == [f"{start:.3f},coretemp/Package id 0,50", f"{start:.3f},cpu,40"]
+
+    res = client.get(f"/export?format=ndjson&series=cpu&from={start}&to={start + 199}&step=50&agg=mean")
+    rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    assert [row["value"] for row in rows] == [44.5] * 4
+
+    assert client.get("/export?format=xml").status_code == 400
+    assert client.get("/export?from=yesterday").status_code == 400
+    for bad in ("series=..", "series=.", "series=cpu,nope", "step=nan", "step=inf", "from=nan"):
+        assert client.get(f"/export?{bad}").status_code == 400, bad
+
+
+def test_dot_series_stay_inside_the_history_root(tmp_path):
+    root = tmp_path / "history"
+    writer = history.HistoryWriter(root=str(root))
+    writer.append(DAY_START, {"..": 1.0})
+    writer.close()
+    assert history.list_series(str(root)) == [".."]
+    assert [name for name in os.listdir(tmp_path)] == ["history"]
+    assert list(history.iter_series("..", DAY_START - 1, DAY_START + 1, str(root))) == [(DAY_START, 1.0)]
+
+
+def test_history_endpoint_seeds_chart_series(tmp_path, monkeypatch):
+    writer = history.HistoryWriter(root=str(tmp_path))
+    now = time.time()
+    snapshot = {
+        "sensors": [{"name": "cpu", "value": 50.0}],
+        "temperatures": {"coretemp/Core 0": 48.0},
+        "fan": {"fan1": 900},
+        "fans": [{"key": "fan1", "pwm": 120}],
+    }
+    for i in range(60):
+        writer.append(now - 60 + i, history.snapshot_values(snapshot))
+    writer.close()
+    monkeypatch.setenv(history.HISTORY_DIR_ENV_VAR, str(tmp_path))
+
+    payload = server.app.test_client().get("/history?seconds=300&step=30").get_json()
+
+    assert sorted(payload["series"]) == ["cpu", "fan/fan1", "pwm/fan1"]
+    assert 2 <= len(payload["series"]["cpu"]) <= 3
+    assert all(value == 120 for _, value in payload["series"]["pwm/fan1"])
+    assert server.app.test_client().get("/history?seconds=-5").status_code == 400
+    for bad in ("seconds=nan", "step=nan", "step=-1", "series=..", "series=cpu,missing"):
+        assert server.app.test_client().get(f"/history?{bad}").status_code == 400, bad
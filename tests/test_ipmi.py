@@ -0,0 +1,155 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import backend  # noqa: E402
+import control_client  # noqa: E402
+import fan  # noqa: E402
+import ipmi  # noqa: E402
+from temperature_sources import get_temperature_sources  # noqa: E402
+
+SDR = """\
+CPU Temp         | 45 degrees C      | ok
+PCH Temp         | 52 degrees C      | ok
+System Temp      | 33 degrees C      | ok
+DIMMB1 Temp      | no reading        | ns
+FAN1             | 1400 RPM          | ok
+FAN2             | no reading        | ns
+FANA             | 1000 RPM          | ok
+12V              | 12.19 Volts       | ok
+"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def stub_ipmitool(tmp_path, exit_code=0):
+    """An ipmitool stand-in that logs its arguments and prints SDR for `sdr`."""
+    (tmp_path / "sdr.txt").write_text(SDR)
+    script = tmp_path / "ipmitool"
+    script.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> "{tmp_path}/calls.log"\n'
+        f'[ "$1" = sdr ] && cat "{tmp_path}/sdr.txt"\n'
+        f'[ "$1 $4" = "raw 0x00" ] && echo " 02"\n'
+        f"exit {exit_code}\n"
+    )
+    script.chmod(0o755)
+    return str(script)
+
+
+def calls(tmp_path):
+    log = tmp_path / "calls.log"
+    return log.read_text().splitlines() if log.exists() else []
+
+
+def test_parse_sdr_keeps_temperatures_and_fans():
+    temperatures, fans = ipmi.parse_sdr(SDR)
+    assert temperatures == {"ipmi-cpu/CPU Temp": 45.0, "ipmi/PCH Temp": 52.0, "ipmi/System Temp": 33.0}
+    assert fans == {"FAN1": 1400, "FANA": 1000}
+    assert [source for source in get_temperature_sources(readings=temperatures)][0] == {"name": "cpu", "value": 45.0}
+
+
+def test_one_sdr_call_serves_a_tick(tmp_path):
+    clock = Clock()
+    b = ipmi.IpmiBackend([stub_ipmitool(tmp_path)], cache_seconds=1.0, clock=clock)
+    assert b.read_temperatures()["ipmi-cpu/CPU Temp"] == 45.0
+    assert [(fan["key"], fan["rpm"]) for fan in b.read_fans()] == [("FAN1", 1400), ("FANA", 1000)]
+    assert calls(tmp_path) == ["sdr list full"]
+
+    clock.now = 1.5
+    b.read_temperatures()
+    assert calls(tmp_path) == ["sdr list full"] * 2
+
+
+def test_set_pwm_switches_to_full_mode_once_and_sets_zone_duty(tmp_path):
+    b = ipmi.IpmiBackend([stub_ipmitool(tmp_path)])
+    assert b.set_pwm(255)
+    assert b.set_pwm(128, channel="FANA")
+    assert calls(tmp_path) == [
+        "raw 0x30 0x45 0x00",
+        "raw 0x30 0x45 0x01 0x01",
+        "raw 0x30 0x70 0x66 0x01 0x00 0x64",
+        "raw 0x30 0x70 0x66 0x01 0x01 0x64",
+        "sdr list full",
+        "raw 0x30 0x70 0x66 0x01 0x01 0x32",
+    ]
+    fans = {fan["key"]: fan for fan in b.read_fans()}
+    assert (fans["FAN1"]["pwm"], fans["FANA"]["pwm"], fans["FANA"]["pwm_enable"]) == (255, 128, 1)
+    assert b.report()["original_mode"] == "optimal"
+    assert not b.set_pwm(100, channel="FAN9")
+
+    # Stopping hands control back to the BMC in the mode it had.
+    b.close()
+    assert calls(tmp_path)[-1] == "raw 0x30 0x45 0x01 0x02"
+    assert b.read_fans()[0]["pwm_enable"] is None
+
+
+def test_failsafe_release_restores_duty_or_bmc_mode(tmp_path):
+    b = ipmi.IpmiBackend([stub_ipmitool(tmp_path)])
+    assert b.engage_failsafe()
+    assert b.release_failsafe()
+    assert calls(tmp_path)[-1] == "raw 0x30 0x45 0x01 0x02"
+
+    assert b.set_pwm(102)
+    assert b.engage_failsafe()
+    assert b.release_failsafe()
+    assert calls(tmp_path)[-2:] == ["raw 0x30 0x70 0x66 0x01 0x00 0x28", "raw 0x30 0x70 0x66 0x01 0x01 0x28"]
+    b.close()
+
+
+def test_duty_never_drops_below_minimum():
+    assert ipmi.duty_percent(0) == ipmi.MIN_DUTY_PERCENT
+    assert ipmi.duty_percent(300) == 100
+
+
+def test_failing_bmc_reads_empty_and_reports_error(tmp_path):
+    b = ipmi.IpmiBackend([stub_ipmitool(tmp_path, exit_code=1)], cache_seconds=60.0)
+    assert b.read_temperatures() == {}
+    assert b.read_fans() == []
+    assert not b.set_pwm(200)
+    assert len(calls(tmp_path)) == 3
+    assert b.report()["last_error"].startswith("setting fan mode full failed")
+
+    missing = ipmi.IpmiBackend([str(tmp_path / "no-such-ipmitool")])
+    assert missing.read_temperatures() == {}
+    assert missing.last_error.startswith("sdr list failed")
+
+
+def test_get_backend_selects_ipmi(tmp_path, monkeypatch):
+    monkeypatch.setenv(ipmi.IPMITOOL_ENV_VAR, stub_ipmitool(tmp_path))
+    monkeypatch.setenv(ipmi.IPMI_ARGS_ENV_VAR, "-I lanplus -H bmc")
+    b = backend.get_backend("ipmi")
+    assert isinstance(b, ipmi.IpmiBackend)
+    assert b.command[1:] == ["-I", "lanplus", "-H", "bmc"]
+
+
+def test_control_loop_drives_bmc_zones(tmp_path, monkeypatch):
+    monkeypatch.setenv(backend.BACKEND_ENV_VAR, "ipmi")
+    monkeypatch.setenv(ipmi.IPMITOOL_ENV_VAR, stub_ipmitool(tmp_path))
+    monkeypatch.setattr(backend, "_SHARED", {})
+    # No calibration tables: the agent is not there on a BMC-managed board.
+    monkeypatch.setattr(control_client, "_request", lambda *args, **kw: {"ok": False, "data": {}})
+    monkeypatch.setattr(fan, "read_sensor_values", lambda: {"cpu": 72.0})
+    monkeypatch.setattr(fan, "load_profile", lambda: "quiet")
+    bmc = backend.shared_backend()
+
+    assert fan.control_loop(iterations=1, apply=True)["applied"] is True
+    assert calls(tmp_path)[-2:] == ["raw 0x30 0x70 0x66 0x01 0x00 0x2f", "raw 0x30 0x70 0x66 0x01 0x01 0x2f"]
+
+    # While the failsafe holds the zones at full duty, control writes are refused.
+    assert bmc.engage_failsafe()
+    assert fan.control_loop(iterations=1, apply=True)["applied"] is False
+    assert calls(tmp_path)[-1] == "raw 0x30 0x70 0x66 0x01 0x01 0x64"
+    assert bmc.release_failsafe()
+    assert calls(tmp_path)[-1] == "raw 0x30 0x70 0x66 0x01 0x01 0x2f"
+    bmc.close()
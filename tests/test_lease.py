@@ -0,0 +1,67 @@
+from agent_modules import load_agent_module
+
+lease = load_agent_module("lease")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _hwmon_tree(tmp_path):
+    root = tmp_path / "hwmon"
+    hw = root / "hwmon0"
+    hw.mkdir(parents=True)
+    (hw / "name").write_text("nct6798\n", encoding="utf-8")
+    (hw / "pwm1").write_text("70\n", encoding="utf-8")
+    (hw / "pwm1_enable").write_text("5\n", encoding="utf-8")
+    (hw / "pwm2").write_text("70\n", encoding="utf-8")
+    return root, hw
+
+
+def test_expired_lease_restores_automatic_mode(tmp_path):
+    root, hw = _hwmon_tree(tmp_path)
+    clock = FakeClock()
+    dog = lease.Watchdog(root=str(root), action="auto", clock=clock)
+
+    dog.remember_modes()
+    (hw / "pwm1_enable").write_text("1\n", encoding="utf-8")
+    dog.renew(10)
+
+    clock.now += 9.9
+    assert dog.check() is False
+    assert dog.heartbeat(10) is True
+    clock.now += 9.9
+    assert dog.check() is False
+    assert dog.status()["remaining_seconds"] == 0.1
+
+    clock.now += 0.6
+    assert dog.check() is True
+
+    # pwm1 goes back to the driver's own mode; pwm2 has no enable file.
+    assert (hw / "pwm1_enable").read_text(encoding="utf-8") == "5"
+    assert (hw / "pwm2").read_text(encoding="utf-8") == "255"
+    status = dog.status()
+    assert status["armed"] is False
+    assert status["trips"] == 1
+    assert status["last_trip"]["overdue_seconds"] == 0.5
+    assert dog.heartbeat(10) is False
+
+
+def test_full_action_pins_safe_pwm_and_respects_suspension(tmp_path):
+    root, hw = _hwmon_tree(tmp_path)
+    clock = FakeClock()
+    suspended = [True]
+    dog = lease.Watchdog(root=str(root), action="full", clock=clock, suspended=lambda: suspended[0])
+
+    dog.renew(5)
+    clock.now += 6
+    assert dog.check() is False
+
+    suspended[0] = False
+    assert dog.check() is True
+    assert (hw / "pwm1").read_text(encoding="utf-8") == "255"
+    assert (hw / "pwm1_enable").read_text(encoding="utf-8") == "1"
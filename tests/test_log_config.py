@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import logging  # noqa: E402
+import queue  # noqa: E402
+
+import log_config  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _record(name, msg, *args, level=logging.ERROR):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_repeats_collapse_into_one_summary_per_window():
+    clock = FakeClock()
+    throttle = log_config.LogThrottle(window=60.0, rate=100.0, clock=clock)
+
+    passed = []
+    for _ in range(1800):
+        record = _record("temperature_sources", "Skipping %s source: no valid temperature", "hdd")
+        if throttle.filter(record):
+            passed.append(record)
+        clock.now += 0.01
+    # A different subject is a different key and is not swallowed.
+    assert throttle.filter(_record("temperature_sources", "Skipping %s source: no valid temperature", "nvme"))
+    assert len(passed) == 1
+
+    clock.now += 60.0
+    summaries = throttle.flush()
+    assert [r.getMessage() for r in summaries] == ["Skipping hdd source: no valid temperature [repeated 1799× in last 78s]"]
+    assert throttle.flush() == []
+
+
+def test_next_occurrence_after_window_carries_the_count():
+    clock = FakeClock()
+    throttle = log_config.LogThrottle(window=10.0, rate=100.0, clock=clock)
+    assert throttle.filter(_record("sensors", "smartctl failed"))
+    assert not throttle.filter(_record("sensors", "smartctl failed"))
+
+    clock.now += 11.0
+    record = _record("sensors", "smartctl failed")
+    assert throttle.filter(record)
+    assert record.getMessage() == "smartctl failed [repeated 1× in last 11s]"
+
+
+def test_per_logger_rate_limits_drop_and_report():
+    clock = FakeClock()
+    rates = log_config.parse_rate_limits("hwmon=0.5, bogus, sensors=x")
+    assert rates == {"hwmon": 0.5}
+    throttle = log_config.LogThrottle(window=60.0, rate=100.0, rates=rates, burst=2, clock=clock)
+
+    allowed = [throttle.filter(_record("hwmon.scan", "reading %d", i, level=logging.INFO)) for i in range(5)]
+    assert allowed == [True, True, False, False, False]
+    assert all(throttle.filter(_record("sensors", "reading %d", i, level=logging.INFO)) for i in range(2))
+
+    clock.now += 2.0
+    assert throttle.filter(_record("hwmon.scan", "reading %d", 99, level=logging.INFO))
+    [summary] = throttle.flush()
+    assert (summary.name, summary.getMessage()) == ("hwmon.scan", "Rate limit dropped 3 records")
+
+
+def test_warnings_bypass_the_rate_limit_but_are_deduplicated():
+    clock = FakeClock()
+    throttle = log_config.LogThrottle(window=60.0, rate=0.1, burst=1, clock=clock)
+
+    assert throttle.filter(_record("events", "noise %d", 0, level=logging.DEBUG))
+    assert not throttle.filter(_record("events", "noise %d", 1, level=logging.DEBUG))
+    assert throttle.filter(_record("events", "Failsafe engaged", level=logging.WARNING))
+    assert throttle.filter(_record("events", "Rule %s failed", "x", level=logging.CRITICAL))
+    assert not throttle.filter(_record("events", "Failsafe engaged", level=logging.WARNING))
+
+
+def test_queue_handler_never_blocks_when_full():
+    handler = log_config._DroppingQueueHandler(queue.Queue(1))
+    handler.handle(_record("x", "first"))
+    handler.handle(_record("x", "second"))
+    assert handler.dropped == 1
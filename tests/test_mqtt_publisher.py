@@ -0,0 +1,153 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import json  # noqa: E402
+import socket  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+
+import mqtt_publisher  # noqa: E402
+
+
+class StandInBroker:
+    """Accepts MQTT 3.1.1 clients on localhost and records what they publish."""
+
+    def __init__(self):
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.connects = []
+        self.messages = []
+        self.clients = []
+        self.changed = threading.Condition()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.clients.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _read_packet(self, conn):
+        header = conn.recv(1)
+        if not header:
+            return None, b""
+        length, shift = 0, 0
+        while True:
+            digit = conn.recv(1)[0]
+            length += (digit & 0x7F) << shift
+            shift += 7
+            if not digit & 0x80:
+                break
+        body = b""
+        while len(body) < length:
+            body += conn.recv(length - len(body))
+        return header[0], body
+
+    def _serve(self, conn):
+        try:
+            while True:
+                kind, body = self._read_packet(conn)
+                if kind is None:
+                    return
+                with self.changed:
+                    if kind == mqtt_publisher.CONNECT:
+                        self.connects.append(body)
+                        conn.sendall(bytes((mqtt_publisher.CONNACK, 2, 0, 0)))
+                    elif kind & 0xF0 == mqtt_publisher.PUBLISH:
+                        size = int.from_bytes(body[:2], "big")
+                        topic = body[2 : 2 + size].decode()
+                        self.messages.append((topic, body[2 + size :].decode(), bool(kind & 1)))
+                    elif kind == mqtt_publisher.PINGREQ:
+                        conn.sendall(bytes((mqtt_publisher.PINGRESP, 0)))
+                    self.changed.notify_all()
+        except OSError:
+            return
+
+    def wait_for(self, predicate, timeout=5.0):
+        with self.changed:
+            assert self.changed.wait_for(predicate, timeout)
+
+    def drop_clients(self):
+        for conn in self.clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def close(self):
+        self.server.close()
+        self.drop_clients()
+
+
+def _snapshot(cpu, rpm):
+    return {"sampled_at": time.time(), "sensors": [{"name": "cpu", "value": cpu}], "fan": {"fan1": rpm}}
+
+
+def test_publishes_changes_beyond_deadband_and_reconnects():
+    broker = StandInBroker()
+    publisher = mqtt_publisher.MqttPublisher("127.0.0.1", broker.port, prefix="truefan/test", batch=True)
+    publisher.start()
+    try:
+        publisher.offer(_snapshot(50.0, 900))
+        broker.wait_for(lambda: len(broker.messages) >= 4)
+        assert broker.messages[0] == ("truefan/test/status", "online", True)
+        assert ("truefan/test/cpu", "50", True) in broker.messages
+        assert ("truefan/test/fan/fan1", "900", True) in broker.messages
+        state = json.loads(broker.messages[3][1])
+        assert state["values"] == {"cpu": 50.0, "fan/fan1": 900}
+
+        # Within the deadband: nothing is sent. Beyond it: only that series.
+        del broker.messages[:]
+        publisher.offer(_snapshot(50.2, 920))
+        publisher.offer(_snapshot(51.0, 930))
+        broker.wait_for(lambda: len(broker.messages) >= 2)
+        time.sleep(0.1)
+        assert [m[:2] for m in broker.messages if m[0] != "truefan/test/state"] == [("truefan/test/cpu", "51")]
+
+        # After the broker drops the session everything is republished.
+        broker.drop_clients()
+        publisher.offer(_snapshot(51.0, 930))
+        for _ in range(100):
+            if not publisher.report()["connected"]:
+                break
+            time.sleep(0.02)
+        # Queued while disconnected; sent once the 1 s backoff has passed.
+        publisher.offer(_snapshot(51.0, 930))
+        broker.wait_for(lambda: len(broker.connects) == 2 and ("truefan/test/fan/fan1", "930", True) in broker.messages)
+        assert publisher.stats["failures"] >= 1
+    finally:
+        publisher.stop()
+        broker.close()
+
+
+def test_offer_never_blocks_and_drops_oldest_when_broker_is_away():
+    publisher = mqtt_publisher.MqttPublisher("127.0.0.1", 9, queue_size=3)
+    started = time.monotonic()
+    for i in range(10):
+        publisher.offer(_snapshot(40.0 + i, 900))
+    assert time.monotonic() - started < 0.1
+
+    report = publisher.report()
+    assert (report["queued"], report["dropped"], report["connected"]) == (3, 7, False)
+    assert [values["cpu"] for _, values in publisher._queue] == [47.0, 48.0, 49.0]
+
+    publisher.run_once(0.1)
+    assert publisher.report()["failures"] == 1
+    assert publisher._retry_at > time.monotonic()
+
+
+def test_connect_packet_and_topics():
+    packet = mqtt_publisher.connect_packet("c", 30, will=("t/status", "offline"), username="u", password="p")
+    assert packet[0] == mqtt_publisher.CONNECT
+    assert packet[2:10] == b"\x00\x04MQTT\x04\xe6"
+    assert mqtt_publisher._remaining_length(321) == b"\xc1\x02"
+    assert mqtt_publisher.topic_for("p", "coretemp/Package id 0") == "p/coretemp/Package_id_0"
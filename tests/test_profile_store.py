@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import fan  # noqa: E402
+import profile_store  # noqa: E402
+
+
+def test_profile_store_persists_atomically_and_notifies(tmp_path):
+    path = tmp_path / "fan_profile.conf"
+    store = profile_store.ProfileStore(str(path))
+    seen = []
+    store.subscribe(seen.append)
+
+    assert store.get() == "cool"
+    store.set("quiet")
+
+    assert path.read_text(encoding="utf-8") == "profile=quiet\n"
+    assert store.get() == "quiet"
+    assert seen == ["quiet"]
+    assert [p.name for p in tmp_path.iterdir()] == ["fan_profile.conf"]
+
+
+def test_profile_store_reloads_only_on_external_change(tmp_path, monkeypatch):
+    path = tmp_path / "fan_profile.conf"
+    path.write_text("profile=aggressive\n", encoding="utf-8")
+    store = profile_store.ProfileStore(str(path))
+    assert store.get() == "aggressive"
+
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda *a, **kw: opened.append(a[0]) or real_open(*a, **kw))
+    assert store.get() == "aggressive"
+    assert opened == []
+    monkeypatch.undo()
+
+    changed = threading.Event()
+    store.subscribe(lambda _profile: changed.set())
+    store.watch()
+    try:
+        tmp = tmp_path / "edit.tmp"
+        tmp.write_text("profile=quiet\n", encoding="utf-8")
+        os.replace(tmp, path)
+        assert changed.wait(5.0)
+        assert store.get() == "quiet"
+    finally:
+        store.stop()
+
+
+def test_control_loop_follows_profile_set_by_another_process(tmp_path, monkeypatch):
+    store = profile_store.ProfileStore(str(tmp_path / "fan_profile.conf"))
+    monkeypatch.setattr(fan, "PROFILE_STORE", store)
+    monkeypatch.setattr(fan, "read_sensor_values", lambda: {"cpu": 50.0})
+
+    def set_elsewhere():
+        script = f"import profile_store; profile_store.ProfileStore({str(store.path)!r}).set('quiet')"
+        subprocess.run([sys.executable, "-c", script], cwd=str(APP_DIR), check=True)
+
+    # Another process changes the profile while the loop waits out a long interval.
+    timer = threading.Timer(0.3, set_elsewhere)
+    timer.start()
+    started = time.monotonic()
+    try:
+        status = fan.control_loop(interval_seconds=30, iterations=2)
+    finally:
+        timer.join()
+
+    assert status["profile"] == "quiet"
+    assert time.monotonic() - started < 10
+    assert store._watcher is None
@@ -0,0 +1,126 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import threading  # noqa: E402
+import time  # noqa: E402
+
+import backend  # noqa: E402
+import readpool  # noqa: E402
+import sampler  # noqa: E402
+
+
+class SlowRead:
+    def __init__(self, value):
+        self.value = value
+        self.release = threading.Event()
+        self.release.set()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        return self.value
+
+
+def test_slow_source_reports_last_value_as_stale_without_delaying_others():
+    reader = readpool.DeadlineReader(workers=2, deadline=0.05)
+    fast, slow = SlowRead(1), SlowRead(2)
+    assert reader.read_all({"fast": fast, "slow": slow}) == {
+        "fast": readpool.SourceResult(1, False, 0.0),
+        "slow": readpool.SourceResult(2, False, 0.0),
+    }
+
+    slow.release.clear()
+    slow.value = 3
+    started = time.monotonic()
+    results = reader.read_all({"fast": fast, "slow": slow})
+    assert time.monotonic() - started < 1.0
+    assert results["fast"] == readpool.SourceResult(1, False, 0.0)
+    assert (results["slow"].value, results["slow"].stale) == (2, True)
+
+    # Still in flight: not read a second time, still stale.
+    results = reader.read_all({"fast": fast, "slow": slow})
+    assert slow.calls == 2
+    assert results["slow"].stale
+
+    # Finishing during a later tick's wait, the carried-over read is aged from its submission.
+    threading.Timer(0.02, slow.release.set).start()
+    results = reader.read_all({"slow": slow})
+    assert slow.calls == 2
+    assert (results["slow"].value, results["slow"].stale) == (3, False)
+    assert results["slow"].age_seconds >= 0.1
+
+    for _ in range(100):
+        if "slow" not in reader.report()["in_flight"]:
+            break
+        time.sleep(0.01)
+    report = reader.report()["sources"]
+    assert report["slow"]["missed_deadlines"] == 2
+    assert report["slow"]["reads"] == 2
+    assert report["slow"]["max_ms"] >= 50
+    assert reader.read_all({"slow": slow})["slow"] == readpool.SourceResult(3, False, 0.0)
+    reader.close()
+
+
+def test_failed_read_keeps_last_value_and_counts_error():
+    reader = readpool.DeadlineReader(workers=0)
+    values = iter([10, None])
+
+    def read():
+        value = next(values)
+        if value is None:
+            raise OSError("device gone")
+        return value
+
+    assert reader.read_all({"a": read})["a"].value == 10
+    result = reader.read_all({"a": read})["a"]
+    assert (result.value, result.stale) == (10, True)
+    assert reader.report()["sources"]["a"]["errors"] == 1
+
+
+class SplitBackend(backend.HardwareBackend):
+    name = "split"
+
+    def __init__(self):
+        self.drive = SlowRead({"drivetemp/temp1": 38.0})
+
+    def temperature_reads(self):
+        return {"hwmon/coretemp": lambda: {"coretemp/Package id 0": 55.0}, "hwmon/drivetemp": self.drive}
+
+    def read_temperatures(self):
+        readings = {}
+        for read in self.temperature_reads().values():
+            readings.update(read())
+        return readings
+
+    def read_fans(self):
+        return []
+
+    def read_smart(self, device):
+        return None
+
+    def set_pwm(self, pwm, channel=None):
+        return False
+
+
+def test_sampler_flags_sources_behind_a_slow_device(tmp_path, monkeypatch):
+    monkeypatch.setattr(sampler, "DeadlineReader", lambda: readpool.DeadlineReader(workers=2, deadline=0.05))
+    split = SplitBackend()
+    s = sampler.Sampler(str(tmp_path / "snapshot"), backend=split)
+    try:
+        s.collect()
+        split.drive.release.clear()
+        snapshot = s.collect()
+    finally:
+        split.drive.release.set()
+        s.stop()
+
+    sources = {item["name"]: item for item in snapshot["sensors"]}
+    assert sources["cpu"] == {"name": "cpu", "value": 55.0}
+    assert sources["hdd"] == {"name": "hdd", "value": 38.0, "stale": True}
+    assert snapshot["sampling"]["reads"]["sources"]["hwmon/drivetemp"]["missed_deadlines"] == 1
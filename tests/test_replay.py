@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import pytest  # noqa: E402
+
+import fan  # noqa: E402
+import history  # noqa: E402
+import replay  # noqa: E402
+
+
+@pytest.fixture(params=["vectorized", "fallback"])
+def numpy_mode(request, monkeypatch):
+    if request.param == "vectorized" and replay.np is None:
+        pytest.skip("numpy not installed")
+    if request.param == "fallback":
+        monkeypatch.setattr(replay, "np", None)
+    return request.param
+
+
+def test_replay_matches_determine_pwm_sample_by_sample(numpy_mode):
+    temps = [30.0 + 0.25 * i for i in range(240)]
+    for name, curve in replay.resolve_curves(["quiet", "cool", "aggressive", "cool-rpm"]).items():
+        pwm = replay.replay_pwm(temps, curve)
+        assert [int(p) for p in pwm] == [fan.determine_pwm(t, name) for t in temps]
+
+
+def test_report_counts_changes_duty_and_time_above(tmp_path, numpy_mode):
+    writer = history.HistoryWriter(root=str(tmp_path), retention_days=3650)
+    start = 1767225600.0
+    # 60 s at 50 C, 30 s at 72 C, 30 s at 85 C, one sample per second.
+    for i, temp in enumerate([50.0] * 60 + [72.0] * 30 + [85.0] * 30):
+        writer.append(start + i, {"cpu": temp})
+    writer.close()
+
+    timestamps, temps = replay.load_history_trace("cpu", start, start + 200, root=str(tmp_path))
+    report = replay.evaluate_profiles(timestamps, temps, replay.resolve_curves(["cool", "quiet"]))
+
+    assert report["samples"] == 120
+    assert report["seconds"] == 120.0
+    assert report["seconds_above"] == {"70.0": 60.0, "80.0": 30.0}
+    cool = report["profiles"]["cool"]
+    assert cool["pwm_changes"] == 1
+    assert cool["seconds_at_pwm"] == {100: 60.0, 255: 60.0}
+    assert cool["mean_duty_percent"] == round(100.0 * (100 * 60 + 255 * 60) / (255 * 120), 2)
+    assert report["profiles"]["quiet"]["pwm_changes"] == 2
@@ -0,0 +1,156 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import os  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+
+import backend  # noqa: E402
+import cadence as cadence_mod  # noqa: E402
+import sampler  # noqa: E402
+
+
+def test_snapshot_roundtrip_through_shared_segment(tmp_path):
+    path = str(tmp_path / "snapshot")
+    writer = sampler.SnapshotWriter(path, size=4096)
+    reader = sampler.SnapshotReader(path)
+
+    assert reader.read() is None
+
+    version = writer.write({"sampled_at": 1.0, "sensors": [{"name": "cpu", "value": 41.0}]})
+    first = reader.read()
+    assert first["version"] == version
+    assert first["sensors"] == [{"name": "cpu", "value": 41.0}]
+    assert reader.read() is first
+
+    writer.write({"sampled_at": 2.0, "sensors": []})
+    second = reader.read()
+    assert second["version"] == version + 1
+    assert second["sensors"] == []
+
+
+def test_reader_skips_snapshot_while_writer_is_mid_update(tmp_path):
+    path = str(tmp_path / "snapshot")
+    writer = sampler.SnapshotWriter(path, size=4096)
+    writer.write({"sampled_at": 1.0})
+    sampler._SEQ.pack_into(writer._mm, 0, writer._seq + 1)
+
+    assert sampler.SnapshotReader(path).read() is None
+
+
+def test_read_snapshot_ignores_stale_segment(tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot")
+    monkeypatch.setenv(sampler.SNAPSHOT_PATH_ENV_VAR, path)
+    monkeypatch.setattr(sampler, "_READER", None)
+    sampler.SnapshotWriter(path, size=4096).write({"sampled_at": 0.0})
+
+    assert sampler.read_snapshot() is None
+
+
+def test_cadence_relaxes_when_flat_and_tightens_on_bursts():
+    cadence = cadence_mod.AdaptiveCadence(0.5, 5.0)
+    now = 0.0
+    for _ in range(20):
+        cadence.update({"cpu": 45.0}, now, {"cpu": [55.0, 70.0]})
+        now += cadence.interval
+    assert cadence.interval == 5.0
+
+    # A 9 C rise over one interval must drop straight to the fast bound.
+    assert cadence.update({"cpu": 54.0}, now, {"cpu": [55.0, 70.0]}) == 0.5
+    report = cadence.report()
+    assert report["rate_hz"] == 2.0
+    assert report["next_breakpoint"] == 55.0
+
+
+def test_cadence_backs_off_breakpoint_distance_before_rate():
+    cadence = cadence_mod.AdaptiveCadence(0.5, 60.0)
+    cadence.interval = 60.0
+    cadence.update({"cpu": 50.0}, 0.0, {"cpu": [55.0]})
+
+    # 0.1 C/s alone would allow 5 s, but the 55 C step is 40 s away at that rate.
+    assert cadence.update({"cpu": 51.0}, 10.0, {"cpu": [55.0]}) == 5.0
+    cadence.update({"cpu": 51.0}, 15.0, {"cpu": [55.0]})
+    assert cadence.interval == 7.5
+
+
+def test_interval_bounds_fall_back_when_inverted(monkeypatch):
+    monkeypatch.setenv("TEST_MIN", "10")
+    monkeypatch.setenv("TEST_MAX", "2")
+    assert cadence_mod.interval_bounds_from_env("TEST_MIN", 0.5, "TEST_MAX", 5.0) == (0.5, 5.0)
+    monkeypatch.setenv("TEST_MAX", "20")
+    assert cadence_mod.interval_bounds_from_env("TEST_MIN", 0.5, "TEST_MAX", 5.0) == (10.0, 20.0)
+
+
+class JitterBackend(backend.HardwareBackend):
+    """Two cores swapping 2 C back and forth each read; the package and the core mean stay flat."""
+
+    name = "jitter"
+
+    def __init__(self):
+        self.reads = 0
+
+    def read_temperatures(self):
+        self.reads += 1
+        high, low = (46.0, 44.0) if self.reads % 2 else (44.0, 46.0)
+        return {"coretemp/Package id 0": 45.0, "coretemp/Core 0": high, "coretemp/Core 1": low}
+
+    def read_fans(self):
+        return []
+
+    def read_smart(self, device):
+        return None
+
+    def set_pwm(self, pwm, channel=None):
+        return False
+
+
+def test_per_core_jitter_does_not_pin_the_fast_interval(tmp_path, monkeypatch):
+    monkeypatch.setattr(sampler, "get_agent_health", lambda force=False: {"online": False})
+    s = sampler.Sampler(str(tmp_path / "snapshot"), backend=JitterBackend())
+    try:
+        for _ in range(6):
+            s.collect()
+    finally:
+        s.stop()
+
+    assert s.hwmon_cadence.dtdt == 0.0
+    assert s.hwmon_cadence.interval > s.hwmon_cadence.min_interval
+
+
+def test_fork_waits_for_the_sampler_tick_and_child_drops_master_state(monkeypatch):
+    class Stub:
+        def __init__(self):
+            self._tick = threading.RLock()
+
+    stub = Stub()
+    monkeypatch.setattr(sampler, "_SAMPLER", stub)
+    backend.shared_backend()
+    in_tick, forked = threading.Event(), []
+
+    def tick():
+        with stub._tick:
+            in_tick.set()
+            time.sleep(0.2)
+            # The fork must not have happened while the tick holds the lock.
+            forked.append(bool(forked))
+
+    thread = threading.Thread(target=tick)
+    thread.start()
+    in_tick.wait(5)
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0 if sampler._SAMPLER is None and not backend._SHARED and not sampler.PROFILE_STORE._watcher else 1)
+    forked.append(True)
+    thread.join()
+    _, status = os.waitpid(pid, 0)
+
+    assert forked == [False, True]
+    assert os.WEXITSTATUS(status) == 0
+    # The parent's tick lock is released again.
+    assert stub._tick.acquire(blocking=False)
+    stub._tick.release()
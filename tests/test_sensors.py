@@ -6,7 +6,11 @@ APP_DIR = ROOT / "app"
 if str(APP_DIR) not in sys.path:
     sys.path.insert(0, str(APP_DIR))
 
+import json  # noqa: E402
+import subprocess  # noqa: E402
+
 import hwmon  # noqa: E402
+import sensors  # noqa: E402
 import server  # noqa: E402
 import temperature_sources  # noqa: E402
 
@@ -23,15 +27,88 @@ def test_hwmon_discovery_returns_dict(tmp_path):
     assert mapping["coretemp"] == str(hw0)
 
 
+def test_temperature_map_enumerates_every_device(tmp_path):
+    hw_root = tmp_path / "hwmon"
+    layout = {
+        "hwmon0": ("coretemp", {1: ("Package id 0", 61000), 2: ("Core 0", 55000), 3: ("Core 1", 59000)}),
+        "hwmon1": ("nvme", {1: ("Composite", 40000)}),
+        "hwmon2": ("nvme", {1: ("Composite", 44000), 2: (None, 47000)}),
+    }
+    for dirname, (name, temps) in layout.items():
+        hw = hw_root / dirname
+        hw.mkdir(parents=True)
+        (hw / "name").write_text(f"{name}\n", encoding="utf-8")
+        for index, (label, value) in temps.items():
+            (hw / f"temp{index}_input").write_text(f"{value}\n", encoding="utf-8")
+            if label:
+                (hw / f"temp{index}_label").write_text(f"{label}\n", encoding="utf-8")
+
+    readings = hwmon.read_temperature_map(root=str(hw_root))
+
+    assert list(readings) == [
+        "coretemp/Package id 0",
+        "coretemp/Core 0",
+        "coretemp/Core 1",
+        "nvme/Composite",
+        "nvme_2/Composite",
+        "nvme_2/temp2",
+    ]
+    groups = hwmon.aggregate_temperatures(readings)
+    assert groups["cpu_cores"] == {"count": 2, "max": 59.0, "mean": 57.0}
+    assert groups["nvme"]["max"] == 47.0
+
+    sources = temperature_sources.get_temperature_sources(readings=readings)
+    assert sources == [{"name": "cpu", "value": 61.0}, {"name": "nvme", "value": 40.0}]
+
+
+def test_fan_channels_pair_tachometers_with_pwm_outputs(tmp_path):
+    hw_root = tmp_path / "hwmon"
+    nct = hw_root / "hwmon1"
+    gpu = hw_root / "hwmon2"
+    for path, name in ((nct, "nct6798"), (gpu, "amdgpu")):
+        path.mkdir(parents=True)
+        (path / "name").write_text(f"{name}\n", encoding="utf-8")
+    for filename, value in {
+        "fan1_input": "820",
+        "fan1_label": "CPU_FAN",
+        "pwm1": "96",
+        "pwm1_enable": "1",
+        "fan2_input": "0",
+        "pwm3": "255",
+    }.items():
+        (nct / filename).write_text(f"{value}\n", encoding="utf-8")
+    (gpu / "fan1_input").write_text("1500\n", encoding="utf-8")
+    (gpu / "pwm1").write_text("80\n", encoding="utf-8")
+
+    channels = hwmon.read_fan_channels(root=str(hw_root))
+
+    assert [ch["key"] for ch in channels] == ["nct6798/fan1", "nct6798/fan2", "nct6798/fan3", "amdgpu/fan1"]
+    assert channels[0] == {
+        "key": "nct6798/fan1",
+        "device": "nct6798",
+        "index": 1,
+        "label": "CPU_FAN",
+        "rpm": 820,
+        "pwm": 96,
+        "pwm_enable": 1,
+    }
+    assert channels[2]["rpm"] is None and channels[2]["pwm"] == 255
+    assert sensors.read_fan_rpms(root=str(hw_root)) == {
+        "nct6798/fan1": 820,
+        "nct6798/fan2": 0,
+        "amdgpu/fan1": 1500,
+    }
+
+
 def test_temperature_sources_returns_list(monkeypatch):
     monkeypatch.setattr(
         temperature_sources,
-        "_read_temp_hwmon",
-        lambda source_name, hwmon_keywords, sensor_keyword=None: {
-            "cpu": 45.0,
-            "nvme": 38.0,
-            "hdd": 40.0,
-        }.get(source_name),
+        "read_temperature_map",
+        lambda: {
+            "coretemp/Package id 0": 45.0,
+            "nvme/Composite": 38.0,
+            "drivetemp/temp1": 40.0,
+        },
     )
     monkeypatch.setattr(temperature_sources, "_read_temp_smartctl", lambda *args, **kwargs: None)
 
@@ -65,3 +142,102 @@ def test_status_endpoint_returns_valid_json(monkeypatch):
     assert isinstance(payload.get("sensors"), list)
     assert payload["sensors"]
     assert all("name" in item and "value" in item for item in payload["sensors"])
+
+
+def test_smart_standby_drive_is_not_woken_and_reports_last_value(monkeypatch):
+    calls = []
+    replies = [
+        {"temperature": {"current": 36}},
+        {"smartctl": {"messages": [{"string": "Device is in STANDBY mode, exit(2)"}]}},
+    ]
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(replies.pop(0)), stderr="")
+
+    monkeypatch.setattr(sensors.subprocess, "run", fake_run)
+    monkeypatch.setattr(sensors, "_SMART_LAST", {})
+
+    assert sensors.read_smart_state("/dev/sdz")["state"] == "active"
+    info = sensors.read_smart_state("/dev/sdz")
+
+    assert all(cmd[cmd.index("-n") + 1] == "standby" for cmd in calls)
+    assert info["state"] == "standby"
+    assert info["value"] == 36.0
+    assert info["cached"] is True
+    assert info["age_seconds"] >= 0.0
+
+
+def test_status_body_is_encoded_once_per_snapshot_version(monkeypatch):
+    snapshot = {
+        "version": 7,
+        "sensors": [{"name": "cpu", "value": 50.0}],
+        "fans": [],
+        "capabilities": {"smart_available": True},
+        "agent": {"online": False},
+    }
+    builds = []
+    monkeypatch.setattr(server, "_RESPONSE_CACHE", {})
+    monkeypatch.setattr(server, "read_snapshot", lambda: snapshot)
+    monkeypatch.setattr(server, "get_profile", lambda: "cool")
+    monkeypatch.setattr(server, "get_sensors_data", lambda: builds.append(1) or snapshot["sensors"])
+
+    client = server.app.test_client()
+    first = client.get("/status").data
+    second = client.get("/status").data
+    snapshot = dict(snapshot, version=8)
+    client.get("/status")
+
+    assert first == second
+    assert len(builds) == 2
+    assert json.loads(first)["sensors"] == [{"name": "cpu", "value": 50.0}]
+
+
+def test_fingerprinted_assets_are_served_precompressed_and_immutable():
+    client = server.app.test_client()
+    page = client.get("/").get_data(as_text=True)
+    css_url = server.asset_url("style.css")
+
+    assert css_url != "/static/style.css" and css_url in page
+
+    res = client.get(css_url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in res.headers["Cache-Control"]
+
+    etag = res.headers["ETag"]
+    assert client.get(css_url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/static/style.css").status_code == 200
+
+
+def test_missing_smart_source_backs_off_until_topology_changes(monkeypatch):
+    now = [100.0]
+    generation = [1]
+    backoff = temperature_sources.SourceBackoff(
+        initial=30.0, maximum=120.0, clock=lambda: now[0], generation=lambda: generation[0]
+    )
+    monkeypatch.setattr(temperature_sources, "SMART_BACKOFF", backoff)
+    probes = []
+
+    def absent(device):
+        probes.append(device)
+        return None
+
+    readings = {"coretemp/Core 0": 50.0}
+    for _ in range(100):
+        sources = temperature_sources.get_temperature_sources(include_hdd=True, readings=readings, smart_reader=absent)
+    assert sources == [{"name": "cpu", "value": 50.0}]
+    assert probes == ["/dev/nvme0", "/dev/sda"]
+
+    now[0] += 30.0
+    temperature_sources.get_temperature_sources(readings=readings, smart_reader=absent)
+    assert probes[-1] == "/dev/nvme0" and len(probes) == 3
+    capabilities = temperature_sources.get_source_capabilities()
+    assert capabilities["smart_backoff"]["/dev/nvme0"]["failures"] == 2
+    assert capabilities["smart_backoff"]["/dev/nvme0"]["retry_in_seconds"] == 60.0
+    assert capabilities["sources"]["cpu"] == {"hwmon": "coretemp/Core 0"}
+
+    # A new hwmon topology (e.g. drivetemp loaded) re-probes at once.
+    generation[0] += 1
+    temperature_sources.get_temperature_sources(include_hdd=True, readings=readings, smart_reader=absent)
+    assert len(probes) == 5
@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import backend  # noqa: E402
+import control_client  # noqa: E402
+import fan  # noqa: E402
+import sampler  # noqa: E402
+import simulator  # noqa: E402
+
+
+def test_plant_settles_at_analytic_steady_state():
+    plant = simulator.ThermalPlant(cpu_load=lambda t: 95.0)
+    sim = simulator.SimulatedBackend(plant)
+    sim.set_pwm(255)
+    sim.advance(4 * 3600)
+
+    cpu = plant.nodes[0]
+    assert abs(cpu.temp - (simulator.AMBIENT_C + 95.0 / cpu.conductance(255))) < 0.01
+    assert [fan["rpm"] for fan in sim.read_fans()] == [2000, 1400]
+
+    sim.set_pwm(20, channel="fan1")
+    assert sim.read_fans()[0]["rpm"] == 0
+    assert not sim.set_pwm(100, channel="fan9")
+
+
+def test_closed_loop_ranks_profiles_and_reports_speedup():
+    # Each run reads the clock twice; the fake one says it took 10 wall seconds.
+    ticks = iter([0.0, 10.0, 0.0, 10.0])
+    quiet = simulator.run_closed_loop("quiet", duration=7200, clock=lambda: next(ticks))
+    aggressive = simulator.run_closed_loop("aggressive", duration=7200, clock=lambda: next(ticks))
+
+    assert aggressive["max_cpu"] < quiet["max_cpu"]
+    assert aggressive["mean_duty_percent"] > quiet["mean_duty_percent"]
+    assert quiet["pwm_changes"] > 0
+    assert (quiet["wall_seconds"], quiet["speedup"], quiet["loop_rate_hz"]) == (10.0, 720.0, 144.0)
+
+
+def test_sampler_runs_against_simulated_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv(backend.BACKEND_ENV_VAR, "sim")
+    monkeypatch.setattr(backend, "_SHARED", {})
+    # No control agent is involved; the sampler must not contact one over HTTP.
+    monkeypatch.setattr(sampler, "get_agent_health", lambda force=False: {"online": True})
+    monkeypatch.setattr(control_client, "_request", lambda *args, **kw: (_ for _ in ()).throw(AssertionError(args)))
+    sim_sampler = sampler.Sampler(str(tmp_path / "snapshot"))
+    assert sim_sampler.backend.name == "sim"
+
+    sim_sampler.backend.advance(600)
+    snapshot = sim_sampler.collect()
+
+    assert {item["name"] for item in snapshot["sensors"]} == {"cpu", "nvme", "hdd"}
+    assert snapshot["fan"] == {"fan1": 0, "fan2": 0}
+    assert sim_sampler.drive_all_fans_full()
+    assert sim_sampler.backend.plant.pwm == {"fan1": 255, "fan2": 255}
+    assert sim_sampler.backend.release_failsafe()
+    assert sim_sampler.backend.plant.pwm == {"fan1": 0, "fan2": 0}
+
+
+def test_control_path_writes_through_simulated_backend(monkeypatch):
+    monkeypatch.setenv(backend.BACKEND_ENV_VAR, "sim")
+    monkeypatch.setattr(backend, "_SHARED", {})
+    monkeypatch.setattr(control_client, "_request", lambda *args, **kw: (_ for _ in ()).throw(AssertionError(args)))
+    monkeypatch.setattr(fan, "read_sensor_values", lambda: {"cpu": 72.0})
+    monkeypatch.setattr(fan, "load_profile", lambda: "cool")
+    sim = backend.shared_backend()
+
+    assert fan.control_loop(iterations=1, apply=True)["applied"] is True
+    assert sim.plant.pwm == {"fan1": 255, "fan2": 255}
+
+    # A held failsafe refuses control writes until it is released.
+    assert sim.engage_failsafe()
+    monkeypatch.setattr(fan, "read_sensor_values", lambda: {"cpu": 40.0})
+    assert fan.control_loop(iterations=1, apply=True)["applied"] is False
+    assert sim.plant.pwm == {"fan1": 255, "fan2": 255}
+    assert sim.release_failsafe()
+    assert fan.control_loop(iterations=1, apply=True)["applied"] is True
+    assert sim.plant.pwm == {"fan1": 100, "fan2": 100}
@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import os  # noqa: E402
+import time  # noqa: E402
+
+import sensors  # noqa: E402
+import smartd  # noqa: E402
+
+ATTRLOG = "attrlog.WDC_WD40EFRX_68N32N0-WD_WCC7K0ABCDEF.ata.csv"
+BY_ID = "ata-WDC_WD40EFRX-68N32N0_WD-WCC7K0ABCDEF"
+
+
+def _record(when, temp):
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(when))
+    # 194's raw value packs min/max above the low byte.
+    return f"{stamp};\t1;200;0;\t5;200;0;\t194;{120 - temp};{(22 << 16) | (41 << 32) | temp};\t199;200;0;\n"
+
+
+def _layout(tmp_path):
+    logs = tmp_path / "smartmontools"
+    logs.mkdir()
+    by_id = tmp_path / "by-id"
+    by_id.mkdir()
+    (tmp_path / "sda").write_text("")
+    os.symlink(tmp_path / "sda", by_id / BY_ID)
+    os.symlink(tmp_path / "sda", by_id / f"{BY_ID}-part1")
+    return logs / ATTRLOG, by_id
+
+
+def test_parses_ata_and_scsi_records():
+    now = time.time()
+    assert smartd.parse_attrlog_line(_record(now, 36), "ata") == (36.0, float(int(now)))
+    scsi = "2026-01-01 00:00:00;\tread-total-errors-corrected;0;\ttemperature;38;"
+    assert smartd.parse_attrlog_line(scsi, "scsi")[0] == 38.0
+    assert smartd.parse_attrlog_line("2026-01-01 00:00:00;\t1;200;0;", "ata") is None
+    assert smartd.parse_attrlog_line("garbage", "ata") is None
+
+
+def test_tail_reads_only_appended_bytes_and_follows_rotation(tmp_path, monkeypatch):
+    path, by_id = _layout(tmp_path)
+    now = time.time()
+    with open(path, "w") as f:
+        for i in range(500):
+            f.write(_record(now - 3600 + i, 30 + i % 5))
+    monkeypatch.setattr(smartd, "TAIL_BYTES", 1024)
+    logs = smartd.SmartdAttrlogs(str(path.parent), str(by_id), max_age=7200)
+
+    assert logs.temperature("/dev/sda") == (34.0, float(int(now - 3600 + 499)))
+    tail = logs._tails["sda"]
+    assert tail._offset == path.stat().st_size
+
+    # A partial record is held back until its newline arrives.
+    line = _record(now, 45)
+    with open(path, "a") as f:
+        f.write(line[:20])
+    assert logs.temperature("/dev/sda")[0] == 34.0
+    with open(path, "a") as f:
+        f.write(line[20:])
+    assert logs.temperature("/dev/sda")[0] == 45.0
+
+    path.unlink()
+    path.write_text(_record(now, 39))
+    assert logs.temperature("/dev/sda")[0] == 39.0
+    assert logs.temperature("/dev/sdb") is None
+
+
+def test_smartd_reading_is_preferred_over_smartctl(tmp_path, monkeypatch):
+    path, by_id = _layout(tmp_path)
+    path.write_text(_record(time.time() - 120, 37))
+    monkeypatch.setattr(sensors, "SMARTD", smartd.SmartdAttrlogs(str(path.parent), str(by_id)))
+    monkeypatch.setattr(sensors, "_SMART_LAST", {})
+    monkeypatch.setattr(sensors, "_run_smartctl", lambda device: (_ for _ in ()).throw(AssertionError(device)))
+
+    info = sensors.read_smart_state("/dev/sda")
+
+    assert (info["state"], info["value"]) == ("active", 37.0)
+    assert 119 <= info["age_seconds"] <= 125
+    assert info["cached"] is True
+
+    # A record from smartd's default 30-minute cadence is too old for the control path; smartctl fills in.
+    path.write_text(_record(time.time() - 1200, 37))
+    monkeypatch.setattr(sensors, "_run_smartctl", lambda device: ("active", 41.0))
+    assert sensors.read_smart_state("/dev/sda")["value"] == 41.0
@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import json  # noqa: E402
+
+import pytest  # noqa: E402
+
+import backend  # noqa: E402
+import sampler  # noqa: E402
+import virtual_sensors  # noqa: E402
+
+
+def test_expression_arithmetic_and_missing_inputs():
+    evaluate = virtual_sensors.compile_expression("(cpu + sensor('drivetemp/temp1')) / 2 - 1")
+    assert evaluate({"cpu": 50.0, "drivetemp/temp1": 40.0}, 0.0) == 44.0
+    assert evaluate({"cpu": 50.0}, 0.0) is None
+    assert virtual_sensors.compile_expression("cpu / (hdd - hdd)")({"cpu": 1.0, "hdd": 2.0}, 0.0) is None
+
+
+def test_aggregates_over_globs():
+    evaluate = virtual_sensors.compile_expression("max(match('drivetemp*/temp1'), nvme)")
+    values = {"drivetemp/temp1": 38.0, "drivetemp-1/temp1": 44.0, "nvme": 41.0, "coretemp/temp1": 90.0}
+    assert evaluate(values, 0.0) == 44.0
+    assert virtual_sensors.compile_expression("mean(match('drivetemp*'))")(values, 0.0) == 41.0
+    assert virtual_sensors.compile_expression("max(match('none*'))")(values, 0.0) is None
+
+
+def test_windows_evict_old_samples():
+    avg = virtual_sensors.compile_expression("avg(cpu, 10)")
+    peak = virtual_sensors.compile_expression("max_over(cpu, 10)")
+    rise = virtual_sensors.compile_expression("delta(cpu, 10)")
+    for now, cpu in ((0.0, 60.0), (5.0, 40.0), (9.0, 50.0)):
+        results = [evaluate({"cpu": cpu}, now) for evaluate in (avg, peak, rise)]
+    assert results == [50.0, 60.0, -10.0]
+    # At t=12 the t=0 sample has left the window.
+    assert [evaluate({"cpu": 45.0}, 12.0) for evaluate in (avg, peak, rise)] == [45.0, 50.0, 5.0]
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["__import__('os')", "cpu.real", "cpu ** 2", "open('x')", "lambda: 1", "max_over(cpu, window)", "'a'"],
+)
+def test_rejects_unsupported_syntax(text):
+    with pytest.raises(ValueError):
+        virtual_sensors.compile_expression(text)
+
+
+def test_load_skips_bad_definitions(tmp_path):
+    path = tmp_path / "virtual.json"
+    path.write_text(
+        json.dumps(
+            {
+                "sensors": {
+                    "hdd_max": {"expr": "max(match('drivetemp*'))", "alert": {"high": 50, "clear": 45}},
+                    "cpu": "nvme",
+                    "broken": "cpu +",
+                },
+                "curve_sensor": "hdd_max",
+            }
+        )
+    )
+    loaded = virtual_sensors.load_virtual_sensors(str(path))
+    assert [sensor.name for sensor in loaded.sensors] == ["hdd_max"]
+    assert loaded.curve_sensor == "hdd_max"
+    assert [rule.name for rule in loaded.alert_rules()] == ["hdd_max_alert"]
+    assert virtual_sensors.load_virtual_sensors(str(tmp_path / "missing.json")).sensors == []
+
+
+class DriveBackend(backend.HardwareBackend):
+    name = "drives"
+
+    def read_temperatures(self):
+        return {"coretemp/Package id 0": 45.0, "drivetemp/temp1": 52.0, "drivetemp-1/temp1": 39.0}
+
+    def read_fans(self):
+        return []
+
+    def read_smart(self, device):
+        return None
+
+    def set_pwm(self, pwm, channel=None):
+        return False
+
+
+def test_sampler_publishes_and_alerts_on_virtual_sensors(tmp_path, monkeypatch):
+    path = tmp_path / "virtual.json"
+    path.write_text(json.dumps({"sensors": {"hdd_max": {"expr": "max(match('drivetemp*'))", "alert": {"high": 50}}}}))
+    monkeypatch.setenv(virtual_sensors.VIRTUAL_SENSORS_ENV_VAR, str(path))
+    s = sampler.Sampler(str(tmp_path / "snapshot"), backend=DriveBackend())
+    try:
+        snapshot = s.collect()
+    finally:
+        s.stop()
+
+    sources = {item["name"]: item for item in snapshot["sensors"]}
+    assert sources["hdd_max"] == {"name": "hdd_max", "value": 52.0, "virtual": True}
+    assert "hdd_max_alert" in [alert["rule"] for alert in snapshot["events"]["active"]]
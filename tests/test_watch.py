@@ -0,0 +1,83 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "app"
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
+
+import io  # noqa: E402
+import json  # noqa: E402
+
+import backend  # noqa: E402
+import hwmon  # noqa: E402
+import temperature_sources  # noqa: E402
+import watch  # noqa: E402
+
+
+def _hwmon_tree(tmp_path):
+    root = tmp_path / "hwmon"
+    hw = root / "hwmon0"
+    hw.mkdir(parents=True)
+    (hw / "name").write_text("coretemp\n", encoding="utf-8")
+    (hw / "temp1_input").write_text("52000\n", encoding="utf-8")
+    (hw / "temp1_label").write_text("Package id 0\n", encoding="utf-8")
+    (hw / "fan1_input").write_text("900\n", encoding="utf-8")
+    (hw / "pwm1").write_text("120\n", encoding="utf-8")
+    return root, hw
+
+
+def test_sensor_files_reread_open_handles_and_reopen_on_topology_change(tmp_path):
+    root, hw = _hwmon_tree(tmp_path)
+    hwmon.invalidate_topology(str(root))
+    files = hwmon.SensorFiles(str(root))
+
+    assert hwmon.read_temperature_map(str(root), files) == {"coretemp/Package id 0": 52.0}
+    (hw / "temp1_input").write_text("61000\n", encoding="utf-8")
+    assert hwmon.read_temperature_map(str(root), files) == {"coretemp/Package id 0": 61.0}
+    assert len(files._fds) == 1
+
+    (hw / "temp2_input").write_text("40000\n", encoding="utf-8")
+    hwmon.get_topology(str(root), refresh=True)
+    assert len(hwmon.read_temperature_map(str(root), files)) == 2
+    assert len(files._fds) == 2
+    files.close()
+
+
+def test_watch_prints_one_line_per_sample(tmp_path):
+    root, hw = _hwmon_tree(tmp_path)
+    hwmon.invalidate_topology(str(root))
+    watcher = watch.Watcher(backend.SysfsBackend(str(root), keep_open=True), smart_interval=0)
+    sleeps = []
+
+    out = io.StringIO()
+    assert watch.watch(0.5, "jsonl", count=3, out=out, watcher=watcher, sleep=sleeps.append) == 3
+    samples = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(samples) == 3
+    assert samples[0]["cpu"] == 52.0
+    assert samples[0]["fans"] == {"coretemp/fan1": {"rpm": 900, "pwm": 120}}
+    # The stub does not advance the clock, so each wait runs to the next slot.
+    assert len(sleeps) == 2 and 0 < sleeps[0] <= 0.5 < sleeps[1] <= 1.0
+
+    out = io.StringIO()
+    watch.watch(0.5, "table", count=2, out=out, watcher=watcher, sleep=lambda _s: None)
+    header, *rows = out.getvalue().splitlines()
+    assert header.split()[:5] == ["time", "cpu", "nvme", "hdd", "pwm"]
+    assert len(rows) == 2
+    assert "900 rpm/120" in rows[0]
+
+
+def test_ticks_without_smart_do_not_feed_the_backoff(tmp_path, monkeypatch, caplog):
+    root, _hw = _hwmon_tree(tmp_path)
+    hwmon.invalidate_topology(str(root))
+    monkeypatch.setattr(temperature_sources, "SMART_BACKOFF", temperature_sources.SourceBackoff())
+    sysfs = backend.SysfsBackend(str(root), keep_open=True)
+    monkeypatch.setattr(sysfs, "read_smart", lambda device: (_ for _ in ()).throw(AssertionError(device)))
+    watcher = watch.Watcher(sysfs, smart_interval=0)
+
+    for _ in range(3):
+        sample = watcher.sample()
+
+    assert (sample["nvme"], sample["hdd"]) == (None, None)
+    assert temperature_sources.SMART_BACKOFF.report() == {}
+    assert "Skipping" not in caplog.text
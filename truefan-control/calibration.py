@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from hwmon import HWMON_ROOT
+from pwm import _is_safe_pwm_path, _normalize, discover_pwm_files
+
+LOGGER = logging.getLogger(__name__)
+
+# Next to the agent's code by default, so the tables do not depend on the working directory.
+CALIBRATION_FILE = os.getenv(
+    "TRUEFAN_CALIBRATION_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibration.json")
+)
+DEFAULT_STEP = 16
+SETTLE_POLL_SECONDS = 1.0
+SETTLE_TIMEOUT_SECONDS = 12.0
+# Consecutive readings within this fraction (or 30 RPM) count as settled.
+SETTLE_TOLERANCE = 0.03
+
+_JOB_LOCK = threading.Lock()
+_JOB: Dict[str, object] = {"running": False, "channel": None, "error": ""}
+_THREAD: Optional[threading.Thread] = None
+# Set to stop a running sweep; the default sleep wakes on it at once.
+_ABORT = threading.Event()
+
+
+class CalibrationAborted(Exception):
+    """The sweep was stopped by abort_calibration()."""
+
+
+def fan_input_for(pwm_path: str) -> Optional[str]:
+    base = os.path.basename(pwm_path)
+    fan_input = os.path.join(os.path.dirname(pwm_path), f"fan{base[len('pwm'):]}_input")
+    return fan_input if os.path.isfile(fan_input) else None
+
+
+def _read_int(path: str) -> int:
+    with open(path, "r", encoding="utf-8") as f:
+        return int(f.read().strip())
+
+
+def _write_int(path: str, value: int) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(value))
+
+
+def _settled_rpm(fan_input: str, sleep: Callable[[float], object]) -> int:
+    previous = None
+    waited = 0.0
+    while True:
+        sleep(SETTLE_POLL_SECONDS)
+        if _ABORT.is_set():
+            raise CalibrationAborted(fan_input)
+        waited += SETTLE_POLL_SECONDS
+        rpm = _read_int(fan_input)
+        if previous is not None and abs(rpm - previous) <= max(30, previous * SETTLE_TOLERANCE):
+            return rpm
+        if waited >= SETTLE_TIMEOUT_SECONDS:
+            LOGGER.warning("RPM on %s did not settle within %.0fs", fan_input, SETTLE_TIMEOUT_SECONDS)
+            return rpm
+        previous = rpm
+
+
+def calibrate_channel(
+    pwm_path: str,
+    step: int = DEFAULT_STEP,
+    root: str = HWMON_ROOT,
+    sleep: Callable[[float], object] = _ABORT.wait,
+) -> Dict[str, object]:
+    """
+    Sweep one PWM channel and record its PWM -> RPM response.
+
+    The channel is stepped down from 255 to 0 to find where the fan stalls,
+    then back up from 0 to find where it starts again. The original duty
+    and pwmN_enable mode are restored afterwards, even on failure or abort.
+    """
+    if not _is_safe_pwm_path(pwm_path, root=root):
+        raise ValueError(f"not a PWM channel under {root}: {pwm_path}")
+    pwm_path = _normalize(pwm_path)
+    fan_input = fan_input_for(pwm_path)
+    if fan_input is None:
+        raise LookupError(f"no fan tachometer paired with {pwm_path}")
+
+    enable_file = f"{pwm_path}_enable"
+    original_pwm = _read_int(pwm_path)
+    original_enable = _read_int(enable_file) if os.path.isfile(enable_file) else None
+    levels = list(range(255, -1, -max(1, step)))
+    if levels[-1] != 0:
+        levels.append(0)
+
+    table: Dict[int, int] = {}
+    stall_pwm = None
+    start_pwm = None
+    try:
+        if original_enable is not None:
+            _write_int(enable_file, 1)
+
+        for pwm in levels:
+            _write_int(pwm_path, pwm)
+            table[pwm] = _settled_rpm(fan_input, sleep)
+            if table[pwm] == 0 and stall_pwm is None:
+                stall_pwm = pwm
+        for pwm in reversed(levels):
+            _write_int(pwm_path, pwm)
+            if _settled_rpm(fan_input, sleep) > 0:
+                start_pwm = pwm
+                break
+    finally:
+        try:
+            _write_int(pwm_path, original_pwm)
+            if original_enable is not None:
+                _write_int(enable_file, original_enable)
+        except OSError:
+            LOGGER.exception("Failed restoring %s after calibration", pwm_path)
+
+    return {
+        "pwm_path": pwm_path,
+        "fan_input": fan_input,
+        "table": [[pwm, table[pwm]] for pwm in sorted(table)],
+        "stall_pwm": stall_pwm,
+        "start_pwm": start_pwm,
+        "max_rpm": max(table.values()),
+        "calibrated_at": time.time(),
+    }
+
+
+def load_calibration(path: str = CALIBRATION_FILE) -> Dict[str, Dict[str, object]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        LOGGER.exception("Failed reading calibration file %s", path)
+        return {}
+
+
+def save_calibration(result: Dict[str, object], path: str = CALIBRATION_FILE) -> None:
+    data = load_calibration(path)
+    data[str(result["pwm_path"])] = result
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=".calibration-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+
+def _run_job(channels: List[str], step: int) -> None:
+    try:
+        for channel in channels:
+            with _JOB_LOCK:
+                _JOB["channel"] = channel
+            try:
+                save_calibration(calibrate_channel(channel, step=step))
+            except LookupError as e:
+                LOGGER.info("Skipping calibration of %s: %s", channel, e)
+    except CalibrationAborted:
+        LOGGER.warning("Calibration aborted")
+        with _JOB_LOCK:
+            _JOB["error"] = "aborted"
+    except Exception as e:
+        LOGGER.exception("Calibration failed")
+        with _JOB_LOCK:
+            _JOB["error"] = str(e)
+    finally:
+        with _JOB_LOCK:
+            _JOB["running"] = False
+            _JOB["channel"] = None
+
+
+def start_calibration(pwm_path: Optional[str] = None, step: int = DEFAULT_STEP) -> bool:
+    """Start a background sweep of one channel (or all); False if one is running."""
+    global _THREAD
+    channels = [pwm_path] if pwm_path else discover_pwm_files()
+    with _JOB_LOCK:
+        if _JOB["running"]:
+            return False
+        _JOB.update(running=True, channel=None, error="")
+        _ABORT.clear()
+        _THREAD = threading.Thread(target=_run_job, args=(channels, step), name="calibration", daemon=True)
+    _THREAD.start()
+    return True
+
+
+def abort_calibration(timeout: float = 0.3) -> bool:
+    """Stop a running sweep and wait for it to restore its channel; True once none is running."""
+    with _JOB_LOCK:
+        thread = _THREAD if _JOB["running"] else None
+    if thread is None:
+        return True
+    _ABORT.set()
+    thread.join(timeout)
+    return not is_calibrating()
+
+
+def is_calibrating() -> bool:
+    with _JOB_LOCK:
+        return bool(_JOB["running"])
+
+
+def calibration_status() -> Dict[str, object]:
+    with _JOB_LOCK:
+        job = dict(_JOB)
+    job["channels"] = load_calibration()
+    return job
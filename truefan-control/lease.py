@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from hwmon import HWMON_ROOT
+from pwm import discover_pwm_files
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = float(os.getenv("TRUEFAN_LEASE_SECONDS", "30"))
+CHECK_INTERVAL_SECONDS = 0.5
+# "auto" hands channels back to the driver's automatic mode; "full" pins them at SAFE_PWM.
+FAILSAFE_ACTION = os.getenv("TRUEFAN_WATCHDOG_ACTION", "auto").strip().lower()
+SAFE_PWM = 255
+# pwmN_enable value for automatic control on most hwmon drivers.
+AUTO_ENABLE = 2
+MANUAL_ENABLE = 1
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_int(path: str, value: int) -> bool:
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(str(value))
+        return True
+    except OSError as e:
+        LOGGER.error("Failsafe write %s=%s failed: %s", path, value, e)
+        return False
+
+
+class Watchdog:
+    """
+    Lease-based failsafe for the PWM channels the agent has taken over.
+
+    Every control update renews a lease measured on a monotonic clock. When
+    it runs out, each channel is handed back to automatic mode (restoring
+    the pwmN_enable value seen before the agent took manual control), or
+    pinned at SAFE_PWM when the action is "full" or the driver rejects
+    automatic mode. Expiry is acted on within CHECK_INTERVAL_SECONDS, after
+    which on_trip is called.
+    """
+
+    def __init__(
+        self,
+        root: str = HWMON_ROOT,
+        action: str = FAILSAFE_ACTION,
+        clock: Callable[[], float] = time.monotonic,
+        suspended: Callable[[], bool] = lambda: False,
+        on_trip: Callable[[], None] = lambda: None,
+    ):
+        self.root = root
+        self.action = action if action in ("auto", "full") else "auto"
+        self.clock = clock
+        self.suspended = suspended
+        self.on_trip = on_trip
+        self._lock = threading.Lock()
+        self._deadline: Optional[float] = None
+        self._lease_seconds = 0.0
+        self._original_enable: Dict[str, int] = {}
+        self._trips = 0
+        self._last_trip: Optional[Dict[str, object]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def remember_modes(self, pwm_files: Optional[List[str]] = None) -> None:
+        """Record each channel's automatic pwmN_enable value before manual writes."""
+        for pwm_file in pwm_files if pwm_files is not None else discover_pwm_files(self.root):
+            value = _read_int(f"{pwm_file}_enable")
+            if value is not None and value != MANUAL_ENABLE:
+                with self._lock:
+                    self._original_enable.setdefault(pwm_file, value)
+
+    def renew(self, lease_seconds: Optional[float] = None) -> float:
+        """Arm or extend the lease; returns the new monotonic deadline."""
+        lease = float(lease_seconds or DEFAULT_LEASE_SECONDS)
+        with self._lock:
+            self._lease_seconds = lease
+            self._deadline = self.clock() + lease
+            return self._deadline
+
+    def heartbeat(self, lease_seconds: Optional[float] = None) -> bool:
+        """Extend an armed lease; a disarmed or tripped watchdog stays disarmed."""
+        with self._lock:
+            armed = self._deadline is not None
+        if armed:
+            self.renew(lease_seconds)
+        return armed
+
+    def _failsafe(self, pwm_files: List[str]) -> Dict[str, str]:
+        results: Dict[str, str] = {}
+        for pwm_file in pwm_files:
+            enable_file = f"{pwm_file}_enable"
+            if self.action == "auto" and os.path.isfile(enable_file):
+                with self._lock:
+                    mode = self._original_enable.get(pwm_file, AUTO_ENABLE)
+                if _write_int(enable_file, mode):
+                    results[pwm_file] = f"enable={mode}"
+                    continue
+            if os.path.isfile(enable_file):
+                _write_int(enable_file, MANUAL_ENABLE)
+            results[pwm_file] = f"pwm={SAFE_PWM}" if _write_int(pwm_file, SAFE_PWM) else "failed"
+        return results
+
+    def check(self) -> bool:
+        """Trip the failsafe if the lease has expired; True when it tripped now."""
+        now = self.clock()
+        with self._lock:
+            if self._deadline is None or now < self._deadline:
+                return False
+            overdue = now - self._deadline
+        if self.suspended():
+            return False
+
+        results = self._failsafe(discover_pwm_files(self.root))
+        with self._lock:
+            self._deadline = None
+            self._trips += 1
+            self._last_trip = {
+                "overdue_seconds": round(overdue, 3),
+                "action": self.action,
+                "channels": results,
+                "at": time.time(),
+            }
+        LOGGER.warning("Control lease expired %.2fs ago; failsafe applied: %s", overdue, results)
+        self.on_trip()
+        return True
+
+    def status(self) -> Dict[str, object]:
+        now = self.clock()
+        with self._lock:
+            armed = self._deadline is not None
+            return {
+                "armed": armed,
+                "lease_seconds": self._lease_seconds,
+                "remaining_seconds": round(max(0.0, self._deadline - now), 3) if armed else None,
+                "action": self.action,
+                "trips": self._trips,
+                "last_trip": self._last_trip,
+            }
+
+    def _run(self) -> None:
+        while not self._stop.wait(CHECK_INTERVAL_SECONDS):
+            try:
+                self.check()
+            except Exception:
+                LOGGER.exception("Watchdog check failed")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="pwm-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(CHECK_INTERVAL_SECONDS * 4)
+            self._thread = None
@@ -1,14 +1,25 @@
 import logging
 import os
-from typing import Dict, List
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 
 from fastapi import Depends, FastAPI
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
+from calibration import DEFAULT_STEP, abort_calibration, calibration_status, is_calibrating, start_calibration
 from hwmon import get_hwmon_map
-from pwm import discover_pwm_files, read_current_pwm, write_pwm_value
+from pwm import (
+    _normalize,
+    discover_pwm_files,
+    read_channel_state,
+    read_current_pwm,
+    restore_channel_state,
+    write_pwm_value,
+)
 from security import require_bearer_token
+from lease import Watchdog
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,11 +30,56 @@ LOGGER = logging.getLogger("truefan-control")
 if not os.getenv("TRUEFAN_AGENT_SECRET", "").strip():
     raise RuntimeError("TRUEFAN_AGENT_SECRET is required at startup")
 
-app = FastAPI(title="truefan-control")
+# Channel states from before the failsafe took over, restored by /release. While the failsafe
+# is held, every other write is refused so a control loop cannot lower the duty under it.
+_SAVED_LOCK = threading.Lock()
+_SAVED_STATES: Dict[str, Dict[str, Optional[int]]] = {}
+_FAILSAFE = {"held": False}
+
+
+def _drop_failsafe() -> None:
+    # The lease ran out, so whoever held the failsafe is gone and the watchdog now owns the channels.
+    with _SAVED_LOCK:
+        _SAVED_STATES.clear()
+        _FAILSAFE["held"] = False
+
+
+WATCHDOG = Watchdog(suspended=is_calibrating, on_trip=_drop_failsafe)
+
+
+def _failsafe_held_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=409,
+        content={"status": "error", "message": "Failsafe engaged; POST /release first", "available_pwms": []},
+    )
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    WATCHDOG.start()
+    yield
+    WATCHDOG.stop()
+
+
+app = FastAPI(title="truefan-control", lifespan=lifespan)
 
 
 class SetPwmBody(BaseModel):
     pwm: int = Field(..., ge=0, le=255)
+    pwm_path: Optional[str] = None
+    all_channels: bool = False
+    # Thermal failsafe: all channels, preempting any calibration sweep, restorable via /release.
+    failsafe: bool = False
+    lease_seconds: Optional[float] = Field(None, ge=1, le=3600)
+
+
+class HeartbeatBody(BaseModel):
+    lease_seconds: Optional[float] = Field(None, ge=1, le=3600)
+
+
+class CalibrateBody(BaseModel):
+    pwm_path: Optional[str] = None
+    step: int = Field(DEFAULT_STEP, ge=1, le=128)
 
 
 def _status_payload() -> Dict[str, object]:
@@ -34,6 +90,8 @@ def _status_payload() -> Dict[str, object]:
         "available_pwms": available_pwms,
         "current_pwm": current_pwm,
         "hwmon_map": hwmon_map,
+        "watchdog": WATCHDOG.status(),
+        "failsafe_held": _FAILSAFE["held"],
     }
 
 
@@ -47,14 +105,41 @@ def status(_: None = Depends(require_bearer_token)):
             "available_pwms": [],
             "current_pwm": 0,
             "hwmon_map": {},
+            "watchdog": WATCHDOG.status(),
         }
 
 
 @app.post("/set_pwm")
 def set_pwm(body: SetPwmBody, _: None = Depends(require_bearer_token)):
+    # A sweep may be holding a fan at PWM 0; the failsafe stops it rather than waiting.
+    if is_calibrating() and not (body.failsafe and abort_calibration()):
+        return JSONResponse(
+            status_code=409,
+            content={"status": "error", "message": "Calibration in progress", "available_pwms": []},
+        )
     try:
         available_pwms: List[str] = discover_pwm_files()
-        target = write_pwm_value(body.pwm, available_pwms)
+        # Discovered paths are resolved, so /sys/class/hwmon/hwmonN/pwmM matches its /sys/devices target.
+        single = body.pwm_path and not (body.all_channels or body.failsafe)
+        if single and _normalize(body.pwm_path) not in available_pwms:
+            return JSONResponse(
+                status_code=404,
+                content={"status": "error", "message": "Unknown PWM channel", "pwm_path": body.pwm_path},
+            )
+        WATCHDOG.remember_modes(available_pwms)
+        # The lock also orders writes against /release, so none lands between the check and the write.
+        with _SAVED_LOCK:
+            if body.failsafe:
+                _FAILSAFE["held"] = True
+                for path in available_pwms:
+                    _SAVED_STATES.setdefault(path, read_channel_state(path))
+            elif _FAILSAFE["held"]:
+                return _failsafe_held_response()
+            if body.all_channels or body.failsafe:
+                written = [write_pwm_value(body.pwm, [path]) for path in available_pwms]
+                target = ",".join(path for path in written if path) or None
+            else:
+                target = write_pwm_value(body.pwm, [body.pwm_path] if body.pwm_path else available_pwms)
         if target is None:
             return JSONResponse(
                 status_code=404,
@@ -65,11 +150,13 @@ def set_pwm(body: SetPwmBody, _: None = Depends(require_bearer_token)):
                 },
             )
 
+        WATCHDOG.renew(body.lease_seconds)
         return {
             "status": "ok",
             "pwm": body.pwm,
             "target": target,
             "available_pwms": available_pwms,
+            "watchdog": WATCHDOG.status(),
         }
     except Exception:
         LOGGER.exception("Failed to set PWM")
@@ -83,6 +170,47 @@ def set_pwm(body: SetPwmBody, _: None = Depends(require_bearer_token)):
         )
 
 
+@app.post("/release")
+def release(_: None = Depends(require_bearer_token)):
+    """
+    Put every channel back the way it was before the failsafe took it over
+    and accept normal writes again. A channel that cannot be restored stays
+    at full duty until the next write.
+    """
+    with _SAVED_LOCK:
+        restored = {path: restore_channel_state(path, state) for path, state in _SAVED_STATES.items()}
+        _SAVED_STATES.clear()
+        _FAILSAFE["held"] = False
+    if not all(restored.values()):
+        return JSONResponse(status_code=500, content={"status": "error", "restored": restored})
+    return {"status": "ok", "restored": restored}
+
+
+@app.post("/heartbeat")
+def heartbeat(body: HeartbeatBody, _: None = Depends(require_bearer_token)):
+    WATCHDOG.heartbeat(body.lease_seconds)
+    return WATCHDOG.status()
+
+
+@app.post("/calibrate")
+def calibrate(body: CalibrateBody, _: None = Depends(require_bearer_token)):
+    if _FAILSAFE["held"]:
+        return _failsafe_held_response()
+    if body.pwm_path and _normalize(body.pwm_path) not in discover_pwm_files():
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": "Unknown PWM channel", "pwm_path": body.pwm_path},
+        )
+    if not start_calibration(body.pwm_path, step=body.step):
+        return JSONResponse(status_code=409, content={"status": "error", "message": "Calibration in progress"})
+    return JSONResponse(status_code=202, content={"status": "running", "pwm_path": body.pwm_path})
+
+
+@app.get("/calibration")
+def calibration(_: None = Depends(require_bearer_token)):
+    return calibration_status()
+
+
 @app.exception_handler(Exception)
 async def handle_unexpected(_request, exc: Exception):
     LOGGER.exception("Unhandled error: %s", exc)
@@ -2,7 +2,7 @@ import glob
 import logging
 import os
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from hwmon import HWMON_ROOT
 
@@ -93,3 +93,31 @@ def write_pwm_value(pwm: int, pwm_files: List[str]) -> Optional[str]:
     except Exception:
         LOGGER.exception("Failed writing PWM value to %s", target)
         return None
+
+
+def _read_optional_int(path: str) -> Optional[int]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_channel_state(pwm_file: str) -> Dict[str, Optional[int]]:
+    """Current duty and pwmN_enable mode of one channel (None where unreadable)."""
+    return {"pwm": _read_optional_int(pwm_file), "enable": _read_optional_int(f"{pwm_file}_enable")}
+
+
+def restore_channel_state(pwm_file: str, state: Dict[str, Optional[int]]) -> bool:
+    """Write back a state from read_channel_state(): the duty first, then the mode."""
+    try:
+        if state.get("pwm") is not None:
+            with open(pwm_file, "w", encoding="utf-8") as f:
+                f.write(str(state["pwm"]))
+        if state.get("enable") is not None and os.path.isfile(f"{pwm_file}_enable"):
+            with open(f"{pwm_file}_enable", "w", encoding="utf-8") as f:
+                f.write(str(state["enable"]))
+        return True
+    except OSError as e:
+        LOGGER.error("Failed restoring %s: %s", pwm_file, e)
+        return False